@@ -1,5 +1,5 @@
 # api.py
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, Response, g, request, jsonify, send_from_directory, render_template_string
 from flask_cors import CORS
 import requests
 import os
@@ -11,18 +11,45 @@ import logging
 from urllib.parse import urlparse, parse_qs
 from functools import wraps
 from selectors_ml import parse_list_items
-from product_scraper import extract_product_details, extract_stock
+from product_scraper import extract_product_details, extract_stock_fast
 import random
 import base64
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import asyncio
 from playwright_scraper import fetch_page_sync, PlaywrightScraper
+from browser_pool import browser_pool_snapshot, get_browser_pool, BATCH_DEADLINE
+from async_runtime import run_sync, iterate_sync
+from http_tier import HTTP_TIER_ENABLED, scrape_http_async, fetch_many_http, parse_list_state
+from page_classifier import OK, NOT_FOUND, classify, classify_page, page_type_for_url
+from http_session import get_session, http_pool_snapshot
+from rate_limit import get_rate_limiter, retry_after_seconds, backoff_delay
+from redirect_cache import REDIRECT_CACHE_ENABLED, get_redirect_cache, redirect_cache_snapshot
+from product_cache import PRODUCT_CACHE_ENABLED, get_product_cache, product_cache_snapshot
+from search_cache import SEARCH_CACHE_ENABLED, get_search_cache, search_cache_key, search_cache_snapshot
+from tier_stats import record_tier, record_latency, tier_stats_snapshot
+from hedging import HEDGING_ENABLED, hedge_delay, hedged_race, hedging_snapshot
+from circuit_breaker import CircuitOpenError, check_breaker, guarded_call, circuit_breaker_snapshot
+from metrics import METRICS_ENABLED, observe_request, count_fallback, count_block, render_metrics, metrics_snapshot
+from job_queue import get_job_store, ensure_job_workers, job_queue_snapshot
 from ocr_processor import OCRProcessor, test_ocr_installation
 
 app = Flask(__name__)
 CORS(app)  # Permite requisições de qualquer origem
 
+# Duração de todas as requisições do Flask no histograma do /metrics (rótulo = regra da rota)
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
+
+@app.after_request
+def observe_request_duration(response):
+    start_time = g.pop('request_start', None)
+    if start_time is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code, time.time() - start_time)
+    return response
+
 # Decorator para medir duração das requisições
 def log_request_duration(f):
     @wraps(f)
@@ -50,14 +77,205 @@ def log_request_duration(f):
 # Inicializar OCR processor
 ocr_processor = OCRProcessor()
 
+async def fetch_many_tiered(urls, parse, page_type, parse_with_url=False, validate=None, concurrency=None,
+                            item_timeout=None, deadline=None, on_result=None):
+    """Busca várias URLs pelo tier HTTP e escala só as bloqueadas para o browser pool.
+
+    Mesmo formato de saída de BrowserPool.fetch_many, com `tier` indicando quem
+    resolveu cada URL; `on_result(index, outcome)` é chamado quando cada URL termina.
+    """
+    pool = get_browser_pool()
+    start_time = time.time()
+    deadline = deadline or BATCH_DEADLINE
+    results = [None] * len(urls)
+    escalated = list(range(len(urls)))
+    
+    def forward(index, outcome):
+        results[index] = outcome
+        if on_result:
+            on_result(index, outcome)
+    
+    if HTTP_TIER_ENABLED and urls:
+        http_results = await fetch_many_http(
+            urls, parse, page_type,
+            parse_with_url=parse_with_url,
+            validate=validate,
+            on_result=forward,
+            deadline=deadline
+        )
+        # Páginas inexistentes já têm resposta definitiva; só os bloqueios sobem para o browser.
+        # Estourado o prazo na fase HTTP não sobra tempo para o pool: a URL termina como 'deadline'
+        escalated = []
+        for index, outcome in enumerate(http_results):
+            if outcome['reason'] == 'deadline':
+                forward(index, outcome)
+            elif not outcome['ok'] and outcome['reason'] != 'not_found':
+                escalated.append(index)
+    
+    if escalated:
+        if HTTP_TIER_ENABLED:
+            count_fallback(page_type, 'http', 'playwright', len(escalated))
+        # Uma permissão do breaker do Playwright por URL: aberto, a URL falha na hora sem ocupar
+        # o pool; em half-open só as URLs de prova liberadas vão ao pool
+        permits = {}
+        for index in escalated:
+            try:
+                permits[index] = check_breaker('playwright', page_type)
+            except CircuitOpenError as e:
+                record_tier('playwright', page_type, 'error', 'circuit_open')
+                forward(index, {'url': urls[index], 'ok': False, 'result': None, 'reason': 'circuit_open',
+                                'error': str(e), 'elapsed': 0.0, 'tier': 'playwright'})
+        admitted = list(permits)
+        if not admitted:
+            return results
+        
+        def forward_escalated(position, outcome):
+            index = admitted[position]
+            outcome['tier'] = 'playwright'
+            record_tier('playwright', page_type, 'hit' if outcome['ok'] else 'error', outcome['reason'])
+            if outcome['ok'] and outcome['elapsed'] is not None:
+                record_latency('playwright', page_type, outcome['elapsed'])
+            breaker = permits.pop(index, None)
+            if breaker:
+                breaker.record(outcome['ok'])
+            forward(index, outcome)
+        
+        pool_kwargs = {'item_timeout': item_timeout} if item_timeout else {}
+        try:
+            pool_results = await pool.fetch_many(
+                [urls[index] for index in admitted],
+                parse=parse,
+                parse_with_url=parse_with_url,
+                concurrency=concurrency,
+                deadline=max(1.0, deadline - (time.time() - start_time)),
+                on_result=forward_escalated,
+                **pool_kwargs
+            )
+        finally:
+            # URLs canceladas (prazo global ou lote cancelado) terminam sem resultado: só devolvem a permissão
+            for breaker in permits.values():
+                if breaker:
+                    breaker.release()
+        # URLs canceladas pelo prazo global não passaram pelo callback
+        for position, outcome in enumerate(pool_results):
+            if results[admitted[position]] is None:
+                outcome['tier'] = 'playwright'
+                results[admitted[position]] = outcome
+    
+    return results
+
+async def finish_list_items_async(items, include_stock, debug=False, progress=None, on_item=None):
+    """Etapa final de uma lista: estoque (se pedido) com os callbacks de progresso.
+
+    `progress(items, done, total)` recebe a lista já limitada. Retorna o resumo do
+    enriquecimento ou None se o estoque não foi pedido.
+    """
+    # Extrai estoque se solicitado (HTTP primeiro, Playwright para os bloqueados, em paralelo)
+    if not include_stock:
+        if progress:
+            progress(items, len(items), len(items))
+        return None
+    
+    if debug:
+        print(f"[FALLBACK] Starting stock extraction for {len(items)} items")
+    
+    if progress:
+        progress(items, 0, len(items))
+    enrichment = await enrich_items_with_stock_async(
+        items,
+        debug=debug,
+        progress=(lambda done, total: progress(items, done, total)) if progress else None,
+        on_item=on_item
+    )
+    
+    if debug:
+        print(f"[FALLBACK] Stock extraction completed: {enrichment}")
+    return enrichment
+
+async def enrich_items_with_stock_async(items, debug=False, concurrency=None, item_timeout=None, deadline=None, progress=None, on_item=None):
+    """Preenche `stock` de cada item buscando as páginas de produto em paralelo pelo browser pool.
+
+    Itens sem link ficam com estoque 0. Itens que não terminam dentro do timeout
+    por item ou do prazo global voltam com `stock: None` e o motivo em
+    `stock_error`, sem bloquear a resposta inteira (o mesmo vale para itens
+    pulados por circuit breaker aberto). `progress(done, total)` e
+    `on_item(item)` são chamados a cada item concluído (o item já recebe o
+    estoque nesse momento).
+    """
+    start_time = time.time()
+    concurrency = concurrency or int(os.getenv('STOCK_CONCURRENCY', '0')) or None
+    item_timeout = item_timeout or float(os.getenv('STOCK_ITEM_TIMEOUT', '45'))
+    deadline = deadline or float(os.getenv('STOCK_DEADLINE', '240'))
+    
+    linked = [item for item in items if item.get('link')]
+    for item in items:
+        if not item.get('link'):
+            item['stock'] = 0
+            if on_item:
+                on_item(item)
+    
+    summary = {'total': len(items), 'enriched': 0, 'timed_out': 0, 'failed': 0, 'by_tier': {}}
+    applied = set()
+    
+    def apply_outcome(index, outcome):
+        item = linked[index]
+        applied.add(index)
+        tier = outcome.get('tier', 'playwright')
+        summary['by_tier'][tier] = summary['by_tier'].get(tier, 0) + 1
+        if outcome['ok']:
+            item['stock'] = outcome['result']
+            summary['enriched'] += 1
+        elif outcome['reason'] in ('timeout', 'deadline', 'circuit_open'):
+            item['stock'] = None
+            item['stock_error'] = outcome['error']
+            summary['timed_out'] += 1
+        else:
+            item['stock'] = 0
+            item['stock_error'] = outcome['error']
+            summary['failed'] += 1
+        
+        if debug:
+            print(f"[STOCK] {item.get('title', 'N/A')[:50]}... -> {item['stock']} ({outcome['elapsed']}s)")
+        if progress:
+            progress(len(items) - len(linked) + len(applied), len(items))
+        if on_item:
+            on_item(item)
+    
+    results = await fetch_many_tiered(
+        [item['link'] for item in linked],
+        parse=extract_stock_fast,
+        page_type='details',
+        concurrency=concurrency,
+        item_timeout=item_timeout,
+        deadline=deadline,
+        on_result=apply_outcome
+    )
+    
+    # Itens cancelados pelo prazo global não passaram pelo callback
+    for index, outcome in enumerate(results):
+        if index not in applied:
+            apply_outcome(index, outcome)
+    
+    summary['elapsed'] = round(time.time() - start_time, 3)
+    return summary
+
+def enrich_items_with_stock(items, debug=False, concurrency=None, item_timeout=None, deadline=None, progress=None, on_item=None):
+    """Facade síncrona de enrich_items_with_stock_async"""
+    return run_sync(enrich_items_with_stock_async(items, debug, concurrency, item_timeout, deadline, progress, on_item))
+
 # Sistema de fallback em cascata
-def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, include_stock=True, debug=False):
+async def scrape_with_fallback_async(url, scrape_type='list', product_term=None, limit=50, include_stock=True, debug=False, progress=None, on_item=None, hedge=False):
     """
     Sistema de fallback em cascata que tenta:
     # 1. Scraper tradicional (requests + BeautifulSoup) - DESABILITADO
-    1. Playwright (navegador headless)
+    0. HTTP puro lendo o estado embutido (só escala se detectar bloqueio)
+    1. Playwright (navegador headless); com hedge, começa em paralelo se o HTTP
+       passar do p90 da sua latência recente e vence quem trouxer dados primeiro
     2. OCR (extração de texto de imagem)
     
+    Roda no event loop do worker: as buscas aguardam o browser pool
+    diretamente e o parsing/OCR (CPU) vai para threads auxiliares.
+    
     Args:
         url: URL para fazer scraping
         scrape_type: 'list' para lista de produtos, 'details' para detalhes de produto
@@ -65,12 +283,18 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
         limit: limite de produtos (para lista)
         include_stock: incluir informações de estoque
         debug: modo debug
+        progress: callback opcional progress(items, done, total) com os itens parciais (lista)
+        on_item: callback opcional on_item(item) chamado quando o estoque de um item fica pronto
+        hedge: hedge HTTP -> Playwright nesta chamada (só para chamadas sensíveis à latência;
+               buscas, lotes, jobs e refresh de cache não fazem hedge). TIER_HEDGING=off desliga todos
     
     Returns:
         dict: resultado do scraping com informações sobre qual método funcionou
     """
     methods_tried = []
     last_error = None
+    debug_info = {}
+    pool = get_browser_pool()
     
     # Método 1: Scraper tradicional - COMENTADO CONFORME SOLICITADO
     # try:
@@ -129,127 +353,197 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
     #     last_error = f"Traditional scraper failed: {str(e)}"
     #     print(f"[FALLBACK] Scraper tradicional falhou: {str(e)}")
     
-    # Método 1: Playwright (agora é o primeiro método)
-    try:
-        if debug:
-            print(f"[PLAYWRIGHT] Starting Playwright scraper for URL: {url}")
-        print(f"[FALLBACK] Tentativa 1: Playwright para {url}")
-        methods_tried.append('playwright')
+    def not_found_result(reason, method_used):
+        """Página inexistente: lista vazia com sucesso (busca sem resultados) ou falha de detalhes"""
+        debug_info['page_class'] = {'verdict': NOT_FOUND, 'reason': reason}
+        if scrape_type == 'list':
+            if progress:
+                progress([], 0, 0)
+            return {
+                'success': True,
+                'method_used': method_used,
+                'methods_tried': methods_tried,
+                'items': [],
+                'items_count': 0,
+                'page_class': NOT_FOUND,
+                'debug_info': debug_info
+            }
+        return {
+            'success': False,
+            'method_used': method_used,
+            'methods_tried': methods_tried,
+            'error': f"Página não encontrada ({reason})",
+            'product': None,
+            'page_class': NOT_FOUND,
+            'debug_info': debug_info
+        }
+    
+    async def finish_list(items, method_used):
+        """Aplica o limite, enriquece com estoque e monta o resultado de lista"""
+        if len(items) > limit:
+            items = items[:limit]
         
-        playwright_scraper = PlaywrightScraper()
         if debug:
-            print(f"[PLAYWRIGHT] PlaywrightScraper instance created")
+            print(f"[FALLBACK] Items after limit: {len(items)}")
+            print(f"[FALLBACK] Include stock: {include_stock}")
         
-        html_content = playwright_scraper.fetch_page(url)
-        
-        if debug:
-            print(f"[PLAYWRIGHT] HTML content received: {len(html_content) if html_content else 0} chars")
+        enrichment = await finish_list_items_async(items, include_stock, debug=debug, progress=progress, on_item=on_item)
+        if enrichment is not None:
+            debug_info['stock_enrichment'] = enrichment
         
-        if html_content:
+        return {
+            'success': True,
+            'method_used': method_used,
+            'methods_tried': methods_tried,
+            'items': items,
+            'items_count': len(items),
+            'debug_info': debug_info
+        }
+    
+    # Cada tier devolve ('data', dados, método, html) ou ('not_found', motivo, método, None);
+    # exceção significa "sem dados válidos" e passa a vez ao próximo tier
+    
+    # Método 0: HTTP puro lendo o estado embutido na página (escala para o Playwright se detectar bloqueio)
+    async def http_step():
+        nonlocal last_error
+        try:
+            print(f"[FALLBACK] Tentativa 0: HTTP para {url}")
+            methods_tried.append('http')
+            
+            http_outcome = await scrape_http_async(url, scrape_type, limit=limit if scrape_type == 'list' else None)
+            debug_info['http_tier'] = {key: http_outcome[key] for key in ('page_class', 'blocked', 'status', 'bytes', 'elapsed')}
+            
+            if http_outcome['page_class'] == NOT_FOUND:
+                # Busca sem resultados / produto inexistente: resposta definitiva, sem escalar
+                print(f"[FALLBACK] HTTP: página não encontrada ({http_outcome['blocked']}), sem escalar")
+                return 'not_found', http_outcome['blocked'], 'http', None
+            if http_outcome['blocked']:
+                print(f"[FALLBACK] HTTP bloqueado ({http_outcome['blocked']}), escalando para Playwright")
+                raise Exception(f"HTTP bloqueado ({http_outcome['blocked']})")
+            return 'data', http_outcome['result'], 'http', http_outcome['html']
+        except Exception as e:
+            last_error = f"HTTP tier failed: {str(e)}"
+            print(f"[FALLBACK] HTTP falhou: {str(e)}")
+            raise
+    
+    # Método 1: Playwright (escalada do tier HTTP, ou hedge dele quando o HTTP demora)
+    async def playwright_step():
+        nonlocal last_error
+        try:
+            if debug:
+                print(f"[PLAYWRIGHT] Starting Playwright scraper for URL: {url}")
+            print(f"[FALLBACK] Tentativa 1: Playwright para {url}")
+            methods_tried.append('playwright')
+            if HTTP_TIER_ENABLED:
+                count_fallback(scrape_type, 'http', 'playwright')
+            step_start = time.time()
+            
+            html_content, status, fetch_info = await pool.fetch_page_with_info(url)
+            debug_info['browser_lease'] = fetch_info
+            
             if debug:
-                print(f"[FALLBACK] HTML content length: {len(html_content)}")
+                print(f"[PLAYWRIGHT] HTML content received: {len(html_content) if html_content else 0} chars")
+                print(f"[PLAYWRIGHT] Browser lease: {fetch_info}")
             
-            if scrape_type == 'list':
+            if html_content:
                 if debug:
-                    print(f"[PLAYWRIGHT] Parsing list items from HTML...")
+                    print(f"[FALLBACK] HTML content length: {len(html_content)}")
                 
-                items = parse_list_items(html_content)
+                # Classifica antes do parse: bloqueio/captcha pula direto para o próximo método
+                page_class, page_reason = classify(html_content, page_type=scrape_type)
+                debug_info['page_class'] = {'verdict': page_class, 'reason': page_reason}
+                if page_class != OK:
+                    count_block('playwright', scrape_type, page_class, page_reason)
+                if page_class == NOT_FOUND:
+                    record_tier('playwright', scrape_type, 'hit', page_reason)
+                    record_latency('playwright', scrape_type, time.time() - step_start)
+                    return 'not_found', page_reason, 'playwright', None
+                if page_class != OK:
+                    raise Exception(f"Página classificada como {page_class} ({page_reason})")
                 
-                if debug:
-                    print(f"[FALLBACK] Items parsed: {len(items) if items else 0}")
-                    print(f"[PLAYWRIGHT] Items found: {len(items) if items else 0}")
-                
-                if items and len(items) > 0:
-                    # Aplica limite
-                    if len(items) > limit:
-                        items = items[:limit]
-                    
+                if scrape_type == 'list':
                     if debug:
-                        print(f"[FALLBACK] Items after limit: {len(items)}")
-                        print(f"[FALLBACK] Include stock: {include_stock}")
+                        print(f"[PLAYWRIGHT] Parsing list items from HTML...")
                     
-                    # Extrai estoque se solicitado (usando Playwright também)
-                    if include_stock:
-                        if debug:
-                            print(f"[FALLBACK] Starting stock extraction for {len(items)} items")
-                        
-                        for i, item in enumerate(items):
-                            if item.get('link'):
-                                try:
-                                    if debug:
-                                        print(f"[FALLBACK] Extracting stock for item {i+1}/{len(items)}: {item.get('title', 'N/A')[:50]}...")
-                                    
-                                    product_html = playwright_scraper.fetch_page(item['link'])
-                                    if product_html:
-                                        stock = extract_stock(product_html)
-                                        item['stock'] = stock
-                                        if debug:
-                                            print(f"[FALLBACK] Stock extracted: {stock}")
-                                    else:
-                                        item['stock'] = 0
-                                        if debug:
-                                            print(f"[FALLBACK] No HTML for stock extraction")
-                                except Exception as e:
-                                    item['stock'] = 0
-                                    if debug:
-                                        print(f"[FALLBACK] Error extracting stock: {e}")
-                            else:
-                                item['stock'] = 0
-                                if debug:
-                                    print(f"[FALLBACK] No link for item {i+1}")
-                        
-                        if debug:
-                            print(f"[FALLBACK] Stock extraction completed")
+                    items = await asyncio.to_thread(parse_list_items, html_content, limit=limit)
                     
-                    try:
-                        playwright_scraper.close()
-                    except:
-                        pass
-                    return {
-                        'success': True,
-                        'method_used': 'playwright',
-                        'methods_tried': methods_tried,
-                        'items': items,
-                        'items_count': len(items)
-                    }
+                    if debug:
+                        print(f"[FALLBACK] Items parsed: {len(items) if items else 0}")
+                        print(f"[PLAYWRIGHT] Items found: {len(items) if items else 0}")
+                    
+                    if items and len(items) > 0:
+                        record_tier('playwright', scrape_type, 'hit')
+                        record_latency('playwright', scrape_type, time.time() - step_start)
+                        return 'data', items, 'playwright', html_content
+                
+                elif scrape_type == 'details':
+                    product_details = await asyncio.to_thread(extract_product_details, html_content, url)
+                    if product_details and product_details.get('title'):
+                        record_tier('playwright', scrape_type, 'hit')
+                        record_latency('playwright', scrape_type, time.time() - step_start)
+                        return 'data', product_details, 'playwright', html_content
             
-            elif scrape_type == 'details':
-                product_details = extract_product_details(html_content, url)
-                if product_details and product_details.get('title'):
-                    try:
-                        playwright_scraper.close()
-                    except:
-                        pass
-                    return {
-                        'success': True,
-                        'method_used': 'playwright',
-                        'methods_tried': methods_tried,
-                        'product': product_details,
-                        'html_content': html_content
-                    }
-        
-        if debug:
-            print(f"[PLAYWRIGHT] No valid data returned from Playwright")
-            print(f"[PLAYWRIGHT] HTML content exists: {html_content is not None}")
-            if html_content:
-                print(f"[PLAYWRIGHT] HTML length: {len(html_content)}")
-                print(f"[PLAYWRIGHT] HTML preview: {html_content[:200]}...")
-        
+            if debug:
+                print(f"[PLAYWRIGHT] No valid data returned from Playwright")
+                print(f"[PLAYWRIGHT] HTML content exists: {html_content is not None}")
+                if html_content:
+                    print(f"[PLAYWRIGHT] HTML length: {len(html_content)}")
+                    print(f"[PLAYWRIGHT] HTML preview: {html_content[:200]}...")
+            
+            raise Exception("Playwright não retornou dados válidos")
+            
+        except Exception as e:
+            last_error = f"Playwright failed: {str(e)}"
+            record_tier('playwright', scrape_type, 'error', type(e).__name__)
+            if debug:
+                print(f"[PLAYWRIGHT] Exception occurred: {str(e)}")
+                print(f"[PLAYWRIGHT] Exception type: {type(e).__name__}")
+            print(f"[FALLBACK] Playwright falhou: {str(e)}")
+            raise
+    
+    # Cada tier roda atrás do seu circuit breaker: aberto, o tier é pulado sem esperar timeout
+    async def guarded(tier, step):
+        nonlocal last_error
         try:
-            playwright_scraper.close()
-        except:
-            pass
-        raise Exception("Playwright não retornou dados válidos")
+            return await guarded_call(tier, scrape_type, step)
+        except CircuitOpenError as e:
+            last_error = str(e)
+            debug_info.setdefault('circuit_open', []).append(tier)
+            print(f"[FALLBACK] {e}")
+            raise
+    
+    # HTTP e Playwright: em sequência, ou com hedge (Playwright dispara se o HTTP passar do seu p90)
+    try:
+        if HTTP_TIER_ENABLED:
+            delay = hedge_delay('http', scrape_type) if (HEDGING_ENABLED and hedge) else None
+            _role, (kind, data, method_used, html_content), hedged = await hedged_race(
+                lambda: guarded('http', http_step), lambda: guarded('playwright', playwright_step), delay)
+            debug_info['hedge'] = {'delay': round(delay, 3) if delay is not None else None, 'hedged': hedged, 'winner': method_used}
+            if hedged:
+                print(f"[FALLBACK] Hedge disparado após {delay:.2f}s; venceu {method_used}")
+        else:
+            kind, data, method_used, html_content = await guarded('playwright', playwright_step)
         
-    except Exception as e:
-        last_error = f"Playwright failed: {str(e)}"
-        if debug:
-            print(f"[PLAYWRIGHT] Exception occurred: {str(e)}")
-            print(f"[PLAYWRIGHT] Exception type: {type(e).__name__}")
-        print(f"[FALLBACK] Playwright falhou: {str(e)}")
+        if kind == 'not_found':
+            return not_found_result(data, method_used)
+        if scrape_type == 'list':
+            return await finish_list(data, method_used)
+        return {
+            'success': True,
+            'method_used': method_used,
+            'methods_tried': methods_tried,
+            'product': data,
+            'html_content': html_content,
+            'debug_info': debug_info
+        }
+    except Exception:
+        pass
     
     # Método 2: OCR
+    count_fallback(scrape_type, 'playwright', 'ocr')
+    ocr_breaker = None
     try:
+        ocr_breaker = check_breaker('ocr', scrape_type)
         print(f"[FALLBACK] Tentativa 2: OCR para {url}")
         methods_tried.append('ocr')
         
@@ -258,21 +552,14 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
         
         # Para OCR, precisamos capturar uma screenshot da página
         try:
-            playwright_scraper = PlaywrightScraper()
-            screenshot_data = playwright_scraper.take_screenshot(url)
+            screenshot_data = await asyncio.wait_for(pool.take_screenshot(url), timeout=60)
         except Exception as e:
             print(f"[OCR] Error taking screenshot: {e}")
             screenshot_data = None
-        finally:
-            try:
-                if 'playwright_scraper' in locals():
-                    playwright_scraper.close()
-            except:
-                pass
         
         if screenshot_data:
             # Processa a imagem com OCR
-            ocr_result = ocr_processor.process_screenshot(screenshot_data)
+            ocr_result = await asyncio.to_thread(ocr_processor.process_screenshot, screenshot_data)
             
             if ocr_result and ocr_result.success:
                 # Para lista de produtos, tenta extrair informações básicas do texto
@@ -292,6 +579,9 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
                                 'ocr_text_preview': ocr_result.text[:100] if ocr_result.text else ''
                             })
                     
+                    record_tier('ocr', scrape_type, 'hit')
+                    if ocr_breaker:
+                        ocr_breaker.record(True)
                     return {
                         'success': True,
                         'method_used': 'ocr',
@@ -318,6 +608,9 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
                         'ocr_products_detected': len(ocr_result.products)
                     }
                     
+                    record_tier('ocr', scrape_type, 'hit')
+                    if ocr_breaker:
+                        ocr_breaker.record(True)
                     return {
                         'success': True,
                         'method_used': 'ocr',
@@ -333,20 +626,33 @@ def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, i
         
         raise Exception("OCR não conseguiu processar a página")
         
+    except CircuitOpenError as e:
+        last_error = str(e)
+        debug_info.setdefault('circuit_open', []).append('ocr')
+        print(f"[FALLBACK] {e}")
     except Exception as e:
         last_error = f"OCR failed: {str(e)}"
+        record_tier('ocr', scrape_type, 'error', type(e).__name__)
+        if ocr_breaker:
+            ocr_breaker.record(False)
         print(f"[FALLBACK] OCR falhou: {str(e)}")
     
     # Se todos os métodos falharam
+    count_fallback(scrape_type, 'ocr', 'failed')
     return {
         'success': False,
         'method_used': None,
         'methods_tried': methods_tried,
         'error': f"Todos os métodos de scraping falharam. Último erro: {last_error}",
         'items': [],
-        'items_count': 0
+        'items_count': 0,
+        'debug_info': debug_info
     }
 
+def scrape_with_fallback(url, scrape_type='list', product_term=None, limit=50, include_stock=True, debug=False):
+    """Facade síncrona de scrape_with_fallback_async (roda no event loop do worker)"""
+    return run_sync(scrape_with_fallback_async(url, scrape_type, product_term, limit, include_stock, debug))
+
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
@@ -412,7 +718,7 @@ def get_advanced_headers(profile_type='random'):
             'pt-BR,pt;q=0.9,en;q=0.8',
             'en-US,en;q=0.9,pt;q=0.8'
         ]),
-        'Accept-Encoding': 'gzip, deflate, br',
+        'Accept-Encoding': 'gzip, deflate',
         'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
         'Cache-Control': random.choice(['no-cache', 'max-age=0', 'no-store']),
@@ -455,7 +761,7 @@ def fetch_page_advanced(url, use_playwright=False, retries=3):
             content = fetch_page_requests(url, retries=retries)
             
             # Check if content looks valid
-            if len(content) > 100000 or 'mercadolivre' not in url.lower():
+            if classify_page(content, page_type=page_type_for_url(url)) in (OK, NOT_FOUND):
                 print(f"[FETCH_ADV] Requests bem-sucedido: {len(content)} chars")
                 return content
             else:
@@ -492,29 +798,32 @@ def fetch_page_advanced(url, use_playwright=False, retries=3):
 def fetch_page_requests(url, headers=None, retries=3):
     """Original fetch function using requests only"""
     
+    def back_off(attempt):
+        # Toda nova tentativa espera um backoff; a pausa vale para o host inteiro e a
+        # próxima requisição espera no bucket
+        delay = backoff_delay(attempt)
+        get_rate_limiter().penalize(urlparse(url).hostname, delay)
+        print(f"[FETCH_REQ] Host pausado por {delay:.1f}s antes da próxima tentativa")
+    
     for attempt in range(retries):
         try:
             # Use random headers for each attempt
             current_headers = get_random_headers() if headers is None else headers.copy()
             
-            # Add random delay between attempts (more human-like)
+            # Sem sleeps fixos: o token bucket por host (rate_limit) espaça as requisições
+            # do worker inteiro e as pausas de Retry-After/backoff valem para todas as threads
             if attempt > 0:
-                delay = (2 ** attempt) + random.uniform(1, 3)
-                print(f"[FETCH_REQ] Tentativa {attempt + 1}/{retries} após {delay:.1f}s de delay")
-                time.sleep(delay)
-            else:
-                # Small initial delay to avoid being too fast
-                time.sleep(random.uniform(0.5, 1.5))
+                print(f"[FETCH_REQ] Tentativa {attempt + 1}/{retries}")
             
             print(f"[FETCH_REQ] Fazendo requisição para: {url}")
             print(f"[FETCH_REQ] User-Agent: {current_headers.get('User-Agent', 'N/A')}")
             
-            # Create session for better connection handling
-            session = requests.Session()
-            session.headers.update(current_headers)
+            # Sessão keep-alive do worker: reaproveita DNS/TCP/TLS entre chamadas
+            session = get_session()
             
             response = session.get(
                 url, 
+                headers=current_headers,
                 timeout=120,  # Timeout ainda maior
                 verify=True,
                 allow_redirects=True,
@@ -527,24 +836,28 @@ def fetch_page_requests(url, headers=None, retries=3):
             # Check for specific error codes
             if response.status_code == 403:
                 print(f"[FETCH_REQ] Erro 403: Acesso negado - possível bloqueio")
-                session.close()
                 if attempt < retries - 1:
+                    back_off(attempt)
                     continue
                 raise requests.exceptions.RequestException(f"Acesso negado (403) após {retries} tentativas")
             
             elif response.status_code in [429, 503, 502, 504]:
                 print(f"[FETCH_REQ] Erro {response.status_code}: Rate limit ou erro de servidor")
-                session.close()
                 if attempt < retries - 1:
-                    # Longer delay for rate limits
-                    time.sleep(random.uniform(5, 10))
+                    # Retry-After do servidor (já aplicado pelo adapter) ou backoff exponencial;
+                    # a pausa vale para o host inteiro e a próxima tentativa espera no bucket
+                    delay = retry_after_seconds(response)
+                    if delay is None:
+                        back_off(attempt)
+                    else:
+                        print(f"[FETCH_REQ] Host pausado por {delay:.1f}s antes da próxima tentativa")
                     continue
                 raise requests.exceptions.RequestException(f"Erro de servidor ({response.status_code}) após {retries} tentativas")
             
             elif response.status_code != 200:
                 print(f"[FETCH_REQ] Status code inesperado: {response.status_code}")
-                session.close()
                 if attempt < retries - 1:
+                    back_off(attempt)
                     continue
                 raise requests.exceptions.RequestException(f"Status code {response.status_code}")
             
@@ -552,33 +865,37 @@ def fetch_page_requests(url, headers=None, retries=3):
             content_length = len(response.text)
             print(f"[FETCH_REQ] Requisição bem-sucedida! Tamanho da resposta: {content_length} chars")
             
-            # If content is suspiciously small, it might be blocked
-            if content_length < 100000 and 'mercadolivre' in url.lower():
-                print(f"[FETCH_REQ] AVISO: Conteúdo muito pequeno ({content_length} chars) - possível bloqueio")
+            # Bloqueio, captcha ou página vazia: tenta de novo com outros headers
+            page_class, page_reason = classify(response.text, page_type=page_type_for_url(url))
+            if page_class not in (OK, NOT_FOUND):
+                print(f"[FETCH_REQ] AVISO: Página classificada como {page_class} ({page_reason}, {content_length} chars) - possível bloqueio")
                 if attempt < retries - 1:
                     print("[FETCH_REQ] Tentando novamente com headers diferentes...")
-                    session.close()
+                    back_off(attempt)
                     continue
             
-            session.close()
             return response.text
                 
         except requests.exceptions.Timeout:
             print(f"[FETCH_REQ] Timeout na tentativa {attempt + 1}")
             if attempt == retries - 1:
                 raise Exception(f"Timeout após {retries} tentativas")
+            back_off(attempt)
         except requests.exceptions.ConnectionError as e:
             print(f"[FETCH_REQ] Erro de conexão na tentativa {attempt + 1}: {str(e)}")
             if attempt == retries - 1:
                 raise Exception(f"Erro de conexão após {retries} tentativas: {str(e)}")
+            back_off(attempt)
         except requests.exceptions.RequestException as e:
             print(f"[FETCH_REQ] Erro HTTP na tentativa {attempt + 1}: {str(e)}")
             if attempt == retries - 1:
                 raise Exception(f"Erro HTTP após {retries} tentativas: {str(e)}")
+            back_off(attempt)
         except Exception as e:
             print(f"[FETCH_REQ] Erro geral na tentativa {attempt + 1}: {str(e)}")
             if attempt == retries - 1:
                 raise Exception(f"Erro geral após {retries} tentativas: {str(e)}")
+            back_off(attempt)
     
     raise Exception(f"Falha em todas as {retries} tentativas")
 
@@ -610,7 +927,7 @@ def follow_redirects(url, max_redirects=5):
     
     while redirect_count < max_redirects:
         try:
-            response = requests.head(current_url, headers=DEFAULT_HEADERS, timeout=60, allow_redirects=False)
+            response = get_session().head(current_url, headers=DEFAULT_HEADERS, timeout=60, allow_redirects=False)
             
             # Se não há redirect, retorna a URL atual
             if response.status_code not in [301, 302, 303, 307, 308]:
@@ -670,14 +987,29 @@ def normalize_product_url(url):
     # Para outros formatos, normaliza para produto.mercadolivre.com.br
     return f"https://produto.mercadolivre.com.br/MLB-{mlb_id}"
 
+def resolve_tracking_url(url):
+    """follow_redirects com cache TTL+LRU compartilhado entre workers; retorna (url_final, mlb_id)"""
+    cache = get_redirect_cache() if REDIRECT_CACHE_ENABLED else None
+    if cache:
+        cached = cache.get(url)
+        if cached:
+            return cached
+    
+    final_url = follow_redirects(url)
+    mlb_id = extract_mlb_id_from_url(final_url)
+    # Só guarda resoluções completas: erro no meio da cadeia devolve uma URL intermediária sem MLB ID
+    if cache and mlb_id and final_url != url and validate_mercadolivre_url(final_url):
+        cache.put(url, final_url, mlb_id)
+    return final_url, mlb_id
+
 def validate_product_url(url):
     """Valida se a URL é de um produto específico do Mercado Livre"""
     if not validate_mercadolivre_url(url):
         return False
     
-    # Se for uma URL de tracking, segue os redirects primeiro
+    # Se for uma URL de tracking, segue os redirects primeiro (resultado fica em cache para o scrape)
     if 'click' in url or 'mclics' in url:
-        final_url = follow_redirects(url)
+        final_url, _mlb_id = resolve_tracking_url(url)
         # Verifica se a URL final é válida do Mercado Livre
         if not validate_mercadolivre_url(final_url):
             return True  # Aceita URLs de tracking mesmo se não conseguir seguir o redirect
@@ -746,8 +1078,31 @@ def health():
             "error": str(e)
         }
     
+    # Estado do pool de navegadores deste worker (None se ainda não foi usado)
+    health_data["browser_pool"] = browser_pool_snapshot()
+    health_data["job_queue"] = job_queue_snapshot()
+    health_data["scrape_tiers"] = tier_stats_snapshot()
+    health_data["hedging"] = hedging_snapshot()
+    # Breaker aberto: o tier está sendo pulado neste worker
+    health_data["circuit_breakers"] = circuit_breaker_snapshot()
+    health_data["metrics"] = metrics_snapshot()
+    if health_data["circuit_breakers"].get("open"):
+        health_data["status"] = "degraded"
+    health_data["http_pool"] = http_pool_snapshot()
+    health_data["redirect_cache"] = redirect_cache_snapshot()
+    health_data["product_cache"] = product_cache_snapshot()
+    health_data["search_cache"] = search_cache_snapshot()
+    
     return jsonify(health_data)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato de exposição do Prometheus (todos os workers em modo multiprocesso)"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Métricas desativadas (METRICS=off ou prometheus_client não instalado)"}), 503
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.route('/debug-scraping', methods=['POST'])
 def debug_scraping():
     """Endpoint para debug de scraping em produção"""
@@ -795,21 +1150,10 @@ def debug_scraping():
         blocking_indicators = []
         
         if html_content:
-            content_length = len(html_content)
-            if content_length < 100000 and 'mercadolivre' in test_url.lower():
+            page_class, page_reason = classify(html_content, page_type=page_type_for_url(test_url))
+            if page_class not in (OK, NOT_FOUND):
                 is_blocked = True
-                blocking_indicators.append(f"Conteúdo muito pequeno: {content_length} chars")
-            
-            # Check for common blocking patterns
-            blocking_patterns = [
-                'access denied', 'blocked', 'captcha', 'robot', 'bot',
-                'security check', 'verificação', 'bloqueado'
-            ]
-            
-            for pattern in blocking_patterns:
-                if pattern in html_content.lower():
-                    is_blocked = True
-                    blocking_indicators.append(f"Padrão de bloqueio encontrado: '{pattern}'")
+                blocking_indicators.append(f"Página classificada como {page_class}: {page_reason}")
         
         debug_info = {
             'test_url': test_url,
@@ -875,6 +1219,7 @@ def test_playwright():
                 'content_length': len(requests_content),
                 'items_found': len(requests_items),
                 'time_taken': round(requests_time, 2),
+                'page_class': classify_page(requests_content, page_type=page_type_for_url(test_url)),
                 'contains_mercadolivre': 'mercadolivre' in requests_content.lower(),
                 'contains_products': 'produto' in requests_content.lower() or 'item' in requests_content.lower(),
                 'first_item': requests_items[0] if requests_items else None
@@ -904,6 +1249,7 @@ def test_playwright():
                 'content_length': len(playwright_content),
                 'items_found': len(playwright_items),
                 'time_taken': round(playwright_time, 2),
+                'page_class': classify_page(playwright_content, page_type=page_type_for_url(test_url)),
                 'contains_mercadolivre': 'mercadolivre' in playwright_content.lower(),
                 'contains_products': 'produto' in playwright_content.lower() or 'item' in playwright_content.lower(),
                 'first_item': playwright_items[0] if playwright_items else None
@@ -931,8 +1277,8 @@ def test_playwright():
         
         results['comparison'] = {
             'both_successful': req_success and pw_success,
-            'requests_blocked': req_success and req_content_size < 100000 and 'mercadolivre' in test_url.lower(),
-            'playwright_blocked': pw_success and pw_content_size < 100000 and 'mercadolivre' in test_url.lower(),
+            'requests_blocked': req_success and results['requests_result']['page_class'] not in (OK, NOT_FOUND),
+            'playwright_blocked': pw_success and results['playwright_result']['page_class'] not in (OK, NOT_FOUND),
             'content_size_difference': pw_content_size - req_content_size,
             'items_difference': pw_items - req_items,
             'playwright_advantage': pw_items > req_items or (pw_success and not req_success)
@@ -1129,22 +1475,12 @@ def scrape_product_details_fast():
                 print(f"[PRODUCTION_DEBUG] HTML preview: {html_content[:200]}...")
                 
                 # Verifica se é uma página de erro ou redirecionamento
-                error_indicators = [
-                    'robot-or-human',
-                    'verificar-cuenta',
-                    'security-check',
-                    'captcha',
-                    'blocked',
-                    'access denied'
-                ]
-                
-                has_error = any(indicator in html_content.lower() for indicator in error_indicators)
+                page_class, page_reason = classify(html_content, page_type='details')
+                has_error = page_class != OK
                 print(f"[PRODUCTION_DEBUG] Error indicators found: {has_error}")
                 
                 if has_error:
-                    for indicator in error_indicators:
-                        if indicator in html_content.lower():
-                            print(f"[PRODUCTION_DEBUG] Found error indicator: {indicator}")
+                    print(f"[PRODUCTION_DEBUG] Page classified as {page_class}: {page_reason}")
                 
                 print(f"[PRODUCTION_DEBUG] Extracting product details...")
                 product_details = extract_product_details(html_content, url)
@@ -1518,89 +1854,244 @@ def health_check():
 #     except Exception as e:
 #         return jsonify({"error": str(e)}), 500
 
-@app.route('/search', methods=['GET'])
-def search_products():
-    """Endpoint para buscar produtos por termo"""
+# Paginação das buscas: o Mercado Livre pagina com _Desde_{offset} (1, 51, 101, ...)
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '50'))
+SEARCH_MAX_PAGES = int(os.getenv('SEARCH_MAX_PAGES', '8'))    # teto de páginas por busca, contando rodadas extras
+
+def search_page_url(search_url, offset):
+    """URL da página da busca que começa no resultado `offset` (1 = primeira página)"""
+    return search_url if offset <= 1 else f"{search_url}_Desde_{offset}"
+
+def search_item_key(item):
+    """Chave de deduplicação entre páginas: MLB ID do link, senão o próprio link ou o título"""
+    link = item.get('link') or ''
+    return extract_mlb_id_from_url(link) or link or item.get('title')
+
+async def scrape_search_async(search_url, product_term, limit, include_stock, debug=False, progress=None, on_item=None):
+    """Listagem de busca com paginação.
+
+    Até uma página, é a cascata de scrape_with_fallback_async. Acima disso as páginas
+    necessárias (_Desde_ 1, 51, 101, ...) são buscadas em paralelo pelo tier HTTP com
+    escalada para o browser pool, mescladas na ordem de ranking e deduplicadas por
+    MLB ID. Se a deduplicação ou páginas que falharam deixarem a lista abaixo do
+    limite, busca as páginas seguintes em novas rodadas; para ao atingir o limite, no
+    fim real dos resultados (página inexistente ou carregada sem itens) ou numa rodada
+    sem itens novos. Uma página que falhou é pulada sem descartar as seguintes, que já
+    foram buscadas. Se a primeira página falhar no pool ela passa pela cascata completa.
+    """
+    if limit <= SEARCH_PAGE_SIZE:
+        return await scrape_with_fallback_async(
+            url=search_url,
+            scrape_type='list',
+            product_term=product_term,
+            limit=limit,
+            include_stock=include_stock,
+            debug=debug,
+            progress=progress,
+            on_item=on_item
+        )
+    
+    start_time = time.time()
+    items, seen = [], set()
+    methods_tried = []
+    pagination = {'page_size': SEARCH_PAGE_SIZE, 'pages': [], 'duplicates': 0}
+    
+    def merge(page_items):
+        added = 0
+        for item in page_items:
+            key = search_item_key(item)
+            if key in seen:
+                pagination['duplicates'] += 1
+                continue
+            seen.add(key)
+            items.append(item)
+            added += 1
+        return added
+    
+    next_offset = 1
+    exhausted = False
+    while not exhausted and len(items) < limit and len(pagination['pages']) < SEARCH_MAX_PAGES:
+        pages_needed = -(-(limit - len(items)) // SEARCH_PAGE_SIZE)
+        offsets = [next_offset + page * SEARCH_PAGE_SIZE
+                   for page in range(min(pages_needed, SEARCH_MAX_PAGES - len(pagination['pages'])))]
+        next_offset = offsets[-1] + SEARCH_PAGE_SIZE
+        print(f"[SEARCH] Buscando {len(offsets)} página(s) de {search_url} (offsets {offsets})")
+        
+        outcomes = await fetch_many_tiered(
+            [search_page_url(search_url, offset) for offset in offsets],
+            parse=parse_list_state,
+            page_type='list',
+            validate=bool
+        )
+        
+        # Mescla na ordem das páginas. Falha (bloqueio, timeout, prazo) só pula a página;
+        # o fim dos resultados (not_found ou página carregada sem itens) encerra a busca
+        round_added = 0
+        for offset, outcome in zip(offsets, outcomes):
+            page_items = outcome['result'] if outcome['ok'] else None
+            method = outcome.get('tier')
+            if not page_items and offset == 1:
+                # Primeira página: cascata completa (inclui OCR) antes de desistir
+                first = await scrape_with_fallback_async(
+                    url=search_url, scrape_type='list', product_term=product_term,
+                    limit=limit, include_stock=False, debug=debug
+                )
+                if not first['success']:
+                    return first
+                page_items, method = first['items'], first['method_used']
+            if method and method not in methods_tried:
+                methods_tried.append(method)
+            added = merge(page_items) if page_items else 0
+            round_added += added
+            pagination['pages'].append({
+                'offset': offset,
+                'tier': method,
+                'items': len(page_items or []),
+                'added': added,
+                'error': None if page_items else outcome.get('error') or outcome.get('reason'),
+            })
+            if not page_items and (outcome['ok'] or outcome.get('reason') == 'not_found'):
+                exhausted = True
+                break
+        if not round_added:
+            exhausted = True
+    
+    items = items[:limit]
+    pagination['elapsed'] = round(time.time() - start_time, 3)
+    print(f"[SEARCH] {len(items)} itens de {len(pagination['pages'])} página(s), {pagination['duplicates']} duplicados")
+    
+    debug_info = {'pagination': pagination}
+    enrichment = await finish_list_items_async(items, include_stock, debug=debug, progress=progress, on_item=on_item)
+    if enrichment is not None:
+        debug_info['stock_enrichment'] = enrichment
+    
+    return {
+        'success': True,
+        'method_used': methods_tried[0] if methods_tried else None,
+        'methods_tried': methods_tried,
+        'items': items,
+        'items_count': len(items),
+        'debug_info': debug_info
+    }
+
+async def search_list_async(endpoint, search_url, product_term, limit, include_stock, debug, progress=None, on_item=None):
+    """scrape_search_async atrás do cache de buscas (single-flight + LRU).
+
+    Buscas idênticas em andamento esperam o mesmo fetch. Quem é servido pelo cache ou
+    chega como seguidor não vê o progresso intermediário: recebe uma chamada final
+    `progress(items, n, n)` com o resultado (os itens de `on_item` vêm no resultado).
+    `debug` faz parte da chave: resultado sem `debug_info` nunca serve a uma busca com debug.
+    """
+    leader = False
+    
+    def fetch():
+        nonlocal leader
+        leader = True
+        return scrape_search_async(
+            search_url,
+            product_term,
+            limit,
+            include_stock,
+            debug=debug,
+            progress=progress,
+            on_item=on_item
+        )
+    
+    if not SEARCH_CACHE_ENABLED:
+        return await fetch()
+    result = await get_search_cache().get_or_fetch(endpoint, search_cache_key(search_url, limit, include_stock, debug), fetch)
+    if not leader and progress:
+        items = result.get('items') or []
+        progress(items, len(items), len(items))
+    return result
+
+async def search_products_async(args):
+    """Núcleo assíncrono de /search; retorna (payload, status)"""
     try:
-        query = request.args.get('q', '')
-        limit = int(request.args.get('limit', 50))
+        query = args.get('q', '')
+        limit = int(args.get('limit', 50))
         
         if not query:
-            return jsonify({"error": "Parâmetro 'q' (query) é obrigatório"}), 400
+            return {"error": "Parâmetro 'q' (query) é obrigatório"}, 400
         
         if limit > 200:
             limit = 200  # Limita para evitar sobrecarga
         
-        # Constrói URL de busca do Mercado Livre
+        # Constrói URL de busca do Mercado Livre (as páginas além da primeira são montadas na paginação)
         search_url = f"https://lista.mercadolivre.com.br/{query.replace(' ', '-')}"
         
-        # Adiciona parâmetros de limite se necessário
-        if limit != 50:
-            search_url += f"_Desde_{limit}"
-        
-        # Faz o scraping usando o sistema de fallback
-        result = scrape_with_fallback(
-            url=search_url,
-            scrape_type='list',
-            product_term=query,
-            limit=limit,
-            include_stock=False,
-            debug=False
-        )
+        # Faz o scraping usando o sistema de fallback (buscas idênticas compartilham o fetch)
+        result = await search_list_async('search', search_url, query, limit, include_stock=False, debug=False)
         
         if result['success']:
-            return jsonify({
+            return {
                 "success": True,
                 "query": query,
                 "search_url": search_url,
                 "method_used": result['method_used'],
                 "items_count": result['items_count'],
                 "items": result['items']
-            })
+            }, 200
         else:
-            return jsonify({
+            return {
                 "success": False,
                 "query": query,
                 "search_url": search_url,
                 "error": "Não foi possível extrair produtos",
                 "methods_tried": result.get('methods_tried', [])
-            }), 500
+            }, 500
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
-@app.route('/scrape-product', methods=['POST'])
-@log_request_duration
-def scrape_product():
-    """Endpoint com fallback em cascata: scraper tradicional -> Playwright -> OCR"""
+@app.route('/search', methods=['GET'])
+def search_products():
+    """Endpoint para buscar produtos por termo"""
+    payload, status = run_sync(search_products_async(request.args))
+    return jsonify(payload), status
+
+def scrape_product_request(data):
+    """Valida e normaliza o corpo de /scrape-product; retorna (params, erro) com erro = (payload, status)"""
+    if not data or 'product' not in data:
+        return None, ({"error": "Parâmetro 'product' é obrigatório"}, 400)
+    if not isinstance(data['product'], str) or not data['product'].strip():
+        return None, ({"error": "Parâmetro 'product' deve ser um texto não vazio"}, 400)
     try:
-        data = request.get_json()
-        
-        if not data or 'product' not in data:
-            return jsonify({"error": "Parâmetro 'product' é obrigatório"}), 400
-        
-        product_term = data['product']
-        limit = data.get('limit', 50)
-        include_stock = data.get('include_stock', True)
-        debug = data.get('debug', True)  # Habilitado por padrão para debug em produção
-        
-        if limit > 200:
-            limit = 200  # Limita para evitar sobrecarga
-        
+        limit = int(data.get('limit', 50))
+    except (TypeError, ValueError):
+        limit = None
+    if limit is None or limit < 1:
+        return None, ({"error": "Parâmetro 'limit' deve ser um inteiro >= 1"}, 400)
+    
+    product_term = data['product']
+    return {
+        'product_term': product_term,
+        'limit': min(limit, 200),  # Limita para evitar sobrecarga
+        'include_stock': data.get('include_stock', True),
+        'debug': data.get('debug', True),  # Habilitado por padrão para debug em produção
         # Constrói URL de busca do Mercado Livre automaticamente
-        search_url = f"https://lista.mercadolivre.com.br/{product_term.replace(' ', '-')}"
+        'search_url': f"https://lista.mercadolivre.com.br/{product_term.replace(' ', '-')}"
+    }, None
+
+async def scrape_product_async(data, progress=None):
+    """Núcleo assíncrono de /scrape-product; retorna (payload, status)"""
+    try:
+        params, error = scrape_product_request(data)
+        if error:
+            return error
+        
+        product_term = params['product_term']
+        limit = params['limit']
+        include_stock = params['include_stock']
+        debug = params['debug']
+        search_url = params['search_url']
         
         if debug:
             print(f"[DEBUG] Iniciando fallback em cascata para: {search_url}")
         
-        # Usa o sistema de fallback em cascata
-        result = scrape_with_fallback(
-            url=search_url,
-            scrape_type='list',
-            product_term=product_term,
-            limit=limit,
-            include_stock=include_stock,
-            debug=debug
+        # Usa o sistema de fallback em cascata (buscas idênticas compartilham o fetch)
+        result = await search_list_async(
+            'scrape-product', search_url, product_term, limit, include_stock, debug, progress=progress
         )
         
         if result['success']:
@@ -1619,20 +2110,43 @@ def scrape_product():
                 response_data['debug'] = result.get('debug_info', {})
                 response_data['methods_tried'] = result.get('methods_tried', [])
             
-            return jsonify(response_data)
+            return response_data, 200
         else:
-            return jsonify({
+            return {
                 "success": False,
                 "error": result['error'],
                 "method_attempted": result['method_used'],
                 "methods_tried": result.get('methods_tried', []),
                 "debug_info": result.get('debug_info') if debug else None
-            }), 500
+            }, 500
         
     except Exception as e:
         error_msg = str(e)
         print(f"[ERROR] Erro no scrape_product: {error_msg}")
-        return jsonify({"error": error_msg}), 500
+        return {"error": error_msg}, 500
+
+@app.route('/scrape-product', methods=['POST'])
+@log_request_duration
+def scrape_product():
+    """Endpoint com fallback em cascata: scraper tradicional -> Playwright -> OCR"""
+    try:
+        data = request.get_json()
+    except Exception as e:
+        print(f"[ERROR] Erro no scrape_product: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    if wants_ndjson():
+        try:
+            params, error = scrape_product_request(data)
+        except Exception as e:
+            print(f"[ERROR] Erro no scrape_product: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+        if error:
+            return jsonify(error[0]), error[1]
+        return ndjson_response(scrape_product_stream_async(params))
+    
+    payload, status = run_sync(scrape_product_async(data))
+    return jsonify(payload), status
 
 # ENDPOINT /test-bypass COMENTADO - USA SCRAPER TRADICIONAL
 # @app.route('/test-bypass', methods=['POST'])
@@ -1776,22 +2290,29 @@ def scrape_product():
 #             'error': str(e)
 #         }), 500
 
-@app.route('/scrape-product-details', methods=['POST'])
-@log_request_duration
-def scrape_product_details():
-    """Endpoint com fallback em cascata: scraper tradicional -> Playwright -> OCR"""
+async def scrape_product_details_async(data, interactive=True):
+    """Núcleo assíncrono de /scrape-product-details; retorna (payload, status).
+
+    `interactive` (cliente esperando a resposta) faz hedge por padrão; jobs passam False.
+    """
     try:
-        data = request.get_json()
         if not data or 'url' not in data:
-            return jsonify({"error": "URL é obrigatória"}), 400
+            return {"error": "URL é obrigatória"}, 400
         
         original_url = data['url']
         debug = data.get('debug', True)  # DEBUG FORÇADO PARA PRODUÇÃO
         include_html = data.get('include_html', False)
+        hedge = bool(data.get('hedge', interactive))
+        max_age = data.get('max_age')
+        if max_age is not None:
+            try:
+                max_age = float(max_age)
+            except (TypeError, ValueError):
+                return {"error": "max_age deve ser um número de segundos"}, 400
         
         # Valida se é uma URL de produto específico do Mercado Livre
-        if not validate_product_url(original_url):
-            return jsonify({"error": "URL deve ser de um produto específico do Mercado Livre com MLB ID (ex: produto.mercadolivre.com.br/MLB-123456789)"}), 400
+        if not await asyncio.to_thread(validate_product_url, original_url):
+            return {"error": "URL deve ser de um produto específico do Mercado Livre com MLB ID (ex: produto.mercadolivre.com.br/MLB-123456789)"}, 400
         
         if debug:
             print(f"[DEBUG] URL original: {original_url}")
@@ -1801,92 +2322,548 @@ def scrape_product_details():
         if 'click' in original_url or 'mclics' in original_url:
             if debug:
                 print("[DEBUG] Detectada URL de tracking, seguindo redirects...")
-            working_url = follow_redirects(original_url)
+            working_url, _mlb_id = await asyncio.to_thread(resolve_tracking_url, original_url)
             if debug:
                 print(f"[DEBUG] URL após redirects: {working_url}")
         
-        # Tenta primeiro com a URL original/após redirects
+        # Cache por MLB ID (o HTML não fica em cache, então include_html sempre vai à página)
+        mlb_id = extract_mlb_id_from_url(normalize_product_url(working_url) or '')
+        if not PRODUCT_CACHE_ENABLED or not mlb_id or include_html:
+            return await scrape_product_details_uncached_async(original_url, working_url, debug, include_html, hedge)
+        
+        cache = get_product_cache()
+        cached, age, state = cache.lookup(mlb_id, max_age)
+        if state != 'miss':
+            refreshing = False
+            if state == 'stale':
+                refreshing = cache.refresh_in_background(
+                    mlb_id, lambda: scrape_product_details_uncached_async(original_url, working_url, False, False)
+                )
+            if debug:
+                print(f"[CACHE] Produto MLB{mlb_id} servido do cache ({state}, {age:.0f}s)")
+            response_data = {**cached, "original_url": original_url}
+            response_data['cache'] = {"status": state, "age": round(age, 1), "refreshing": refreshing}
+            return response_data, 200
+        
+        response_data, status = await scrape_product_details_uncached_async(original_url, working_url, debug, include_html, hedge)
+        if status == 200:
+            cache.store(mlb_id, {key: value for key, value in response_data.items() if key not in ('debug', 'methods_tried')})
+            response_data['cache'] = {"status": "miss", "age": 0, "refreshing": False}
+        return response_data, status
+        
+    except Exception as e:
+        print(f"Erro no scraping detalhado: {str(e)}")
+        return {"error": str(e)}, 500
+
+async def scrape_product_details_uncached_async(original_url, working_url, debug, include_html, hedge=False):
+    """Scrape de detalhes com fallback (URL resolvida e depois normalizada), sem passar pelo cache"""
+    # Tenta primeiro com a URL original/após redirects
+    if debug:
+        print(f"[DEBUG] Iniciando fallback em cascata para: {working_url}")
+    
+    result = await scrape_with_fallback_async(
+        url=working_url,
+        scrape_type='details',
+        debug=debug,
+        hedge=hedge
+    )
+    
+    if result['success'] and result['product'] and result['product'].get('title'):
+        response_data = {
+            "success": True,
+            "original_url": original_url,
+            "used_url": working_url,
+            "method_used": result['method_used'],
+            "status_code": 200,
+            "product": result['product']
+        }
+        
+        # Incluir HTML se solicitado
+        if include_html and 'html_content' in result:
+            html_content = result['html_content']
+            if len(html_content) > 500000:  # 500KB limit
+                response_data['html_warning'] = f"HTML muito grande ({len(html_content)} chars), truncado para 500KB"
+                response_data['html_content'] = html_content[:500000] + "\n\n[TRUNCATED - HTML content was too large]"
+            else:
+                response_data['html_content'] = html_content
+            response_data['html_size'] = len(html_content)
+        
         if debug:
-            print(f"[DEBUG] Iniciando fallback em cascata para: {working_url}")
+            response_data['debug'] = result.get('debug_info', {})
+            response_data['methods_tried'] = result.get('methods_tried', [])
         
-        result = scrape_with_fallback(
-            url=working_url,
-            scrape_type='details',
-            debug=debug
-        )
+        return response_data, 200
+    
+    # Produto inexistente: a URL normalizada levaria à mesma página
+    if result.get('page_class') == NOT_FOUND:
+        return {
+            "success": False,
+            "error": result['error'],
+            "page_class": NOT_FOUND,
+            "methods_tried": result.get('methods_tried', []),
+            "debug_info": result.get('debug_info') if debug else None
+        }, 404
+    
+    # Se falhou, tenta com URL normalizada como último recurso
+    normalized_url = normalize_product_url(working_url)
+    if not normalized_url:
+        return {
+            "error": "Não foi possível extrair dados do produto com nenhum método",
+            "method_attempted": result['method_used'],
+            "methods_tried": result.get('methods_tried', []),
+            "debug_info": result.get('debug_info') if debug else None
+        }, 500
+    
+    if debug:
+        print(f"[DEBUG] Tentando com URL normalizada: {normalized_url}")
+    
+    # Última tentativa com URL normalizada
+    result_normalized = await scrape_with_fallback_async(
+        url=normalized_url,
+        scrape_type='details',
+        debug=debug,
+        hedge=hedge
+    )
+    
+    if result_normalized['success']:
+        response_data = {
+            "success": True,
+            "original_url": original_url,
+            "used_url": normalized_url,
+            "method_used": result_normalized['method_used'],
+            "status_code": 200,
+            "product": result_normalized['product']
+        }
         
-        if result['success'] and result['product'] and result['product'].get('title'):
-            response_data = {
-                "success": True,
-                "original_url": original_url,
+        if debug:
+            response_data['debug'] = result_normalized.get('debug_info', {})
+            response_data['methods_tried'] = result_normalized.get('methods_tried', [])
+        
+        return response_data, 200
+    else:
+        return {
+            "success": False,
+            "error": result_normalized['error'],
+            "method_attempted": result_normalized['method_used'],
+            "methods_tried": result_normalized.get('methods_tried', []),
+            "debug_info": result_normalized.get('debug_info') if debug else None
+        }, 500
+
+@app.route('/scrape-product-details', methods=['POST'])
+@log_request_duration
+def scrape_product_details():
+    """Endpoint com fallback em cascata: scraper tradicional -> Playwright -> OCR"""
+    try:
+        data = request.get_json()
+    except Exception as e:
+        print(f"Erro no scraping detalhado: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    payload, status = run_sync(scrape_product_details_async(data))
+    return jsonify(payload), status
+
+# Limites do endpoint de lote
+PRODUCT_BATCH_MAX_URLS = int(os.getenv('PRODUCT_BATCH_MAX_URLS', '300'))
+PRODUCT_BATCH_REDIRECT_CONCURRENCY = int(os.getenv('PRODUCT_BATCH_REDIRECT_CONCURRENCY', '16'))
+PRODUCT_BATCH_DEADLINE = float(os.getenv('PRODUCT_BATCH_DEADLINE', '900'))
+
+async def resolve_product_url(url, semaphore):
+    """Valida e resolve uma URL do lote; retorna (working_url, mlb_id, erro, segundos)"""
+    start_time = time.time()
+    if not isinstance(url, str) or not validate_mercadolivre_url(url):
+        return None, None, "URL não é do Mercado Livre", 0.0
+    
+    working_url, mlb_id = url, None
+    if 'click' in url or 'mclics' in url:
+        async with semaphore:
+            working_url, mlb_id = await asyncio.to_thread(resolve_tracking_url, url)
+    
+    mlb_id = mlb_id or extract_mlb_id_from_url(working_url) or extract_mlb_id_from_url(url)
+    elapsed = round(time.time() - start_time, 3)
+    if not mlb_id:
+        return working_url, None, "URL deve ser de um produto específico do Mercado Livre com MLB ID", elapsed
+    return working_url, mlb_id, None, elapsed
+
+def batch_request_error(data):
+    """Valida o corpo de /scrape-product-details/batch; retorna (payload, status) do erro ou None"""
+    if not data or not isinstance(data.get('urls'), list) or not data['urls']:
+        return {"error": "Parâmetro 'urls' (lista) é obrigatório"}, 400
+    if len(data['urls']) > PRODUCT_BATCH_MAX_URLS:
+        return {"error": f"Máximo de {PRODUCT_BATCH_MAX_URLS} URLs por lote (recebidas {len(data['urls'])})"}, 400
+    concurrency = data.get('concurrency')
+    if concurrency is not None:
+        try:
+            concurrency = int(concurrency)
+        except (TypeError, ValueError):
+            concurrency = None
+        if concurrency is None or concurrency < 1:
+            return {"error": "Parâmetro 'concurrency' deve ser um inteiro >= 1"}, 400
+    return None
+
+async def scrape_product_details_batch_async(data, emit=None):
+    """Núcleo assíncrono de /scrape-product-details/batch; retorna (payload, status)
+
+    Deduplica por MLB id, resolve links de tracking em paralelo e busca os
+    produtos únicos com paralelismo limitado pelo browser pool. Cada URL de
+    entrada recebe seu próprio resultado, erro e tempos; `emit(index, result)`
+    é chamado assim que o resultado de uma URL fica definitivo.
+    """
+    try:
+        error = batch_request_error(data)
+        if error:
+            return error
+        
+        urls = data['urls']
+        debug = data.get('debug', False)
+        pool = get_browser_pool()
+        concurrency = max(1, min(int(data.get('concurrency') or pool.capacity()), pool.capacity()))
+        batch_start = time.time()
+        
+        # 1. Validação e redirects em paralelo
+        redirect_semaphore = asyncio.Semaphore(PRODUCT_BATCH_REDIRECT_CONCURRENCY)
+        resolved = await asyncio.gather(*(resolve_product_url(url, redirect_semaphore) for url in urls))
+        resolve_time = round(time.time() - batch_start, 3)
+        
+        results = []
+        first_by_mlb = {}   # mlb_id -> índice da primeira URL com esse id
+        duplicates = {}     # índice da primeira URL -> índices das repetições
+        for index, (url, (working_url, mlb_id, error, elapsed)) in enumerate(zip(urls, resolved)):
+            result = {
+                "url": url,
+                "mlb_id": mlb_id,
                 "used_url": working_url,
-                "method_used": result['method_used'],
-                "status_code": 200,
-                "product": result['product']
+                "success": False,
+                "timings": {"resolve": elapsed, "fetch": None}
             }
-            
-            # Incluir HTML se solicitado
-            if include_html and 'html_content' in result:
-                html_content = result['html_content']
-                if len(html_content) > 500000:  # 500KB limit
-                    response_data['html_warning'] = f"HTML muito grande ({len(html_content)} chars), truncado para 500KB"
-                    response_data['html_content'] = html_content[:500000] + "\n\n[TRUNCATED - HTML content was too large]"
+            if error:
+                result['error'] = error
+            elif mlb_id in first_by_mlb:
+                result['duplicate_of'] = first_by_mlb[mlb_id]
+                duplicates[first_by_mlb[mlb_id]].append(index)
+            else:
+                first_by_mlb[mlb_id] = index
+                duplicates[index] = []
+            results.append(result)
+        
+        finalized = set()
+        
+        def finalize(index):
+            """Fecha o resultado de uma URL (e das repetições dela) e emite"""
+            for target in [index] + duplicates.get(index, []):
+                result = results[target]
+                if target != index:
+                    original = results[index]
+                    result['success'] = original['success']
+                    result['used_url'] = original['used_url']
+                    if original['success']:
+                        result['product'] = original['product']
+                        result['tier'] = original.get('tier')
+                    else:
+                        result['error'] = original.get('error')
+                result['timings']['total'] = round(result['timings']['resolve'] + (result['timings']['fetch'] or 0), 3)
+                finalized.add(target)
+                if emit:
+                    emit(target, result)
+        
+        for index, result in enumerate(results):
+            if 'error' in result:
+                finalize(index)
+        
+        unique_indexes = list(first_by_mlb.values())
+        if debug:
+            print(f"[BATCH] {len(urls)} URL(s), {len(unique_indexes)} produto(s) único(s), redirects em {resolve_time}s")
+        
+        # 2. Busca dos produtos únicos pelo pool; falhas tentam de novo com a URL normalizada
+        fetch_start = time.time()
+        retries = {}   # índice -> URL normalizada para a segunda tentativa
+        
+        def apply_outcome(indexes, last_attempt):
+            def on_result(position, outcome):
+                index = indexes[position]
+                result = results[index]
+                result['timings']['fetch'] = round((result['timings']['fetch'] or 0) + (outcome['elapsed'] or 0), 3)
+                product = outcome['result'] if outcome['ok'] else None
+                if product and product.get('title'):
+                    result['success'] = True
+                    result['product'] = product
+                    result['tier'] = outcome.get('tier')
+                    result.pop('error', None)
+                    finalize(index)
+                    return
+                
+                result['error'] = outcome['error'] or "Não foi possível extrair dados do produto"
+                normalized_url = normalize_product_url(result['used_url'])
+                if not last_attempt and normalized_url and normalized_url != result['used_url']:
+                    retries[index] = normalized_url
                 else:
-                    response_data['html_content'] = html_content
-                response_data['html_size'] = len(html_content)
-            
-            if debug:
-                response_data['debug'] = result.get('debug_info', {})
-                response_data['methods_tried'] = result.get('methods_tried', [])
-            
-            return jsonify(response_data)
+                    finalize(index)
+            return on_result
+        
+        pending = unique_indexes
+        for last_attempt in (False, True):
+            if not pending:
+                break
+            remaining = max(1.0, PRODUCT_BATCH_DEADLINE - (time.time() - batch_start))
+            await fetch_many_tiered(
+                [results[index]['used_url'] for index in pending],
+                parse=extract_product_details,
+                page_type='details',
+                parse_with_url=True,
+                validate=lambda product: product and product.get('title') not in (None, '', 'Produto sem título'),
+                concurrency=concurrency,
+                deadline=remaining,
+                on_result=apply_outcome(pending, last_attempt)
+            )
+            pending = list(retries)
+            for index, normalized_url in retries.items():
+                results[index]['used_url'] = normalized_url
+            retries.clear()
+        fetch_time = round(time.time() - fetch_start, 3)
+        
+        # URLs canceladas pelo prazo global não passaram pelo callback
+        for index in unique_indexes:
+            if index not in finalized:
+                results[index].setdefault('error', f"prazo global de {PRODUCT_BATCH_DEADLINE}s excedido")
+                finalize(index)
+        
+        succeeded = sum(1 for result in results if result['success'])
+        return {
+            "success": True,
+            "requested": len(urls),
+            "unique_products": len(unique_indexes),
+            "duplicates": sum(1 for result in results if 'duplicate_of' in result),
+            "succeeded": succeeded,
+            "failed": len(urls) - succeeded,
+            "timings": {
+                "resolve": resolve_time,
+                "fetch": fetch_time,
+                "total": round(time.time() - batch_start, 3),
+                "concurrency": concurrency
+            },
+            "results": results
+        }, 200
         
-        # Se falhou, tenta com URL normalizada como último recurso
-        normalized_url = normalize_product_url(working_url)
-        if not normalized_url:
-            return jsonify({
-                "error": "Não foi possível extrair dados do produto com nenhum método",
-                "method_attempted": result['method_used'],
-                "methods_tried": result.get('methods_tried', []),
-                "debug_info": result.get('debug_info') if debug else None
-            }), 500
+    except Exception as e:
+        print(f"[BATCH] Erro no scraping em lote: {str(e)}")
+        return {"error": str(e)}, 500
+
+@app.route('/scrape-product-details/batch', methods=['POST'])
+@log_request_duration
+def scrape_product_details_batch():
+    """Detalhes de vários produtos numa chamada, com fan-out paralelo pelo browser pool"""
+    try:
+        data = request.get_json()
+    except Exception as e:
+        print(f"[BATCH] Erro no scraping em lote: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    if wants_ndjson():
+        error = batch_request_error(data)
+        if error:
+            return jsonify(error[0]), error[1]
+        return ndjson_response(scrape_product_details_batch_stream_async(data))
+    
+    payload, status = run_sync(scrape_product_details_batch_async(data))
+    return jsonify(payload), status
+
+# Streaming NDJSON (Accept: application/x-ndjson) para /scrape-product e /scrape-product-details/batch
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_ndjson():
+    return NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+def ndjson_line(obj):
+    """Serializa um objeto como uma linha NDJSON (mesmo provider JSON do jsonify)"""
+    return app.json.dumps(obj, separators=(',', ':')) + '\n'
+
+def ndjson_response(agen):
+    """Response Flask que consome o gerador assíncrono no loop do worker, linha a linha"""
+    lines = (ndjson_line(obj) for obj in iterate_sync(agen))
+    return Response(lines, mimetype=NDJSON_MIMETYPE, headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+async def stream_callback_values(start):
+    """Executa start(emit) e gera (False, args) para cada emit(*args) assim que chega; por último (True, retorno)"""
+    queue = asyncio.Queue()
+    task = asyncio.create_task(start(lambda *args: queue.put_nowait(args)))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _pending = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield False, getter.result()
+                continue
+            getter.cancel()
+            break
+        while not queue.empty():
+            yield False, queue.get_nowait()
+        yield True, task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def scrape_product_stream_async(params):
+    """Versão NDJSON de /scrape-product.
+
+    Gera uma linha `{"type": "item"}` por produto assim que o estoque dele fica
+    pronto (ou logo após o parse, sem estoque) e uma linha final
+    `{"type": "summary"}` com método, métodos tentados e tempos.
+    """
+    start_time = time.time()
+    positions = {}
+    streamed = set()
+    first_item_time = None
+    result = None
+    
+    def remember_positions(items, done, total):
+        if not positions:
+            positions.update({id(item): index for index, item in enumerate(items)})
+    
+    def item_line(item, index):
+        streamed.add(id(item))
+        return {"type": "item", "index": index, "item": item}
+    
+    async for final, value in stream_callback_values(lambda emit: search_list_async(
+        'scrape-product', params['search_url'], params['product_term'], params['limit'],
+        params['include_stock'], params['debug'], progress=remember_positions, on_item=emit
+    )):
+        if final:
+            result = value
+            break
+        item, = value
+        if first_item_time is None:
+            first_item_time = round(time.time() - start_time, 3)
+        yield item_line(item, positions.get(id(item)))
+    
+    # Itens que não passaram pelo enriquecimento (sem estoque ou via OCR)
+    for index, item in enumerate(result.get('items') or []):
+        if id(item) not in streamed:
+            if first_item_time is None:
+                first_item_time = round(time.time() - start_time, 3)
+            yield item_line(item, index)
+    
+    debug_info = result.get('debug_info') or {}
+    summary = {
+        "type": "summary",
+        "success": result['success'],
+        "product_search": params['product_term'],
+        "search_url": params['search_url'],
+        "method_used": result['method_used'],
+        "methods_tried": result.get('methods_tried', []),
+        "items_count": len(result.get('items') or []),
+        "include_stock": params['include_stock'],
+        "timings": {
+            "first_item": first_item_time,
+            "fetch": (debug_info.get('browser_lease') or {}).get('total_time'),
+            "stock": (debug_info.get('stock_enrichment') or {}).get('elapsed'),
+            "total": round(time.time() - start_time, 3)
+        }
+    }
+    if not result['success']:
+        summary['error'] = result.get('error')
+    if params['debug']:
+        summary['debug'] = debug_info
+    yield summary
+
+async def scrape_product_details_batch_stream_async(data):
+    """Versão NDJSON do lote: uma linha `{"type": "result"}` por URL assim que fica definitiva e um resumo final"""
+    async for final, value in stream_callback_values(lambda emit: scrape_product_details_batch_async(data, emit=emit)):
+        if not final:
+            index, result = value
+            yield {"type": "result", "index": index, "result": result}
+            continue
+        
+        payload, _status = value
+        payload.pop('results', None)
+        yield {"type": "summary", **payload}
+
+async def run_details_job(params, progress):
+    """Job de detalhes: um único produto, progresso 0/1 -> 1/1"""
+    progress(None, 0, 1)
+    payload, status = await scrape_product_details_async(params, interactive=False)
+    progress(None, 1, 1)
+    return payload, status
+
+# Tipos de job aceitos por POST /jobs -> (parâmetro obrigatório, núcleo assíncrono)
+JOB_TYPES = {
+    'search': ('product', scrape_product_async),
+    'details': ('url', run_details_job),
+}
+
+def job_handlers():
+    return {job_type: handler for job_type, (_required, handler) in JOB_TYPES.items()}
+
+def start_job_workers():
+    """Inicia os consumidores de jobs deste processo; chamado na subida do worker
+    (post_worker_init do gunicorn, lifespan do ASGI ou app.run), para que jobs na fila
+    ou devolvidos por um restart andem sem depender de alguém chamar /jobs"""
+    return ensure_job_workers(job_handlers())
+
+def serialize_job(job):
+    """Formato público de um job para GET /jobs/<id>"""
+    response = {
+        "job_id": job['id'],
+        "type": job['type'],
+        "status": job['status'],
+        "progress": {
+            "done": job['progress_done'],
+            "total": job['progress_total']
+        },
+        "attempts": job['attempts'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at'],
+        "params": job['params']
+    }
+    if job['status'] in ('done', 'failed'):
+        response['result'] = job['result']
+        response['http_status'] = job['http_status']
+        response['error'] = job['error']
+    elif job['partial'] is not None:
+        # Itens já extraídos, com estoque preenchido conforme o enriquecimento avança
+        response['partial_results'] = job['partial']
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Enfileira um scrape longo (busca com estoque ou detalhes) e retorna o id do job"""
+    try:
+        data = request.get_json() or {}
+        job_type = data.get('type')
         
-        if debug:
-            print(f"[DEBUG] Tentando com URL normalizada: {normalized_url}")
+        if job_type not in JOB_TYPES:
+            return jsonify({"error": f"Parâmetro 'type' deve ser um de: {', '.join(JOB_TYPES)}"}), 400
         
-        # Última tentativa com URL normalizada
-        result_normalized = scrape_with_fallback(
-            url=normalized_url,
-            scrape_type='details',
-            debug=debug
-        )
+        required, _handler = JOB_TYPES[job_type]
+        params = data.get('params') or {key: value for key, value in data.items() if key != 'type'}
+        if required not in params:
+            return jsonify({"error": f"Parâmetro '{required}' é obrigatório para jobs do tipo '{job_type}'"}), 400
         
-        if result_normalized['success']:
-            response_data = {
-                "success": True,
-                "original_url": original_url,
-                "used_url": normalized_url,
-                "method_used": result_normalized['method_used'],
-                "status_code": 200,
-                "product": result_normalized['product']
-            }
-            
-            if debug:
-                response_data['debug'] = result_normalized.get('debug_info', {})
-                response_data['methods_tried'] = result_normalized.get('methods_tried', [])
-            
-            return jsonify(response_data)
-        else:
-            return jsonify({
-                "success": False,
-                "error": result_normalized['error'],
-                "method_attempted": result_normalized['method_used'],
-                "methods_tried": result_normalized.get('methods_tried', []),
-                "debug_info": result_normalized.get('debug_info') if debug else None
-            }), 500
+        job_id = get_job_store().create(job_type, params)
+        
+        print(f"[JOBS] Job {job_id} ({job_type}) enfileirado")
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
-        print(f"Erro no scraping detalhado: {str(e)}")
+        print(f"[JOBS] Erro ao enfileirar job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, progresso e resultados (parciais ou finais) de um job"""
+    try:
+        job = get_job_store().get(job_id)
+        if job is None:
+            return jsonify({"error": "Job não encontrado"}), 404
+        
+        return jsonify(serialize_job(job))
+        
+    except Exception as e:
+        print(f"[JOBS] Erro ao consultar job {job_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/categories', methods=['GET'])
@@ -2018,6 +2995,7 @@ if __name__ == '__main__':
     # Para desenvolvimento local e produção
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('FLASK_ENV', 'development') == 'development'
+    start_job_workers()
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
 
 # Configurar logging do Gunicorn com níveis corretos
@@ -0,0 +1,205 @@
+# asgi.py
+# Modo ASGI: /search, /scrape-product e /scrape-product-details(/batch) aguardam o núcleo
+# Playwright diretamente no event loop do servidor; o restante da API continua no
+# Flask (via WsgiToAsgi, uma thread do executor por requisição), então /health segue
+# respondendo durante os scrapes.
+#
+# Com Accept: application/x-ndjson, /scrape-product e o lote respondem em streaming.
+#
+# Uso: gunicorn -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8080 asgi:app
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import async_runtime
+from browser_pool import drain_browser_pool
+from metrics import observe_request
+from api import (
+    app as flask_app, search_products_async, scrape_product_async,
+    scrape_product_details_async, scrape_product_details_batch_async,
+    scrape_product_request, batch_request_error, ndjson_line, NDJSON_MIMETYPE,
+    scrape_product_stream_async, scrape_product_details_batch_stream_async, start_job_workers
+)
+
+class ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    """WsgiToAsgiInstance com cada chamada numa thread do executor (thread_sensitive=False).
+
+    O padrão do asgiref (thread_sensitive=True) serializa todas as rotas Flask numa única
+    thread: um scrape de debug lento travaria /health e /metrics.
+    """
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+wsgi_app = ThreadPoolWsgiToAsgi(flask_app)
+
+async def read_json_body(receive):
+    """Lê o corpo da requisição e faz o parse do JSON"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    if not body:
+        return None
+    return json.loads(body)
+
+def query_args(scope):
+    """Query string como dict (primeiro valor de cada chave, como request.args.get)"""
+    args = {}
+    for key, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+        args.setdefault(key, value)
+    return args
+
+async def handle_search(scope, receive):
+    return await search_products_async(query_args(scope))
+
+async def handle_scrape_product(scope, receive):
+    return await scrape_product_async(await read_json_body(receive))
+
+async def handle_scrape_product_details(scope, receive):
+    return await scrape_product_details_async(await read_json_body(receive))
+
+async def handle_scrape_product_details_batch(scope, receive):
+    return await scrape_product_details_batch_async(await read_json_body(receive))
+
+# Rotas atendidas nativamente em async; o resto vai para o Flask
+ASYNC_ROUTES = {
+    ('GET', '/search'): handle_search,
+    ('POST', '/scrape-product'): handle_scrape_product,
+    ('POST', '/scrape-product-details'): handle_scrape_product_details,
+    ('POST', '/scrape-product-details/batch'): handle_scrape_product_details_batch,
+}
+
+def open_scrape_product_stream(data):
+    params, error = scrape_product_request(data)
+    return (None, error) if error else (scrape_product_stream_async(params), None)
+
+def open_batch_stream(data):
+    error = batch_request_error(data)
+    return (None, error) if error else (scrape_product_details_batch_stream_async(data), None)
+
+# Rotas que respondem NDJSON com Accept: application/x-ndjson -> (payload) -> (gerador, erro)
+STREAM_ROUTES = {
+    ('POST', '/scrape-product'): open_scrape_product_stream,
+    ('POST', '/scrape-product-details/batch'): open_batch_stream,
+}
+
+def accepts_ndjson(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'accept' and NDJSON_MIMETYPE.encode() in value:
+            return True
+    return False
+
+async def send_ndjson_stream(receive, send, agen):
+    """Envia cada objeto do gerador como uma linha assim que fica pronto; para se o cliente desconectar"""
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', NDJSON_MIMETYPE.encode()),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+
+    async def pump():
+        async for obj in agen:
+            await send({'type': 'http.response.body', 'body': ndjson_line(obj).encode('utf-8'), 'more_body': True})
+
+    pump_task = asyncio.create_task(pump())
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await asyncio.wait({pump_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not pump_task.done():
+            pump_task.cancel()
+            await asyncio.gather(pump_task, return_exceptions=True)
+        await agen.aclose()
+
+    if pump_task.done() and not pump_task.cancelled():
+        error = pump_task.exception()
+        if error is not None:
+            await send({'type': 'http.response.body', 'body': ndjson_line({"type": "error", "error": str(error)}).encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+async def send_response(send, body, status, content_type=b'application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, payload, status):
+    # Mesmo serializador do jsonify, para manter o JSON idêntico ao do modo WSGI
+    body = flask_app.json.response(payload).get_data()
+    await send_response(send, body, status)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # O loop do servidor passa a ser o dono dos objetos Playwright deste worker
+            async_runtime.adopt_loop(asyncio.get_running_loop())
+            # Consumidores de jobs só depois do loop adotado, para rodarem nele
+            start_job_workers()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await drain_browser_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_app(scope, receive, send)
+        return
+
+    start_time = time.time()
+    stream_opener = STREAM_ROUTES.get((scope['method'], scope['path']))
+    if stream_opener and accepts_ndjson(scope):
+        try:
+            agen, error = stream_opener(await read_json_body(receive))
+        except Exception as e:
+            agen, error = None, ({"error": str(e)}, 500)
+        if error:
+            await send_json(send, *error)
+        else:
+            await send_ndjson_stream(receive, send, agen)
+        duration = time.time() - start_time
+        observe_request(scope['path'], scope['method'], error[1] if error else 200, duration)
+        flask_app.logger.info(f"[REQUEST_DURATION] {scope['method']} {scope['path']} - {duration:.3f}s (asgi, ndjson)")
+        return
+
+    try:
+        payload, status = await handler(scope, receive)
+    except Exception as e:
+        payload, status = {"error": str(e)}, 500
+
+    duration = time.time() - start_time
+    observe_request(scope['path'], scope['method'], status, duration)
+    flask_app.logger.info(f"[REQUEST_DURATION] {scope['method']} {scope['path']} - {duration:.3f}s (asgi)")
+    await send_json(send, payload, status)
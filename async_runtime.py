@@ -0,0 +1,145 @@
+# async_runtime.py
+# Event loop de longa duração por worker: dono de todos os objetos Playwright,
+# com uma facade síncrona para os handlers Flask
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class AsyncRuntime:
+    """Uma thread com um event loop que vive enquanto o worker viver.
+
+    Código síncrono envia corrotinas com `submit()` (retorna um
+    concurrent.futures.Future) ou `run()` (espera o resultado). Como o loop
+    nunca é destruído, navegadores e contextos sobrevivem entre chamadas e
+    várias buscas podem estar em andamento ao mesmo tempo.
+    """
+
+    def __init__(self, loop=None):
+        # Com `loop` o runtime adota um loop já em execução (ex.: o do servidor ASGI)
+        self.owns_loop = loop is None
+        if loop is not None:
+            self.loop = loop
+            self.thread = threading.current_thread()
+            return
+
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='async-runtime', daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def in_runtime_thread(self):
+        return threading.current_thread() is self.thread
+
+    def submit(self, coro):
+        """Agenda a corrotina no loop do runtime e retorna um Future"""
+        if self.loop.is_closed():
+            coro.close()
+            raise RuntimeError("Async runtime já foi encerrado")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Executa a corrotina no loop do runtime e bloqueia até o resultado"""
+        if self.in_runtime_thread():
+            coro.close()
+            raise RuntimeError("run() chamado de dentro do loop do runtime; use await")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, timeout=5):
+        """Para o loop e espera a thread terminar (loops adotados pertencem ao servidor)"""
+        if not self.owns_loop or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+# Um runtime por processo (gunicorn --preload importa o módulo no master antes do fork)
+_runtime = None
+_runtime_pid = None
+_runtime_lock = threading.Lock()
+
+def get_runtime():
+    """Retorna o runtime do processo atual, criando-o se necessário"""
+    global _runtime, _runtime_pid
+
+    with _runtime_lock:
+        if _runtime is None or _runtime_pid != os.getpid():
+            _runtime = AsyncRuntime()
+            _runtime_pid = os.getpid()
+            logger.info(f"Async runtime iniciado no processo {_runtime_pid}")
+        return _runtime
+
+def adopt_loop(loop):
+    """Usa o loop do servidor ASGI como runtime do worker (chamado no startup, de dentro do loop)"""
+    global _runtime, _runtime_pid
+
+    with _runtime_lock:
+        if _runtime is not None and _runtime_pid == os.getpid() and _runtime.loop is not loop:
+            logger.warning("Async runtime já existia; os objetos Playwright dele serão substituídos")
+            _runtime.stop()
+        _runtime = AsyncRuntime(loop=loop)
+        _runtime_pid = os.getpid()
+        logger.info(f"Async runtime adotou o loop do servidor no processo {_runtime_pid}")
+        return _runtime
+
+def submit(coro):
+    """Facade síncrona: agenda `coro` no loop do worker e retorna um Future"""
+    return get_runtime().submit(coro)
+
+def run_sync(coro, timeout=None):
+    """Facade síncrona: executa `coro` no loop do worker e retorna o resultado"""
+    return get_runtime().run(coro, timeout=timeout)
+
+async def _anext(agen):
+    return await agen.__anext__()
+
+async def _aclose(agen):
+    await agen.aclose()
+
+def iterate_sync(agen, timeout=None):
+    """Facade síncrona para geradores assíncronos: consome `agen` no loop do worker, item a item.
+
+    Se o consumidor parar antes do fim (ex.: cliente desconectou), o gerador é
+    fechado no loop e cancela o trabalho pendente.
+    """
+    runtime = get_runtime()
+    try:
+        while True:
+            try:
+                yield runtime.run(_anext(agen), timeout=timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        try:
+            runtime.run(_aclose(agen), timeout=30)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar gerador assíncrono: {e}")
+
+def shutdown_runtime():
+    """Encerra o loop do worker (registrado no atexit)"""
+    global _runtime
+
+    if _runtime is None or _runtime_pid != os.getpid():
+        return
+    _runtime.stop()
+    _runtime = None
+
+atexit.register(shutdown_runtime)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara os motores de parse_list_items: BeautifulSoup + CSS ('bs4') contra lxml +
+XPath pré-compilado ('lxml'). Confere a saída item a item e mede o tempo. Também
+confere o parser incremental (iter_list_items) com a página inteira, com `limit` e
+com pedaços de tamanhos variados, e mede o parse com limit=5.
+
+Uso:
+    python bench_list_parser.py listagem1.html listagem2.html ...
+
+Sem arquivos, usa um corpus sintético com as variações de card que os seletores
+cobrem (preço anterior, centavos, imagem lazy/carrossel, reviews, patrocinado,
+comentários e <script> dentro do card, layout sem <li>).
+"""
+
+import random
+import sys
+import time
+
+from selectors_ml import parse_list_items, iter_list_items, html_chunks
+
+def card(rng, n, variant):
+    """Um <li> de resultado no formato poly-card"""
+    link = f"https://produto.mercadolivre.com.br/MLB-{4000000000 + n}-produto-{n}-_JM"
+    if variant == 'tracking':
+        link = f"https://click1.mercadolivre.com.br/mclics/clicks/external/MLB/count?a={n}&amp;b=x"
+    title = f"Produto {n} &amp; acessório <!-- comentário --> <b>extra</b>"
+    picture = (f'<img class="poly-component__picture" data-src="https://http2.mlstatic.com/D_{n}.webp" '
+               f'src="data:image/gif;base64,R0lGOD" aria-hidden="true">')
+    if variant == 'carousel':
+        portada = (f'<div class="andes-carousel-snapped__slide"><img class="poly-component__picture" '
+                   f'src="https://http2.mlstatic.com/C_{n}.webp"></div>')
+    elif variant == 'placeholder':
+        portada = '<div class="poly-card__portada"><img class="poly-component__picture" src="data:image/gif;base64,R0lGOD"></div>'
+    else:
+        portada = f'<div class="poly-card__portada">{picture}</div>'
+    previous = ''
+    if variant in ('promo', 'tracking'):
+        previous = ('<s class="andes-money-amount andes-money-amount--previous">'
+                    f'<span class="andes-money-amount__fraction">{n + 100}</span>'
+                    '<span class="andes-money-amount__cents">90</span></s>'
+                    '<span class="andes-money-amount__discount">\n  15%&nbsp;OFF </span>')
+    cents = '' if variant == 'integer' else f'<span class="andes-money-amount__cents">{n % 100:02d}</span>'
+    reviews = ''
+    if variant != 'no_reviews':
+        reviews = ('<div class="poly-component__reviews"><span class="poly-reviews__rating">4.8</span>'
+                   f'<span class="poly-reviews__total">({rng.randint(1, 9999)})</span></div>')
+    ads = '<span class="poly-component__ads-promotions">Patrocinado</span>' if variant == 'ads' else ''
+    return (
+        f'<li class="ui-search-layout__item  shops__layout-item">'
+        f'<div class="poly-card poly-card--list">{portada}<div class="poly-card__content">'
+        f'<span class="poly-component__brand">MARCA{n}</span>'
+        f'<h3 class="poly-component__title-wrapper"><a href="{link}" class="poly-component__title">{title}'
+        f'<script>var x = {n};</script></a></h3>'
+        f'<span class="poly-component__seller">Por Loja {n} <svg><title>oficial</title></svg></span>'
+        f'{reviews}{previous}'
+        f'<div class="poly-price__current"><span class="andes-money-amount">'
+        f'<span class="andes-money-amount__fraction">{n}.{n % 1000:03d}</span>{cents}</span></div>'
+        f'<div class="poly-component__shipping">Frete grátis <span>amanhã</span></div>{ads}'
+        f'</div></div></li>\n'
+    )
+
+def listing_page(rng, cards_count, variants, layout='li'):
+    body = []
+    for n in range(cards_count):
+        variant = variants[n % len(variants)]
+        html = card(rng, n + 1, variant)
+        if layout == 'div':
+            html = html.replace('<li class="ui-search-layout__item  shops__layout-item">', '<div>').replace('</li>', '</div>')
+        body.append(html)
+    filler = ''.join(f'<div class="nav-{i}"><a href="/c/{i}">Categoria {i}</a></div>' for i in range(2000))
+    return (f'<!DOCTYPE html><html><head><title>Busca</title><script>window.__PRELOADED_STATE__ = {{}};</script></head>'
+            f'<body>{filler}<section class="ui-search-results"><ol class="ui-search-layout">{"".join(body)}</ol></section>'
+            f'{filler}</body></html>')
+
+def corpus():
+    rng = random.Random(7)
+    all_variants = ['default', 'promo', 'integer', 'carousel', 'placeholder', 'tracking', 'no_reviews', 'ads']
+    return [
+        ('sintética:misturada', listing_page(rng, 54, all_variants)),
+        ('sintética:promo', listing_page(rng, 48, ['promo', 'ads'])),
+        ('sintética:sem-li', listing_page(rng, 40, ['default', 'integer'], layout='div')),
+        ('sintética:vazia', '<html><body><p>Nenhum resultado</p></body></html>'),
+    ]
+
+def timed(html, engine, repeat, limit=None):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = parse_list_items(html, engine=engine, limit=limit)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return items, best
+
+def main():
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append((path, f.read()))
+    else:
+        pages = corpus()
+
+    mismatches = 0
+    bs4_total = lxml_total = 0.0
+    print(f"{'página':28} {'KB':>6} {'itens':>6} {'bs4':>10} {'lxml':>10} {'speedup':>8} {'limit=5':>10}")
+    for name, html in pages:
+        expected, bs4_time = timed(html, 'bs4', 3)
+        items, lxml_time = timed(html, 'lxml', 3)
+        first, first_time = timed(html, 'lxml', 3, limit=5)
+        bs4_total += bs4_time
+        lxml_total += lxml_time
+        print(f"{name[-28:]:28} {len(html) / 1024:6.0f} {len(expected):6} {bs4_time * 1000:8.2f}ms {lxml_time * 1000:8.2f}ms "
+              f"{bs4_time / lxml_time:7.1f}x {first_time * 1000:8.2f}ms")
+
+        # Parser incremental: mesmo resultado com limite e com qualquer fatiamento da entrada
+        streams = {'limit=5': (first, expected[:5]), 'stream': (list(iter_list_items(html)), expected)}
+        for size in (97, 4096):
+            streams[f'pedaços de {size}'] = (list(iter_list_items(html_chunks(html, size))), expected)
+        for label, (got, want) in streams.items():
+            if got != want:
+                mismatches += 1
+                print(f"[DIFF] {name} {label}: {len(want)} itens esperados, {len(got)} recebidos (ou conteúdo diferente)")
+
+        if len(items) != len(expected):
+            mismatches += 1
+            print(f"[DIFF] {name}: {len(expected)} itens no bs4, {len(items)} no lxml")
+        for index, (want, got) in enumerate(zip(expected, items)):
+            for field in want:
+                if want[field] != got.get(field):
+                    mismatches += 1
+                    print(f"[DIFF] {name} item {index} {field}: bs4={want[field]!r} lxml={got.get(field)!r}")
+
+    print(f"Total: bs4 {bs4_total * 1000:.1f}ms, lxml {lxml_total * 1000:.1f}ms "
+          f"({bs4_total / lxml_total:.1f}x) | divergências: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
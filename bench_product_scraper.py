@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark do extrator de detalhes de produto: funções extract_* originais
+(um re.search por padrão) contra o motor compilado (CompiledExtractor).
+
+Uso:
+    python bench_product_scraper.py pagina1.html pagina2.html ...
+
+Salve PDPs reais com /scrape-product-details e "include_html": true (campo
+html_content). Sem arquivos, o script gera páginas sintéticas de ~1,5 MB com as
+variações que exercitam os fallbacks. Além do tempo, compara a saída campo a campo.
+"""
+
+import random
+import sys
+import time
+
+from product_scraper import (
+    compiled_extractor, extract_title, extract_price, extract_image_url,
+    extract_seller_name, extract_stock
+)
+
+URL = "https://produto.mercadolivre.com.br/MLB-3902743854-camisa-adidas-_JM"
+
+def legacy_fields(html, url):
+    """Campos como extract_product_details montava antes do motor compilado"""
+    price_data = extract_price(html)
+    return {
+        'title': extract_title(html),
+        'price': price_data['price'],
+        'promo_price': price_data['promo_price'],
+        'image_url': extract_image_url(html),
+        'seller_name': extract_seller_name(html, url),
+        'stock': extract_stock(html),
+    }
+
+def compiled_fields(html, url):
+    from product_scraper import seller_from_url
+    fields = compiled_extractor.extract(html)
+    fields['seller_name'] = fields['seller_name'] or seller_from_url(url)
+    return fields
+
+def filler(rng, size):
+    """Marcação de enchimento parecida com a de uma PDP (divs, spans, links, JSON)"""
+    chunks = []
+    total = 0
+    while total < size:
+        n = rng.randint(0, 10**6)
+        chunk = rng.choice([
+            f'<div class="ui-pdp-container__row ui-pdp-component-list-{n}"><span class="ui-pdp-color--BLACK">Texto {n}</span></div>\n',
+            f'<a href="https://www.mercadolivre.com.br/c/categoria-{n}" class="andes-breadcrumb__link">Categoria {n}</a>\n',
+            f'<span class="andes-money-amount__fraction" aria-hidden="true">{n}</span>\n',
+            f'<script>window.__tracking_{n} = {{"path":"/pdp","id":{n},"items":[1,2,3]}};</script>\n',
+            f'<li class="ui-vpp-highlighted-specs__features-list-item">Característica {n}</li>\n',
+        ])
+        chunks.append(chunk)
+        total += len(chunk)
+    return ''.join(chunks)
+
+def synthetic_page(rng, variant):
+    """Página sintética; `variant` remove blocos para cair nos padrões de fallback"""
+    head = '<html><head><title>Camisa Adidas Real Madrid | MercadoLivre</title>'
+    head += '<meta property="og:title" content="Camisa Adidas Real Madrid Original">'
+    if variant != 'no_zoom':
+        head += '<meta property="og:image" content="https://http2.mlstatic.com/D_NQ_NP_og.webp">'
+    head += '</head><body>'
+    body = [filler(rng, 400_000)]
+    if variant != 'no_h1':
+        body.append('<h1 class="ui-pdp-title">Camisa Adidas Real Madrid I 2023/2024 Original</h1>')
+    if variant == 'promo':
+        body.append('<s class="andes-money-amount ui-pdp-price__original-value"><span class="andes-money-amount__fraction" data-testid="original-price">499</span></s>')
+    if variant == 'no_cents':
+        # Preço inteiro: sem span de centavos, os padrões com [\s\S]*? varrem até o fim para cada candidato
+        body.append('<span class="andes-money-amount ui-pdp-price__part andes-money-amount--cents-superscript" itemprop="offers">'
+                    '<span class="andes-money-amount__currency-symbol">R$</span>'
+                    '<span class="andes-money-amount__fraction" aria-hidden="true">1.299</span></span>')
+    elif variant not in ('no_price_block', 'json_price'):
+        body.append('<span class="andes-money-amount ui-pdp-price__part andes-money-amount--cents-superscript" itemprop="offers">'
+                    '<span class="andes-money-amount__currency-symbol">R$</span>'
+                    '<span class="andes-money-amount__fraction" aria-hidden="true">1.299</span>'
+                    '<span class="andes-money-amount__cents andes-money-amount__cents--superscript-36">90</span></span>')
+    if variant == 'no_price_block':
+        body.append('<span data-testid="price-part"><span class="andes-money-amount__fraction">899</span><span class="andes-money-amount__cents">50</span></span>')
+    if variant != 'no_zoom':
+        body.append('<img data-zoom="https://http2.mlstatic.com/D_NQ_NP_zoom-F.webp" class="ui-pdp-image ui-pdp-gallery__figure__image" src="https://http2.mlstatic.com/D_NQ_NP_small.webp">')
+    body.append(filler(rng, 500_000))
+    if variant == 'store':
+        body.append('<a class="ui-pdp-action-modal__link store-info__name" href="https://www.mercadolivre.com.br/loja/adidas">  Adidas Oficial  </a>')
+    if variant != 'no_stock_span':
+        body.append('<span class="ui-pdp-buybox__quantity__available">(+50 disponíveis)</span>')
+    body.append(filler(rng, 500_000))
+    state = '{"item":{"price":1299.9,"available_quantity":37'
+    if variant != 'store':
+        state += ',"seller_name":"LOJA OFICIAL ADIDAS"'
+    state += '}}'
+    body.append(f'<script id="__PRELOADED_STATE__" type="application/json">{state}</script>')
+    body.append('</body></html>')
+    return head + ''.join(body)
+
+def timed(function, html, repeat=1):
+    """Menor tempo (s) entre `repeat` execuções"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(html, URL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append((path, f.read()))
+    else:
+        rng = random.Random(42)
+        variants = ['default', 'promo', 'no_h1', 'no_price_block', 'json_price', 'no_cents', 'no_zoom', 'store', 'no_stock_span']
+        pages = [(f'sintética:{variant}', synthetic_page(rng, variant)) for variant in variants]
+
+    # Os prints de extract_stock poluem a saída; silenciados durante a medição
+    import io, contextlib
+
+    mismatches = 0
+    legacy_total = compiled_total = 0.0
+    print(f"{'página':28} {'KB':>6} {'original':>12} {'compilado':>10} {'speedup':>8}")
+    for name, html in pages:
+        # O original roda uma vez só: com backtracking ele pode levar segundos numa página
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy, legacy_time = timed(legacy_fields, html)
+            compiled, compiled_time = timed(compiled_fields, html, repeat=5)
+        legacy_total += legacy_time
+        compiled_total += compiled_time
+        print(f"{name[-28:]:28} {len(html) / 1024:6.0f} {legacy_time * 1000:10.2f}ms {compiled_time * 1000:8.2f}ms {legacy_time / compiled_time:7.1f}x")
+
+        # Equivalência campo a campo
+        for field in legacy:
+            if legacy[field] != compiled[field]:
+                mismatches += 1
+                print(f"[DIFF] {name} {field}: original={legacy[field]!r} compilado={compiled[field]!r}")
+
+    print(f"Total: original {legacy_total * 1000:.1f}ms, compilado {compiled_total * 1000:.1f}ms "
+          f"({legacy_total / compiled_total:.1f}x) | divergências: {mismatches}")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
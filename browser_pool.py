@@ -0,0 +1,498 @@
+# browser_pool.py
+# Pool de navegadores Chromium persistentes, compartilhado por todas as requisições do worker
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+from async_runtime import submit, run_sync
+from playwright_scraper import PlaywrightScraper, launch_browser, new_stealth_context, PAGE_TIMEOUT_MS
+from metrics import observe_browser_launch, observe_pool_wait, observe_html_bytes
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '1'))
+MAX_PAGES_PER_BROWSER = int(os.getenv('BROWSER_POOL_MAX_PAGES', '50'))
+LEASE_TIMEOUT = float(os.getenv('BROWSER_POOL_LEASE_TIMEOUT', '120'))
+DRAIN_TIMEOUT = float(os.getenv('BROWSER_POOL_DRAIN_TIMEOUT', '30'))
+FETCH_TIMEOUT = float(os.getenv('BROWSER_POOL_FETCH_TIMEOUT', '300'))
+
+# Busca em lote (ex.: estoque dos itens de uma lista)
+ITEM_TIMEOUT = float(os.getenv('BROWSER_POOL_ITEM_TIMEOUT', '45'))
+BATCH_DEADLINE = float(os.getenv('BROWSER_POOL_BATCH_DEADLINE', '240'))
+
+# Modo 'browser': N navegadores, um contexto novo por requisição
+# Modo 'context': um navegador, N contextos pré-aquecidos reciclados a cada K navegações
+POOL_MODE = os.getenv('BROWSER_POOL_MODE', 'browser')
+CONTEXT_SLOTS = int(os.getenv('BROWSER_POOL_CONTEXTS', '4'))
+MAX_NAVIGATIONS_PER_CONTEXT = int(os.getenv('BROWSER_POOL_CONTEXT_MAX_NAVIGATIONS', '10'))
+
+class PooledBrowser:
+    """Um navegador Chromium vivo dentro do pool"""
+
+    def __init__(self, index, browser):
+        self.index = index
+        self.browser = browser
+        self.pages_served = 0
+        self.launched_at = time.time()
+
+    def is_healthy(self):
+        """Health check barato: o processo do navegador ainda está conectado?"""
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+class PooledContext:
+    """Um BrowserContext pré-inicializado (stealth + pt-BR) sobre o navegador compartilhado"""
+
+    def __init__(self, index, context, generation):
+        self.index = index
+        self.context = context
+        self.generation = generation
+        self.navigations = 0
+
+class BrowserPool:
+    """Mantém navegadores Chromium abertos e os empresta por requisição.
+
+    No modo 'browser' cada empréstimo recebe um BrowserContext novo (cookies
+    isolados) sobre um dos N navegadores aquecidos. No modo 'context' um único
+    navegador serve N contextos pré-inicializados, reciclados após
+    `max_navigations_per_context` navegações. O navegador é reciclado após
+    `max_pages_per_browser` páginas ou quando o health check falha.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages_per_browser=MAX_PAGES_PER_BROWSER, lease_timeout=LEASE_TIMEOUT,
+                 mode=POOL_MODE, context_slots=CONTEXT_SLOTS, max_navigations_per_context=MAX_NAVIGATIONS_PER_CONTEXT):
+        if mode not in ('browser', 'context'):
+            raise ValueError(f"Modo de pool inválido: {mode}")
+        self.mode = mode
+        self.size = 1 if mode == 'context' else max(1, size)
+        self.max_pages_per_browser = max(1, max_pages_per_browser)
+        self.lease_timeout = lease_timeout
+        self.context_slots = max(1, context_slots)
+        self.max_navigations_per_context = max(1, max_navigations_per_context)
+        self.playwright = None
+        self.browsers = []
+        self.contexts = []
+        self._generation = 0
+        self._browser_lock = asyncio.Lock()
+        self._available = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        self._draining = False
+        self._leased = 0
+        self.stats = {
+            'launches': 0,
+            'recycles': 0,
+            'context_recycles': 0,
+            'context_reuses': 0,
+            'unhealthy': 0,
+            'leases': 0,
+            'lease_wait_total': 0.0,
+            'launch_time_total': 0.0
+        }
+
+    async def start(self):
+        """Lança os navegadores do pool (idempotente)"""
+        async with self._start_lock:
+            if self._started:
+                return
+            if self._draining:
+                raise Exception("Pool de navegadores está em encerramento")
+
+            self.playwright = await async_playwright().start()
+            self._available = asyncio.Queue()
+
+            for index in range(self.size):
+                pooled = PooledBrowser(index, await self._launch())
+                self.browsers.append(pooled)
+                if self.mode == 'browser':
+                    self._available.put_nowait(pooled)
+
+            if self.mode == 'context':
+                shared = self.browsers[0].browser
+                for index in range(self.context_slots):
+                    slot = PooledContext(index, await new_stealth_context(shared), self._generation)
+                    self.contexts.append(slot)
+                    self._available.put_nowait(slot)
+
+            self._started = True
+            if self.mode == 'context':
+                logger.info(f"Browser pool iniciado em modo contexto com {self.context_slots} contexto(s)")
+            else:
+                logger.info(f"Browser pool iniciado com {self.size} navegador(es)")
+
+    async def _launch(self):
+        start_time = time.time()
+        browser = await launch_browser(self.playwright)
+        elapsed = time.time() - start_time
+        self.stats['launches'] += 1
+        self.stats['launch_time_total'] += elapsed
+        observe_browser_launch(elapsed)
+        logger.info(f"Navegador do pool lançado em {elapsed:.2f}s")
+        return browser
+
+    async def _recycle(self, pooled):
+        """Fecha o navegador antigo e lança outro no mesmo slot"""
+        try:
+            if pooled.browser and pooled.browser.is_connected():
+                await asyncio.wait_for(pooled.browser.close(), timeout=10)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar navegador {pooled.index} para reciclagem: {e}")
+
+        pooled.browser = None
+        pooled.browser = await self._launch()
+        pooled.pages_served = 0
+        pooled.launched_at = time.time()
+        self.stats['recycles'] += 1
+
+    @asynccontextmanager
+    async def lease(self):
+        """Empresta um navegador (ou contexto) do pool e entrega um PlaywrightScraper pronto para uso.
+
+        O scraper entregue traz `lease_info` com os tempos de espera e preparação.
+        """
+        if self._draining:
+            raise Exception("Pool de navegadores está em encerramento")
+
+        await self.start()
+
+        wait_start = time.time()
+        try:
+            entry = await asyncio.wait_for(self._available.get(), timeout=self.lease_timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"Nenhum navegador livre no pool após {self.lease_timeout}s")
+
+        lease_wait = time.time() - wait_start
+        self.stats['leases'] += 1
+        self.stats['lease_wait_total'] += lease_wait
+        observe_pool_wait(lease_wait)
+        self._leased += 1
+        lease_info = {'mode': self.mode, 'lease_wait': round(lease_wait, 3)}
+
+        if self.mode == 'context':
+            async with self._lease_context(entry, lease_info) as scraper:
+                yield scraper
+        else:
+            async with self._lease_browser(entry, lease_info) as scraper:
+                yield scraper
+
+    @asynccontextmanager
+    async def _lease_browser(self, pooled, lease_info):
+        """Modo 'browser': contexto descartável sobre um navegador emprestado com exclusividade"""
+        context = None
+        try:
+            if not pooled.is_healthy():
+                self.stats['unhealthy'] += 1
+                logger.warning(f"Navegador {pooled.index} falhou no health check, relançando")
+                await self._recycle(pooled)
+            elif pooled.pages_served >= self.max_pages_per_browser:
+                logger.info(f"Navegador {pooled.index} atingiu {pooled.pages_served} páginas, reciclando")
+                await self._recycle(pooled)
+
+            setup_start = time.time()
+            context = await new_stealth_context(pooled.browser)
+            page = await context.new_page()
+            page.set_default_timeout(PAGE_TIMEOUT_MS)
+            page.set_default_navigation_timeout(PAGE_TIMEOUT_MS)
+            pooled.pages_served += 1
+            lease_info.update({
+                'browser_index': pooled.index,
+                'context_setup': round(time.time() - setup_start, 3),
+                'context_reused': False
+            })
+
+            # O scraper não é dono do navegador: apenas usa o contexto e a página
+            scraper = PlaywrightScraper()
+            scraper.context = context
+            scraper.page = page
+            scraper.lease_info = lease_info
+            yield scraper
+        finally:
+            if context is not None:
+                try:
+                    await asyncio.wait_for(context.close(), timeout=10)
+                except Exception as e:
+                    logger.warning(f"Erro ao fechar contexto do pool: {e}")
+            self._leased -= 1
+            self._available.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def _lease_context(self, slot, lease_info):
+        """Modo 'context': página nova dentro de um contexto pré-aquecido do navegador compartilhado"""
+        page = None
+        try:
+            await self._ensure_shared_browser()
+
+            setup_start = time.time()
+            reused = slot.generation == self._generation and slot.navigations < self.max_navigations_per_context
+            if not reused:
+                await self._recycle_context(slot)
+            else:
+                self.stats['context_reuses'] += 1
+
+            page = await slot.context.new_page()
+            page.set_default_timeout(PAGE_TIMEOUT_MS)
+            page.set_default_navigation_timeout(PAGE_TIMEOUT_MS)
+            slot.navigations += 1
+            self.browsers[0].pages_served += 1
+            lease_info.update({
+                'context_index': slot.index,
+                'context_navigations': slot.navigations,
+                'context_setup': round(time.time() - setup_start, 3),
+                'context_reused': reused
+            })
+
+            scraper = PlaywrightScraper()
+            scraper.context = slot.context
+            scraper.page = page
+            scraper.lease_info = lease_info
+            yield scraper
+        finally:
+            if page is not None:
+                try:
+                    await asyncio.wait_for(page.close(), timeout=10)
+                except Exception as e:
+                    logger.warning(f"Erro ao fechar página do pool: {e}")
+            self._leased -= 1
+            self._available.put_nowait(slot)
+
+    async def _ensure_shared_browser(self):
+        """Relança o navegador compartilhado se caiu ou se pode ser reciclado com segurança"""
+        async with self._browser_lock:
+            shared = self.browsers[0]
+            if not shared.is_healthy():
+                self.stats['unhealthy'] += 1
+                logger.warning("Navegador compartilhado falhou no health check, relançando")
+            elif shared.pages_served >= self.max_pages_per_browser and self._leased == 1:
+                # Só recicla quando este é o único empréstimo ativo, para não derrubar outros contextos
+                logger.info(f"Navegador compartilhado atingiu {shared.pages_served} páginas, reciclando")
+            else:
+                return
+            await self._recycle(shared)
+            self._generation += 1
+
+    async def _recycle_context(self, slot):
+        """Fecha o contexto gasto e cria outro com stealth + pt-BR"""
+        try:
+            if slot.context is not None and slot.generation == self._generation:
+                await asyncio.wait_for(slot.context.close(), timeout=10)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar contexto {slot.index} para reciclagem: {e}")
+
+        slot.context = None
+        slot.context = await new_stealth_context(self.browsers[0].browser)
+        slot.generation = self._generation
+        slot.navigations = 0
+        self.stats['context_recycles'] += 1
+
+    async def fetch_page_with_info(self, url, wait_for_selector=None, scroll_page=True):
+        """Busca uma página usando o pool e retorna (conteúdo, status, lease_info)"""
+        fetch_start = time.time()
+        async with self.lease() as scraper:
+            content, status = await scraper.fetch_page_content(url, wait_for_selector, scroll_page)
+            observe_html_bytes('playwright', content)
+            lease_info = scraper.lease_info
+            lease_info['resources'] = scraper.last_resource_report
+            lease_info['readiness'] = scraper.last_readiness
+        lease_info['total_time'] = round(time.time() - fetch_start, 3)
+        return content, status, lease_info
+
+    def capacity(self):
+        """Quantos empréstimos simultâneos o pool comporta sem fila"""
+        return self.context_slots if self.mode == 'context' else self.size
+
+    async def fetch_many(self, urls, parse=None, concurrency=None, item_timeout=ITEM_TIMEOUT, deadline=BATCH_DEADLINE,
+                         wait_for_selector=None, scroll_page=True, on_result=None, parse_with_url=False):
+        """Busca várias URLs com concorrência limitada, timeout por item e prazo global.
+
+        `parse(html)` (ou `parse(html, url)` com `parse_with_url=True`) roda numa
+        thread auxiliar para não travar o event loop e evitar manter todos os
+        HTMLs em memória. Retorna, na ordem de `urls`, dicts com `url`, `ok`,
+        `result`, `reason`, `error` e `elapsed`; itens que não terminam a tempo
+        voltam com `ok=False` e `reason` 'timeout' ou 'deadline'.
+        `on_result(index, outcome)`, se informado, é chamado assim que cada URL termina.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.capacity()))
+        results = [
+            {'url': url, 'ok': False, 'result': None, 'reason': 'deadline', 'error': f'prazo global de {deadline}s excedido', 'elapsed': None}
+            for url in urls
+        ]
+
+        async def worker(index, url):
+            async with semaphore:
+                item_start = time.time()
+                try:
+                    content, _status = await asyncio.wait_for(
+                        self.fetch_page_content(url, wait_for_selector, scroll_page),
+                        timeout=item_timeout
+                    )
+                    parse_args = (content, url) if parse_with_url else (content,)
+                    result = await asyncio.to_thread(parse, *parse_args) if parse else content
+                    results[index].update({'ok': True, 'result': result, 'reason': None, 'error': None})
+                except asyncio.TimeoutError:
+                    results[index].update({'reason': 'timeout', 'error': f'timeout de {item_timeout}s'})
+                except Exception as e:
+                    results[index].update({'reason': 'error', 'error': str(e)})
+                results[index]['elapsed'] = round(time.time() - item_start, 3)
+                if on_result:
+                    on_result(index, results[index])
+
+        tasks = [asyncio.create_task(worker(index, url)) for index, url in enumerate(urls)]
+        if not tasks:
+            return results
+
+        _done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"fetch_many: {len(pending)} de {len(tasks)} URL(s) não terminaram no prazo de {deadline}s")
+
+        return results
+
+    async def fetch_page_content(self, url, wait_for_selector=None, scroll_page=True):
+        """Busca uma página usando um navegador do pool"""
+        content, status, _ = await self.fetch_page_with_info(url, wait_for_selector, scroll_page)
+        return content, status
+
+    async def take_screenshot(self, url, full_page=True):
+        """Tira screenshot usando um navegador do pool"""
+        async with self.lease() as scraper:
+            return await scraper.take_screenshot_async(url, full_page)
+
+    async def drain(self, timeout=DRAIN_TIMEOUT):
+        """Encerramento gracioso: para de emprestar, espera os empréstimos ativos e fecha tudo"""
+        self._draining = True
+        deadline = time.time() + timeout
+        while self._leased > 0 and time.time() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._leased > 0:
+            logger.warning(f"Drain expirou com {self._leased} empréstimo(s) ativo(s)")
+
+        for slot in self.contexts:
+            try:
+                if slot.context is not None:
+                    await asyncio.wait_for(slot.context.close(), timeout=10)
+            except Exception as e:
+                logger.warning(f"Erro ao fechar contexto {slot.index}: {e}")
+            slot.context = None
+
+        for pooled in self.browsers:
+            try:
+                if pooled.browser:
+                    await asyncio.wait_for(pooled.browser.close(), timeout=10)
+            except Exception as e:
+                logger.error(f"Erro ao fechar navegador {pooled.index}: {e}")
+            pooled.browser = None
+
+        try:
+            if self.playwright:
+                await asyncio.wait_for(self.playwright.stop(), timeout=10)
+        except Exception as e:
+            logger.error(f"Erro ao parar Playwright do pool: {e}")
+
+        self.playwright = None
+        self._started = False
+        logger.info("Browser pool encerrado")
+
+    def snapshot(self):
+        """Estado do pool para /health"""
+        leases = self.stats['leases']
+        launches = self.stats['launches']
+        snapshot = {
+            'mode': self.mode,
+            'started': self._started,
+            'draining': self._draining,
+            'size': self.size,
+            'leased': self._leased,
+            'max_pages_per_browser': self.max_pages_per_browser,
+            'browsers': [
+                {
+                    'index': pooled.index,
+                    'healthy': pooled.is_healthy(),
+                    'pages_served': pooled.pages_served,
+                    'age_seconds': round(time.time() - pooled.launched_at, 1)
+                }
+                for pooled in self.browsers
+            ],
+            'launches': launches,
+            'recycles': self.stats['recycles'],
+            'unhealthy': self.stats['unhealthy'],
+            'leases': leases,
+            'avg_lease_wait': round(self.stats['lease_wait_total'] / leases, 3) if leases else 0.0,
+            'avg_launch_time': round(self.stats['launch_time_total'] / launches, 3) if launches else 0.0
+        }
+        if self.mode == 'context':
+            snapshot['contexts'] = [
+                {'index': slot.index, 'navigations': slot.navigations}
+                for slot in self.contexts
+            ]
+            snapshot['max_navigations_per_context'] = self.max_navigations_per_context
+            snapshot['context_recycles'] = self.stats['context_recycles']
+            snapshot['context_reuses'] = self.stats['context_reuses']
+        return snapshot
+
+# Estado por processo: com gunicorn --preload o módulo é importado no master,
+# então o pool é criado preguiçosamente em cada worker, dentro do async runtime
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Retorna o pool do processo atual, criando-o se necessário"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = BrowserPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+def submit_to_pool(coro_factory):
+    """Agenda `coro_factory(pool)` no loop do worker e retorna um Future (várias buscas em paralelo)"""
+    return submit(coro_factory(get_browser_pool()))
+
+def run_in_pool(coro_factory, timeout=FETCH_TIMEOUT):
+    """Executa `coro_factory(pool)` no loop do worker e espera o resultado (facade síncrona)"""
+    return run_sync(coro_factory(get_browser_pool()), timeout=timeout)
+
+def browser_pool_snapshot():
+    """Estado do pool deste processo, ou None se ainda não foi criado"""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.snapshot()
+
+async def drain_browser_pool(timeout=DRAIN_TIMEOUT):
+    """Versão assíncrona do encerramento, para quem já está no loop do worker (ex.: lifespan ASGI)"""
+    global _pool
+
+    if _pool is None or _pool_pid != os.getpid():
+        return
+    pool, _pool = _pool, None
+    await pool.drain(timeout)
+
+def shutdown_browser_pool(timeout=DRAIN_TIMEOUT):
+    """Drena o pool (chamado no encerramento do worker, antes do runtime parar)"""
+    global _pool
+
+    if _pool is None or _pool_pid != os.getpid():
+        return
+
+    try:
+        run_sync(_pool.drain(timeout), timeout=timeout + 15)
+    except Exception as e:
+        logger.error(f"Erro ao drenar browser pool: {e}")
+    finally:
+        _pool = None
+
+# atexit é LIFO: registrado depois do runtime, o drain roda antes do loop parar
+atexit.register(shutdown_browser_pool)
@@ -0,0 +1,184 @@
+# circuit_breaker.py
+# Circuit breakers por tier de scraping (http, playwright, ocr) e tipo de página (list,
+# details). Com muitas falhas na janela recente o breaker abre e o tier é pulado na hora,
+# sem gastar timeout; depois do cooldown algumas chamadas de prova (half-open) decidem
+# se ele volta a fechar.
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER', 'on').lower() not in ('0', 'off', 'false', 'no')
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))                 # últimos resultados considerados
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))           # resultados na janela antes de poder abrir
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', '0.5'))  # fração de falhas que abre o breaker
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))   # cooldown antes das chamadas de prova
+BREAKER_HALF_OPEN_PROBES = int(os.getenv('BREAKER_HALF_OPEN_PROBES', '2'))  # provas bem-sucedidas para fechar
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Tier pulado porque o breaker está aberto"""
+
+    def __init__(self, tier, page_type, retry_in):
+        super().__init__(f"Circuit breaker aberto para {tier}/{page_type} (nova prova em {retry_in:.0f}s)")
+        self.tier = tier
+        self.page_type = page_type
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Janela deslizante de sucessos/falhas com os estados closed -> open -> half_open -> closed.
+
+    `allow()` diz se a chamada pode ir ao tier; em half-open libera no máximo
+    `probes` chamadas simultâneas. Cada chamada liberada termina com `record(ok)`
+    ou, se foi cancelada sem resultado, com `release()`.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, failure_rate=BREAKER_FAILURE_RATE,
+                 open_seconds=BREAKER_OPEN_SECONDS, probes=BREAKER_HALF_OPEN_PROBES):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = max(1, probes)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats = {'opened': 0, 'rejected': 0, 'successes': 0, 'failures': 0}
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats['opened'] += 1
+
+    def allow(self):
+        now = time.time()
+        with self._lock:
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.probes - self._probe_successes:
+                self._probes_in_flight += 1
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def retry_in(self):
+        """Segundos até o breaker aceitar chamadas de prova (0 se já aceita)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.time() - self._opened_at))
+
+    def record(self, ok):
+        now = time.time()
+        with self._lock:
+            self.stats['successes' if ok else 'failures'] += 1
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok:
+                    self._open(now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == OPEN:
+                # Resultado atrasado de uma chamada liberada antes de abrir
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def release(self):
+        """Chamada liberada que terminou sem resultado (ex.: cancelada pelo hedge)"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            state = self.state
+            if state == OPEN and now - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            failures = self._outcomes.count(False)
+            return {
+                'state': state,
+                'window': len(self._outcomes),
+                'failure_rate': round(failures / len(self._outcomes), 3) if self._outcomes else None,
+                'open_for': round(now - self._opened_at, 1) if state != CLOSED and self._opened_at else None,
+                **self.stats,
+            }
+
+# Breakers do processo, por (tier, tipo de página); cada worker gunicorn tem os seus
+_breakers = {}
+_breakers_pid = None
+_breakers_lock = threading.Lock()
+
+def get_breaker(tier, page_type):
+    global _breakers, _breakers_pid
+
+    with _breakers_lock:
+        if _breakers_pid != os.getpid():
+            _breakers = {}
+            _breakers_pid = os.getpid()
+        breaker = _breakers.get((tier, page_type))
+        if breaker is None:
+            breaker = _breakers[(tier, page_type)] = CircuitBreaker()
+        return breaker
+
+def check_breaker(tier, page_type):
+    """Libera a chamada ou levanta CircuitOpenError; sem breakers (CIRCUIT_BREAKER=off) sempre libera"""
+    if not BREAKER_ENABLED:
+        return None
+    breaker = get_breaker(tier, page_type)
+    if not breaker.allow():
+        raise CircuitOpenError(tier, page_type, breaker.retry_in())
+    return breaker
+
+async def guarded_call(tier, page_type, call):
+    """Roda `call()` (coroutine) atrás do breaker do tier: exceção conta como falha, retorno como sucesso"""
+    breaker = check_breaker(tier, page_type)
+    if breaker is None:
+        return await call()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record(False)
+        raise
+    breaker.record(True)
+    return result
+
+def circuit_breaker_snapshot():
+    """Estado dos breakers para o /health: {tier: {tipo de página: estado}} e a lista dos abertos (sem os half-open)"""
+    if not BREAKER_ENABLED:
+        return {'enabled': False}
+    with _breakers_lock:
+        breakers = dict(_breakers) if _breakers_pid == os.getpid() else {}
+    tiers = {}
+    open_breakers = []
+    for (tier, page_type), breaker in sorted(breakers.items()):
+        snapshot = breaker.snapshot()
+        tiers.setdefault(tier, {})[page_type] = snapshot
+        if snapshot['state'] == OPEN:
+            open_breakers.append(f"{tier}/{page_type}")
+    return {'enabled': True, 'open': open_breakers, 'tiers': tiers}
@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+# Carregado automaticamente pelo gunicorn (diretório de trabalho); as opções da linha de
+# comando (Procfile, Dockerfile, railway.toml) continuam valendo. Aqui ficam o modo
+# multiprocesso das métricas Prometheus (cada worker grava em PROMETHEUS_MULTIPROC_DIR e
+# o /metrics agrega todos) e a subida dos consumidores da fila de jobs em cada worker.
+
+import os
+import shutil
+import tempfile
+
+# Precisa estar no ambiente antes de o app (e o prometheus_client) ser importado, inclusive com --preload
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'scraper-metrics'))
+
+# Arquivos de uma execução anterior misturariam contadores antigos com os novos
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Worker encerrado (ex.: --max-requests): descarta os valores "live" dele"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_worker_init(worker):
+    """Consumidores da fila de jobs sobem com o worker (inclusive após --max-requests)"""
+    # Workers ASGI iniciam os consumidores no lifespan, depois de adotar o loop do servidor
+    if type(worker).__module__.startswith('uvicorn'):
+        return
+    from api import start_job_workers
+    start_job_workers()
@@ -0,0 +1,84 @@
+# hedging.py
+# Requisições "hedged" entre tiers de scraping: se o tier primário não responde dentro
+# do seu p90 de latência recente, o secundário começa em paralelo; vale o primeiro que
+# trouxer dados válidos e o outro é cancelado.
+
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter
+
+from tier_stats import latency_quantile
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+# Chave geral: o hedge só acontece nas chamadas que pedem (detalhes interativos); off desliga todas
+HEDGING_ENABLED = os.getenv('TIER_HEDGING', 'on').lower() not in ('0', 'off', 'false', 'no')
+HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', '0.9'))           # quantil da latência do primário que dispara o hedge
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))        # amostras antes de confiar no quantil
+HEDGE_DEFAULT_DELAY = float(os.getenv('HEDGE_DEFAULT_DELAY', '5'))   # espera (s) enquanto não há amostras suficientes
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.25'))        # piso da espera, contra hedge em toda chamada
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+def hedge_delay(tier, page_type):
+    """Quanto esperar o tier primário antes de disparar o secundário (p90 aprendido ou o padrão)"""
+    learned = latency_quantile(tier, page_type, HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES)
+    if learned is None:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, learned)
+
+async def hedged_race(primary, secondary, delay=None):
+    """Roda `primary()` e, se ele não terminar em `delay` segundos, `secondary()` em paralelo.
+
+    `primary`/`secondary` são funções sem argumentos que retornam coroutines; exceção
+    significa "sem dados válidos". Retorna (papel, resultado, hedged) do primeiro que
+    terminar sem exceção, com papel 'primary' ou 'secondary', e cancela o outro. Se o
+    primário falhar antes do prazo o secundário começa na hora (a cascata sequencial é
+    o caso `delay=None`). Se os dois falharem, relança a última exceção.
+    """
+    tasks = {asyncio.ensure_future(primary()): 'primary'}
+    started_secondary = False
+    hedged = False
+    last_error = None
+    try:
+        done, _pending = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            hedged = True
+            _count('hedged')
+        while True:
+            for task in done:
+                role = tasks.pop(task)
+                if task.exception() is None:
+                    if hedged:
+                        _count(f'won_by_{role}')
+                    return role, task.result(), hedged
+                last_error = task.exception()
+            if not started_secondary:
+                started_secondary = True
+                tasks[asyncio.ensure_future(secondary())] = 'secondary'
+            if not tasks:
+                raise last_error
+            done, _pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def hedging_snapshot():
+    """Contadores de hedge para o /health: disparos e quem venceu depois do disparo"""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        'enabled': HEDGING_ENABLED,
+        'quantile': HEDGE_QUANTILE,
+        'hedged': stats.get('hedged', 0),
+        'won_by_primary': stats.get('won_by_primary', 0),
+        'won_by_secondary': stats.get('won_by_secondary', 0),
+    }
@@ -0,0 +1,151 @@
+# http_session.py
+# Sessões HTTP com keep-alive compartilhadas pelo worker: um único HTTPAdapter
+# (pools de conexão por host) montado em sessões por thread, com métricas de
+# reuso de conexão e de handshakes TLS e limite de taxa por host
+
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from rate_limit import get_rate_limiter, retry_after_seconds
+
+# Configuração via variáveis de ambiente
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '20'))   # hosts com pool de conexões em cache
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))           # conexões mantidas por host
+POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'on').lower() not in ('0', 'off', 'false', 'no')  # limite rígido por host
+
+class ConnectionStats:
+    """Contadores thread-safe de requisições e conexões novas por host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.new_connections = Counter()
+        self.tls_handshakes = Counter()
+
+    def record_request(self, host):
+        with self._lock:
+            self.requests[host] += 1
+
+    def record_connection(self, host, tls):
+        with self._lock:
+            self.new_connections[host] += 1
+            if tls:
+                self.tls_handshakes[host] += 1
+
+    def snapshot(self):
+        with self._lock:
+            total_requests = sum(self.requests.values())
+            total_connections = sum(self.new_connections.values())
+            by_host = {
+                host: {
+                    'requests': self.requests[host],
+                    'new_connections': self.new_connections[host],
+                    'tls_handshakes': self.tls_handshakes[host],
+                }
+                for host in set(self.requests) | set(self.new_connections)
+            }
+        reused = max(0, total_requests - total_connections)
+        return {
+            'requests': total_requests,
+            'new_connections': total_connections,
+            'tls_handshakes': sum(by_host[host]['tls_handshakes'] for host in by_host),
+            'reused_connections': reused,
+            'reuse_rate': round(reused / total_requests, 3) if total_requests else None,
+            'by_host': by_host,
+        }
+
+def counting_pool(base, stats, tls):
+    """Subclasse do connection pool do urllib3 que conta cada conexão nova (DNS + TCP [+ TLS])"""
+    class CountingPool(base):
+        def _new_conn(self):
+            stats.record_connection(self.host, tls)
+            return super()._new_conn()
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter com pools por host limitados, token bucket por host e contagem de requisições e conexões"""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': counting_pool(HTTPConnectionPool, self.stats, tls=False),
+            'https': counting_pool(HTTPSConnectionPool, self.stats, tls=True),
+        }
+
+    def send(self, request, *args, **kwargs):
+        host = urlsplit(request.url).hostname
+        limiter = get_rate_limiter()
+        limiter.acquire(host)
+        self.stats.record_request(host)
+        response = super().send(request, *args, **kwargs)
+        if response.status_code in (429, 503):
+            delay = retry_after_seconds(response)
+            if delay:
+                limiter.penalize(host, delay)
+        return response
+
+class SessionPool:
+    """Sessões por thread (cookies não são thread-safe) que compartilham o mesmo adapter"""
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK):
+        self.stats = ConnectionStats()
+        self.config = {'pool_connections': pool_connections, 'pool_maxsize': pool_maxsize, 'pool_block': pool_block}
+        self.adapter = InstrumentedAdapter(self.stats, **self.config)
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def snapshot(self):
+        snapshot = self.stats.snapshot()
+        snapshot['pool'] = {**self.config, 'sessions': len(self._sessions)}
+        snapshot['rate_limit'] = get_rate_limiter().snapshot()
+        return snapshot
+
+    def close(self):
+        self.adapter.close()
+
+# Um pool por processo (gunicorn --preload importa o módulo no master antes do fork)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_session_pool():
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SessionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+def get_session():
+    """Sessão keep-alive da thread atual (conexões compartilhadas por todo o worker)"""
+    return get_session_pool().session()
+
+def http_pool_snapshot():
+    """Métricas de reuso de conexão para o /health (None se ainda não foi usado)"""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.snapshot()
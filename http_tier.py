@@ -0,0 +1,321 @@
+# http_tier.py
+# Tier rápido de scraping: HTTP puro (sessões keep-alive do worker) lendo o estado que o
+# Mercado Livre embute na página (__PRELOADED_STATE__ e JSON-LD). Só quando a
+# detecção de bloqueio dispara a URL sobe para o Playwright.
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+from http_session import get_session
+from page_classifier import OK, NOT_FOUND, classify
+from selectors_ml import parse_list_items
+from product_scraper import extract_product_details
+from tier_stats import record_tier, record_latency
+from circuit_breaker import CircuitOpenError, check_breaker
+from metrics import timed_parser, observe_html_bytes, count_block
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+HTTP_TIER_ENABLED = os.getenv('HTTP_TIER', 'on').lower() not in ('0', 'off', 'false', 'no')
+HTTP_TIER_TIMEOUT = float(os.getenv('HTTP_TIER_TIMEOUT', '15'))
+HTTP_TIER_CONCURRENCY = int(os.getenv('HTTP_TIER_CONCURRENCY', '8'))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    # Sem 'br': requests só decodifica brotli com o pacote brotli instalado
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+}
+
+def fetch_html(url, timeout=HTTP_TIER_TIMEOUT):
+    """GET simples pela sessão keep-alive do worker; retorna (html, status)"""
+    response = get_session().get(url, headers=DEFAULT_HEADERS, timeout=timeout, allow_redirects=True)
+    observe_html_bytes('http', response.text)
+    return response.text, response.status_code
+
+def detect_block(html, status, page_type):
+    """Motivo do bloqueio (str) ou None se a página é utilizável; ver page_classifier.classify"""
+    verdict, reason = classify(html, status, page_type)
+    return None if verdict == OK else reason
+
+# --- Estado embutido -------------------------------------------------------
+
+STATE_MARKER = '__PRELOADED_STATE__'
+JSON_LD_PATTERN = re.compile(r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+def extract_preloaded_state(html):
+    """Decodifica o JSON de __PRELOADED_STATE__ (tag <script id=...> ou atribuição window.*)"""
+    position = html.find(STATE_MARKER)
+    while position != -1:
+        start = html.find('{', position)
+        if start == -1:
+            return None
+        try:
+            state, _end = json.JSONDecoder().raw_decode(html, start)
+            return state
+        except ValueError:
+            position = html.find(STATE_MARKER, position + len(STATE_MARKER))
+    return None
+
+def find_results(node, depth=0):
+    """Procura a lista `results` de polycards em qualquer nível do estado"""
+    if depth > 8:
+        return None
+    if isinstance(node, dict):
+        results = node.get('results')
+        if isinstance(results, list) and any(isinstance(r, dict) and 'polycard' in r for r in results):
+            return results
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            found = find_results(child, depth + 1)
+            if found is not None:
+                return found
+    return None
+
+def format_price(value):
+    """123456.7 -> '123.456,70' (mesmo formato de clean_price no HTML)"""
+    if value is None:
+        return None
+    value = float(value)
+    whole = int(value)
+    cents = int(round((value - whole) * 100))
+    if cents == 100:
+        whole, cents = whole + 1, 0
+    fraction = f"{whole:,}".replace(',', '.')
+    return f"{fraction},{cents:02d}" if cents else fraction
+
+def component_text(component, key):
+    value = component.get(key) or {}
+    return value.get('text') if isinstance(value, dict) else None
+
+def polycard_to_item(card):
+    """Converte um polycard do estado no mesmo dict gerado por parse_list_items"""
+    metadata = card.get('metadata') or {}
+    components = {c.get('type'): c for c in card.get('components') or [] if isinstance(c, dict)}
+
+    url = metadata.get('url')
+    link = None
+    if url:
+        link = url if url.startswith('http') else f"https://{url}"
+        if metadata.get('url_params'):
+            link += metadata['url_params'] if metadata['url_params'].startswith('?') else f"?{metadata['url_params']}"
+
+    price = (components.get('price') or {}).get('price') or {}
+    reviews = (components.get('reviews') or {}).get('reviews') or {}
+    pictures = (card.get('pictures') or {}).get('pictures') or []
+    image = None
+    if pictures and pictures[0].get('id'):
+        image = f"https://http2.mlstatic.com/D_NQ_NP_{pictures[0]['id']}-O.webp"
+
+    return {
+        "title": component_text(components.get('title') or {}, 'title'),
+        "price": format_price((price.get('current_price') or {}).get('value')),
+        "previous_price": format_price((price.get('previous_price') or {}).get('value')),
+        "discount": (price.get('discount_label') or {}).get('text'),
+        "brand": component_text(components.get('brand') or {}, 'brand'),
+        "seller": component_text(components.get('seller') or {}, 'seller'),
+        "rating": str(reviews['rating_average']) if reviews.get('rating_average') is not None else None,
+        "reviews_total": f"({reviews['total']})" if reviews.get('total') is not None else None,
+        "shipping": component_text(components.get('shipping') or {}, 'shipping'),
+        "sponsored": bool(metadata.get('is_ad')) or 'ads_promotions' in components,
+        "link": link,
+        "is_tracking_link": bool(link) and 'click1.mercadolivre.com.br' in link,
+        "image": image,
+    }
+
+@timed_parser('list_state')
+def parse_list_state(html, limit=None):
+    """Itens da listagem a partir do estado embutido; cai para o parser HTML se não houver estado.
+
+    Com `limit` só os primeiros itens são convertidos (e o parser HTML para no limite).
+    """
+    state = extract_preloaded_state(html)
+    results = find_results(state) if state else None
+    if results:
+        items = []
+        for r in results:
+            if limit is not None and len(items) >= limit:
+                break
+            if not isinstance(r, dict) or not r.get('polycard'):
+                continue
+            item = polycard_to_item(r['polycard'])
+            if any([item['title'], item['price'], item['link']]):
+                items.append(item)
+        if items:
+            return items
+    return parse_list_items(html, limit=limit)
+
+def find_json_ld_product(html):
+    for block in JSON_LD_PATTERN.findall(html):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for candidate in (data if isinstance(data, list) else data.get('@graph', [data])):
+            if isinstance(candidate, dict) and candidate.get('@type') == 'Product':
+                return candidate
+    return None
+
+@timed_parser('product_state')
+def parse_product_state(html, url):
+    """Detalhes do produto: extrator padrão completado com o JSON-LD embutido"""
+    details = extract_product_details(html, url)
+    product = find_json_ld_product(html)
+    if not details or not product:
+        return details
+
+    offers = product.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    if details.get('title') in (None, '', 'Produto sem título') and product.get('name'):
+        details['title'] = product['name']
+    if not details.get('price') and offers.get('price') is not None:
+        details['price'] = float(offers['price'])
+    if not details.get('image_url') and product.get('image'):
+        image = product['image']
+        details['image_url'] = image[0] if isinstance(image, list) else image
+    return details
+
+PARSERS = {
+    'list': parse_list_state,
+    'details': parse_product_state,
+}
+
+def scrape_http(url, page_type, timeout=HTTP_TIER_TIMEOUT, limit=None):
+    """Busca e parseia uma página pelo tier HTTP.
+
+    Retorna dict com `page_class` (veredicto do page_classifier), `blocked` (motivo ou
+    None), `result` (itens ou detalhes), `html`, `status`, `bytes` e `elapsed`. Páginas sem
+    dados utilizáveis contam como bloqueio para que o chamador escale para o Playwright;
+    em `not_found` não há o que escalar. `limit` vale só para listas.
+    """
+    start_time = time.time()
+    html, status = fetch_html(url, timeout)
+    page_class, blocked = classify(html, status, page_type)
+    if page_class != OK:
+        count_block('http', page_type, page_class, blocked)
+    result = None
+    if page_class == OK:
+        parser = PARSERS[page_type]
+        result = parser(html, limit) if page_type == 'list' else parser(html, url)
+        if not result or (page_type == 'details' and result.get('title') in (None, '', 'Produto sem título')):
+            blocked = 'no_data'
+            result = None
+    return {
+        'page_class': page_class,
+        'blocked': blocked,
+        'result': result,
+        'html': html,
+        'status': status,
+        'bytes': len(html or ''),
+        'elapsed': round(time.time() - start_time, 3)
+    }
+
+async def scrape_http_async(url, page_type, timeout=HTTP_TIER_TIMEOUT, limit=None):
+    """Versão para o event loop (HTTP e parse numa thread auxiliar), registrando o resultado do tier"""
+    try:
+        outcome = await asyncio.to_thread(scrape_http, url, page_type, timeout, limit)
+    except Exception as e:
+        record_tier('http', page_type, 'error', type(e).__name__)
+        raise
+    escalated = outcome['blocked'] and outcome['page_class'] != NOT_FOUND
+    record_tier('http', page_type, 'escalated' if escalated else 'hit', outcome['blocked'])
+    record_latency('http', page_type, outcome['elapsed'])
+    return outcome
+
+async def fetch_many_http(urls, parse, page_type, concurrency=HTTP_TIER_CONCURRENCY, timeout=HTTP_TIER_TIMEOUT,
+                          parse_with_url=False, validate=None, on_result=None, deadline=None):
+    """Equivalente HTTP de BrowserPool.fetch_many: mesmos dicts de saída, com `reason` 'blocked' quando escala.
+
+    `validate(result)` falso também conta como bloqueio ('no_data'). Páginas que o
+    classificador dá como inexistentes voltam com `reason` 'not_found' e não escalam.
+    `on_result` só é chamado para URLs resolvidas aqui; as demais ficam para o Playwright.
+    Com o breaker do tier HTTP aberto a URL escala na hora com `reason` 'circuit_open'.
+    URLs que não terminam dentro de `deadline` (segundos) voltam com `reason` 'deadline'.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = [
+        {'url': url, 'ok': False, 'result': None, 'reason': None, 'error': None, 'elapsed': None, 'tier': 'http'}
+        for url in urls
+    ]
+
+    def fetch_and_parse(url):
+        html, status = fetch_html(url, timeout)
+        page_class, blocked = classify(html, status, page_type)
+        if page_class != OK:
+            count_block('http', page_type, page_class, blocked)
+            return page_class, blocked, None
+        result = parse(html, url) if parse_with_url else parse(html)
+        if validate and not validate(result):
+            return page_class, 'no_data', None
+        return page_class, None, result
+
+    async def worker(index, url):
+        async with semaphore:
+            item_start = time.time()
+            try:
+                breaker = check_breaker('http', page_type)
+            except CircuitOpenError as e:
+                results[index].update({'reason': 'circuit_open', 'error': str(e), 'elapsed': 0.0})
+                record_tier('http', page_type, 'escalated', 'circuit_open')
+                return
+            try:
+                page_class, blocked, result = await asyncio.to_thread(fetch_and_parse, url)
+                if page_class == NOT_FOUND:
+                    results[index].update({'reason': 'not_found', 'error': f'página não encontrada: {blocked}'})
+                    record_tier('http', page_type, 'hit', blocked)
+                elif blocked:
+                    results[index].update({'reason': 'blocked', 'error': f'bloqueio detectado: {blocked}'})
+                    record_tier('http', page_type, 'escalated', blocked)
+                else:
+                    results[index].update({'ok': True, 'result': result})
+                    record_tier('http', page_type, 'hit')
+            except Exception as e:
+                results[index].update({'reason': 'error', 'error': str(e)})
+                record_tier('http', page_type, 'error', type(e).__name__)
+            except asyncio.CancelledError:
+                if breaker:
+                    breaker.release()
+                raise
+            if breaker:
+                breaker.record(results[index]['ok'] or results[index]['reason'] == 'not_found')
+            results[index]['elapsed'] = round(time.time() - item_start, 3)
+            if results[index]['reason'] != 'error':
+                record_latency('http', page_type, results[index]['elapsed'])
+            if on_result and (results[index]['ok'] or results[index]['reason'] == 'not_found'):
+                on_result(index, results[index])
+
+    tasks = {asyncio.create_task(worker(index, url)): index for index, url in enumerate(urls)}
+    if not tasks:
+        return results
+
+    # Espera por token do rate limiter + timeout do GET + fila do semáforo podem passar do
+    # prazo do lote: o que não terminou a tempo é cancelado e volta como 'deadline'
+    _done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in pending:
+            results[tasks[task]].update({'reason': 'deadline', 'error': f'prazo global de {deadline}s excedido'})
+        logger.warning(f"fetch_many_http: {len(pending)} de {len(tasks)} URL(s) não terminaram no prazo de {deadline}s")
+    return results
@@ -0,0 +1,360 @@
+# job_queue.py
+# Fila de jobs em background para scrapes longos: os jobs ficam num SQLite local
+# (sobrevive ao restart dos workers por --max-requests) e threads de cada worker
+# gunicorn drenam a fila executando os núcleos assíncronos no event loop do worker.
+
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import concurrent.futures
+
+from async_runtime import submit
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_scraper_jobs.sqlite3'))
+WORKERS = int(os.getenv('JOBS_WORKERS', '1'))               # threads consumidoras por processo
+JOB_TIMEOUT = float(os.getenv('JOBS_TIMEOUT', '900'))       # segundos máximos por job
+HEARTBEAT_INTERVAL = float(os.getenv('JOBS_HEARTBEAT', '5'))
+STALE_AFTER = float(os.getenv('JOBS_STALE_AFTER', '60'))     # sem heartbeat por N s => worker morreu
+MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '3'))
+POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))
+PROGRESS_INTERVAL = float(os.getenv('JOBS_PROGRESS_INTERVAL', '1'))  # intervalo mínimo entre gravações de progresso
+RETENTION = float(os.getenv('JOBS_RETENTION', '86400'))      # jobs terminados são apagados após N s
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    partial TEXT,
+    result TEXT,
+    http_status INTEGER,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobStore:
+    """Persistência dos jobs em SQLite (uma conexão por operação, seguro entre threads e processos)"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Closing(conn)
+
+    def create(self, job_type, params):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, type, params, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, job_type, json.dumps(params), time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def has_queued(self):
+        """Leitura simples (sem trava de escrita) para saber se vale tentar o claim"""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM jobs WHERE status = 'queued' LIMIT 1").fetchone() is not None
+
+    def claim(self, worker):
+        """Pega o job mais antigo da fila de forma atômica (BEGIN IMMEDIATE trava escritas entre processos)"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?",
+                    (worker, now, now, row['id'])
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+        return self._to_dict(job)
+
+    def heartbeat(self, job_id, worker):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker)
+            )
+
+    def update_progress(self, job_id, worker, done, total, partial=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, partial = ?, heartbeat_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (done, total, json.dumps(partial) if partial is not None else None, time.time(), job_id, worker)
+            )
+
+    def finish(self, job_id, worker, result, http_status):
+        """Grava o resultado; só vale se o job ainda pertence a este worker"""
+        status = 'done' if http_status < 400 else 'failed'
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, http_status = ?, error = ?, partial = NULL, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result), http_status,
+                 result.get('error') if status == 'failed' and isinstance(result, dict) else None,
+                 time.time(), job_id, worker)
+            )
+
+    def fail(self, job_id, worker, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, time.time(), job_id, worker)
+            )
+
+    def requeue_stale(self, stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS):
+        """Devolve à fila jobs cujo worker parou de mandar heartbeat (processo reiniciado ou morto)"""
+        limit = time.time() - stale_after
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker interrompido ' || attempts || ' vez(es)', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), limit, max_attempts)
+            )
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                (limit,)
+            )
+        return cursor.rowcount
+
+    def release(self, worker_prefix):
+        """Devolve à fila os jobs em andamento deste processo (encerramento gracioso)"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND worker LIKE ?",
+                (f"{worker_prefix}%",)
+            )
+        return cursor.rowcount
+
+    def purge(self, retention=RETENTION):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - retention,)
+            )
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        for key in ('params', 'partial', 'result'):
+            if job.get(key) is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+class _Closing:
+    """Context manager que fecha a conexão sqlite ao sair (o do sqlite3 só faz commit)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+        return False
+
+class JobWorkers:
+    """Threads que consomem a fila e executam os jobs no event loop do worker"""
+
+    def __init__(self, store, handlers, workers=WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self.prefix = f"{socket.gethostname()}:{os.getpid()}:"
+        self._stop = threading.Event()
+        self._requeue_lock = threading.Lock()
+        self._next_requeue = 0.0
+        self.threads = [
+            threading.Thread(target=self._loop, args=(f"{self.prefix}{index}",), name=f'job-worker-{index}', daemon=True)
+            for index in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _requeue_stale_due(self):
+        """requeue_stale num timer próprio (a cada STALE_AFTER/2), feito por uma thread só"""
+        now = time.time()
+        with self._requeue_lock:
+            if now < self._next_requeue:
+                return
+            self._next_requeue = now + STALE_AFTER / 2
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.info(f"{requeued} job(s) sem heartbeat devolvido(s) à fila")
+
+    def _loop(self, worker):
+        while not self._stop.is_set():
+            try:
+                self._requeue_stale_due()
+                # SELECT simples antes do BEGIN IMMEDIATE: fila vazia não disputa a trava de escrita
+                job = self.store.claim(worker) if self.store.has_queued() else None
+            except Exception as e:
+                logger.error(f"Erro ao consultar a fila de jobs: {e}")
+                job = None
+
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+
+            self._run(job, worker)
+
+    def _run(self, job, worker):
+        job_id = job['id']
+        handler = self.handlers.get(job['type'])
+        logger.info(f"Job {job_id} ({job['type']}) iniciado por {worker} (tentativa {job['attempts']})")
+        if handler is None:
+            self.store.fail(job_id, worker, f"tipo de job desconhecido: {job['type']}")
+            return
+
+        # Último progresso ainda não gravado; o event loop só troca o valor e a thread do
+        # job grava no SQLite (trava entre processos, JSON dos itens) enquanto espera o resultado
+        pending = []
+        pending_lock = threading.Lock()
+
+        def progress(items, done, total):
+            # Cópia rasa dos itens: o enriquecimento continua alterando os originais no loop
+            snapshot = [dict(item) for item in items] if items is not None else None
+            with pending_lock:
+                pending[:] = [(done, total, snapshot)]
+
+        def flush_progress():
+            with pending_lock:
+                if not pending:
+                    return False
+                done, total, items = pending.pop()
+            try:
+                self.store.update_progress(job_id, worker, done, total, items)
+            except Exception as e:
+                logger.warning(f"Job {job_id}: falha ao gravar progresso: {e}")
+            return True
+
+        start_time = time.time()
+        last_beat = start_time
+        try:
+            future = submit(handler(job['params'], progress))
+            while True:
+                try:
+                    payload, status = future.result(timeout=min(PROGRESS_INTERVAL, HEARTBEAT_INTERVAL))
+                    break
+                except concurrent.futures.TimeoutError:
+                    if time.time() - start_time > JOB_TIMEOUT:
+                        future.cancel()
+                        raise TimeoutError(f"job excedeu {JOB_TIMEOUT}s")
+                    # Gravar o progresso também renova o heartbeat
+                    if flush_progress():
+                        last_beat = time.time()
+                    elif time.time() - last_beat >= HEARTBEAT_INTERVAL:
+                        self.store.heartbeat(job_id, worker)
+                        last_beat = time.time()
+            flush_progress()
+            self.store.finish(job_id, worker, payload, status)
+            logger.info(f"Job {job_id} terminado com status {status} em {time.time() - start_time:.1f}s")
+        except Exception as e:
+            logger.error(f"Job {job_id} falhou: {e}")
+            self.store.fail(job_id, worker, str(e))
+
+    def stop(self):
+        self._stop.set()
+
+    def alive(self):
+        return sum(1 for thread in self.threads if thread.is_alive())
+
+# Um conjunto de consumidores por processo (threads não sobrevivem ao fork do gunicorn --preload)
+_store = None
+_workers = None
+_workers_pid = None
+_lock = threading.Lock()
+
+def get_job_store():
+    global _store
+
+    with _lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
+
+def ensure_job_workers(handlers):
+    """Inicia os consumidores deste processo se ainda não existirem"""
+    global _workers, _workers_pid
+
+    store = get_job_store()
+    with _lock:
+        if _workers is None or _workers_pid != os.getpid():
+            _workers = JobWorkers(store, handlers)
+            _workers_pid = os.getpid()
+            logger.info(f"{len(_workers.threads)} consumidor(es) de jobs iniciado(s) no processo {_workers_pid}")
+            try:
+                store.purge()
+            except Exception as e:
+                logger.warning(f"Erro ao limpar jobs antigos: {e}")
+        return _workers
+
+def job_queue_snapshot():
+    """Resumo da fila para o /health"""
+    if _store is None:
+        return None
+    snapshot = {'db_path': _store.path, 'counts': _store.counts()}
+    if _workers is not None and _workers_pid == os.getpid():
+        snapshot['workers_alive'] = _workers.alive()
+    return snapshot
+
+def shutdown_job_workers():
+    """Devolve à fila os jobs em andamento deste processo (registrado no atexit, antes de drenar o pool)"""
+    global _workers
+
+    if _workers is None or _workers_pid != os.getpid():
+        return
+    _workers.stop()
+    released = _store.release(_workers.prefix)
+    if released:
+        logger.info(f"{released} job(s) em andamento devolvido(s) à fila")
+    _workers = None
+
+atexit.register(shutdown_job_workers)
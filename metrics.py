@@ -0,0 +1,129 @@
+# metrics.py
+# Métricas no formato Prometheus (GET /metrics): histogramas de duração das requisições,
+# dos fetches por tier, dos parsers, do lançamento de navegadores, da espera por um
+# navegador do pool e do tamanho do HTML, mais contadores de transições da cascata e de
+# bloqueios detectados.
+#
+# Com PROMETHEUS_MULTIPROC_DIR definido (o gunicorn.conf.py define um por padrão) cada
+# worker grava seus valores em arquivos mmap próprios e o /metrics de qualquer worker
+# agrega todos; sem ele, as métricas são só do processo. Sem prometheus_client
+# instalado, as funções de registro não fazem nada.
+
+import logging
+import os
+import time
+from functools import wraps
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+METRICS_ENABLED = PROMETHEUS_AVAILABLE and os.getenv('METRICS', 'on').lower() not in ('0', 'off', 'false', 'no')
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Buckets por grandeza medida
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FETCH_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+LAUNCH_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 524288, 1048576, 2097152, 4194304, 8388608)
+
+if not PROMETHEUS_AVAILABLE:
+    logger.info("prometheus_client não instalado; /metrics desativado")
+
+if METRICS_ENABLED:
+    REQUEST_DURATION = Histogram(
+        'scraper_request_duration_seconds', 'Duração das requisições por endpoint',
+        ('endpoint', 'method', 'status'), buckets=REQUEST_BUCKETS)
+    FETCH_DURATION = Histogram(
+        'scraper_fetch_duration_seconds', 'Duração dos fetches que chegaram a uma resposta, por tier',
+        ('tier', 'page_type'), buckets=FETCH_BUCKETS)
+    PARSE_DURATION = Histogram(
+        'scraper_parse_duration_seconds', 'Duração do parse por parser',
+        ('parser',), buckets=PARSE_BUCKETS)
+    BROWSER_LAUNCH = Histogram(
+        'scraper_browser_launch_seconds', 'Tempo de lançamento de um navegador do pool',
+        buckets=LAUNCH_BUCKETS)
+    POOL_WAIT = Histogram(
+        'scraper_pool_wait_seconds', 'Espera por um navegador/contexto livre no pool',
+        buckets=WAIT_BUCKETS)
+    HTML_BYTES = Histogram(
+        'scraper_html_bytes', 'Tamanho do HTML baixado, por tier',
+        ('tier',), buckets=BYTES_BUCKETS)
+    FALLBACK_TRANSITIONS = Counter(
+        'scraper_fallback_transitions_total', 'Passagens de um tier para o próximo na cascata',
+        ('page_type', 'from_tier', 'to_tier'))
+    BLOCK_DETECTIONS = Counter(
+        'scraper_block_detections_total', 'Páginas classificadas como não utilizáveis, por tier e veredicto',
+        ('tier', 'page_type', 'verdict', 'reason'))
+
+def observe_request(endpoint, method, status, seconds):
+    if METRICS_ENABLED:
+        REQUEST_DURATION.labels(endpoint, method, str(status)).observe(seconds)
+
+def observe_fetch(tier, page_type, seconds):
+    if METRICS_ENABLED:
+        FETCH_DURATION.labels(tier, page_type or 'other').observe(seconds)
+
+def observe_parse(parser, seconds):
+    if METRICS_ENABLED:
+        PARSE_DURATION.labels(parser).observe(seconds)
+
+def observe_browser_launch(seconds):
+    if METRICS_ENABLED:
+        BROWSER_LAUNCH.observe(seconds)
+
+def observe_pool_wait(seconds):
+    if METRICS_ENABLED:
+        POOL_WAIT.observe(seconds)
+
+def observe_html_bytes(tier, html):
+    if METRICS_ENABLED and html:
+        HTML_BYTES.labels(tier).observe(len(html))
+
+def count_fallback(page_type, from_tier, to_tier, amount=1):
+    if METRICS_ENABLED and amount:
+        FALLBACK_TRANSITIONS.labels(page_type or 'other', from_tier, to_tier).inc(amount)
+
+def count_block(tier, page_type, verdict, reason):
+    if METRICS_ENABLED:
+        BLOCK_DETECTIONS.labels(tier, page_type or 'other', verdict, reason or verdict).inc()
+
+def timed_parser(parser):
+    """Decorator que mede cada chamada do parser em scraper_parse_duration_seconds"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                observe_parse(parser, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+def render_metrics():
+    """(corpo, content-type) da exposição Prometheus, agregando os workers em modo multiprocesso"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def metrics_snapshot():
+    """Modo das métricas para o /health"""
+    return {
+        'enabled': METRICS_ENABLED,
+        'available': PROMETHEUS_AVAILABLE,
+        'multiprocess': bool(METRICS_ENABLED and MULTIPROC_DIR),
+    }
@@ -3,7 +3,10 @@ import asyncio
 import random
 import time
 import os
+import weakref
+from urllib.parse import urlparse
 from playwright.async_api import async_playwright
+from async_runtime import run_sync
 from bs4 import BeautifulSoup
 import logging
 
@@ -11,12 +14,317 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+# Timeout padrão de página/navegação (ms)
+PAGE_TIMEOUT_MS = 120000
+
+# Args stealth para evitar detecção
+STEALTH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--exclude-switches=enable-automation',
+    '--disable-extensions-except',
+    '--disable-plugins-discovery',
+    f'--user-agent={USER_AGENT}'
+]
+
+# Produção: Chromium headless otimizado
+PRODUCTION_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--no-zygote',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-field-trial-config',
+    '--disable-ipc-flooding-protection',
+] + STEALTH_ARGS
+
+# Create context with realistic Brazilian settings
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1366, 'height': 768},  # Resolução mais comum no Brasil
+    'user_agent': USER_AGENT,
+    'locale': 'pt-BR',
+    'timezone_id': 'America/Sao_Paulo',
+    'permissions': ['geolocation', 'notifications'],
+    'geolocation': {'latitude': -23.5505, 'longitude': -46.6333},  # São Paulo coordinates
+    'extra_http_headers': {
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br, zstd',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+        'Cache-Control': 'max-age=0',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Sec-Ch-Ua': '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"Windows"',
+        'Upgrade-Insecure-Requests': '1'
+    },
+    'java_script_enabled': True,
+    'bypass_csp': True,
+    'ignore_https_errors': True
+}
+
+# Advanced stealth techniques injetadas em todo contexto novo
+STEALTH_INIT_SCRIPT = """
+    // Remove webdriver property
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+
+    // Mock realistic plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => {
+            return [
+                {
+                    0: {type: "application/x-google-chrome-pdf", suffixes: "pdf", description: "Portable Document Format"},
+                    description: "Portable Document Format",
+                    filename: "internal-pdf-viewer",
+                    length: 1,
+                    name: "Chrome PDF Plugin"
+                },
+                {
+                    0: {type: "application/pdf", suffixes: "pdf", description: "Portable Document Format"},
+                    description: "Portable Document Format",
+                    filename: "mhjfbmdgcfjbbpaeojofohoefgiehjai",
+                    length: 1,
+                    name: "Chrome PDF Viewer"
+                }
+            ];
+        },
+    });
+
+    // Mock realistic languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['pt-BR', 'pt', 'en-US', 'en'],
+    });
+
+    // Mock hardware concurrency
+    Object.defineProperty(navigator, 'hardwareConcurrency', {
+        get: () => 8,
+    });
+
+    // Mock device memory
+    Object.defineProperty(navigator, 'deviceMemory', {
+        get: () => 8,
+    });
+
+    // Mock WebGL vendor and renderer
+    const getParameter = WebGLRenderingContext.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(parameter) {
+        if (parameter === 37445) {
+            return 'Intel Inc.';
+        }
+        if (parameter === 37446) {
+            return 'Intel(R) HD Graphics 620';
+        }
+        return getParameter(parameter);
+    };
+
+    // Mock permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+
+    // Remove automation indicators
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
+
+    // Mock chrome runtime
+    if (!window.chrome) {
+        window.chrome = {};
+    }
+    if (!window.chrome.runtime) {
+        window.chrome.runtime = {
+            onConnect: undefined,
+            onMessage: undefined
+        };
+    }
+
+    // Mock realistic screen properties
+    Object.defineProperty(screen, 'availWidth', {
+        get: () => 1366,
+    });
+    Object.defineProperty(screen, 'availHeight', {
+        get: () => 728,
+    });
+    Object.defineProperty(screen, 'width', {
+        get: () => 1366,
+    });
+    Object.defineProperty(screen, 'height', {
+        get: () => 768,
+    });
+"""
+
+# Perfis de bloqueio de recursos por tipo de página. O parser só lê o HTML,
+# então imagens, fontes, mídia, CSS e rastreadores de terceiros são abortados.
+# `allow_url_patterns` lista trechos de URL que sempre passam.
+RESOURCE_BLOCK_PROFILES = {
+    'list': {
+        'block_types': {'image', 'media', 'font', 'stylesheet'},
+        'block_trackers': True,
+        'allow_url_patterns': []
+    },
+    'details': {
+        'block_types': {'image', 'media', 'font', 'stylesheet'},
+        'block_trackers': True,
+        'allow_url_patterns': []
+    },
+    # Screenshots para OCR precisam do layout renderizado
+    'screenshot': {
+        'block_types': {'media'},
+        'block_trackers': True,
+        'allow_url_patterns': []
+    },
+    'default': {
+        'block_types': {'media', 'font'},
+        'block_trackers': True,
+        'allow_url_patterns': []
+    }
+}
+
+# Hosts de analytics/ads de terceiros
+TRACKER_HOSTS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googleadservices.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'facebook.net',
+    'connect.facebook.com',
+    'hotjar.com',
+    'bat.bing.com',
+    'clarity.ms',
+    'criteo.com',
+    'criteo.net',
+    'taboola.com',
+    'outbrain.com',
+    'scorecardresearch.com',
+    'tiktok.com/i18n/pixel',
+    'analytics.tiktok.com'
+)
+
+# 'off' desativa o bloqueio; a fração de amostragem mantém uma linha de base sem
+# bloqueio (tempo e bytes medidos) para calcular o speedup e os bytes economizados
+# por tipo de página
+RESOURCE_BLOCKING = os.getenv('PLAYWRIGHT_RESOURCE_BLOCKING', 'on') != 'off'
+RESOURCE_BASELINE_SAMPLE = float(os.getenv('PLAYWRIGHT_RESOURCE_BASELINE_SAMPLE', '0.02'))
+
+# Espera adaptativa: a página está pronta quando os dados que o parser lê estão no DOM
+READINESS_TIMEOUT = float(os.getenv('PLAYWRIGHT_READINESS_TIMEOUT', '15'))
+LIST_ITEMS_COUNT_SCRIPT = """() => document.querySelectorAll('li.ui-search-layout__item').length
+    || document.querySelectorAll('div.poly-card__content').length"""
+DETAILS_READY_SCRIPT = """() => !!document.querySelector('.ui-pdp-title')
+    && !!document.querySelector('.andes-money-amount__fraction, .price-tag-fraction')"""
+DEFAULT_READY_SELECTOR = '.ui-pdp-title, .price-tag-fraction, .ui-pdp-gallery, .ui-pdp-description, .ui-search-results'
+
+# Botões de consentimento de cookies, procurados todos de uma vez
+COOKIE_CONSENT_SELECTORS = [
+    'button[data-testid="action:understood"]',  # ML específico
+    'button:has-text("Aceitar")',
+    'button:has-text("Entendi")',
+    'button:has-text("OK")',
+    'button:has-text("Concordo")',
+    '[data-testid="cookie-consent-accept"]',
+    '.cookie-accept',
+    '#cookie-accept',
+    'button[aria-label*="aceitar"]',
+    'button[aria-label*="Aceitar"]'
+]
+COOKIE_CONSENT_SELECTOR = ', '.join(COOKIE_CONSENT_SELECTORS)
+COOKIE_PROBE_TIMEOUT_MS = int(os.getenv('PLAYWRIGHT_COOKIE_PROBE_TIMEOUT_MS', '1500'))
+
+# Consentimento de cookies: 'accepted' vale só para o BrowserContext (o cookie fica nele);
+# banner ausente vale para a origem em todos os contextos do mesmo navegador, já que no
+# modo `browser` cada empréstimo abre um contexto novo
+_consent_accepted = weakref.WeakSet()            # BrowserContext
+_consent_absent = weakref.WeakKeyDictionary()    # Browser (ou contexto persistente) -> origens
+
+# Atrasos "humanos" viram um orçamento opcional (segundos por navegação); 0 = sem pausas artificiais
+STEALTH_BUDGET = float(os.getenv('PLAYWRIGHT_STEALTH_BUDGET', '0'))
+
+# Carregamentos recentes sem bloqueio, por tipo de página: (segundos, bytes transferidos)
+_unblocked_loads = {}
+
+def detect_page_type(url):
+    """Classifica a URL como 'list', 'details' ou 'default'"""
+    if 'lista.mercadolivre.com.br' in url:
+        return 'list'
+    if 'produto.mercadolivre.com.br' in url or '/p/MLB' in url or 'MLB-' in url:
+        return 'details'
+    return 'default'
+
+def _record_unblocked_load(page_type, elapsed, bytes_loaded, keep=20):
+    samples = _unblocked_loads.setdefault(page_type, [])
+    samples.append((elapsed, bytes_loaded))
+    del samples[:-keep]
+
+def _unblocked_baseline(page_type):
+    """Médias (segundos, bytes) das amostras sem bloqueio, ou None sem amostras"""
+    samples = _unblocked_loads.get(page_type)
+    if not samples:
+        return None
+    return (sum(elapsed for elapsed, _ in samples) / len(samples),
+            sum(loaded for _, loaded in samples) / len(samples))
+
+async def launch_browser(playwright):
+    """Lança o Chromium com as configurações do ambiente (produção ou desenvolvimento)"""
+    is_production = os.getenv('RAILWAY_ENVIRONMENT') is not None
+    
+    if is_production:
+        return await playwright.chromium.launch(headless=True, args=PRODUCTION_ARGS)
+    
+    # Desenvolvimento: tentar usar Chrome real se disponível
+    try:
+        browser = await playwright.chromium.launch(
+            channel='chrome',  # Usar Chrome real instalado
+            headless=False,    # Visível para debug
+            args=STEALTH_ARGS
+        )
+        logger.info("Usando Chrome real para desenvolvimento")
+        return browser
+    except Exception as e:
+        logger.warning(f"Chrome real não disponível, usando Chromium: {e}")
+        # Fallback para Chromium
+        return await playwright.chromium.launch(headless=True, args=STEALTH_ARGS)
+
+async def new_stealth_context(browser):
+    """Cria um BrowserContext isolado já com as opções pt-BR e o script stealth"""
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    return context
+
 class PlaywrightScraper:
     def __init__(self):
         self.browser = None
         self.context = None
         self.page = None
         self.playwright = None
+        # Preenchidos quando a página vem do browser pool
+        self.lease_info = None
+        self.last_fetch_info = None
+        # Perfil de bloqueio de recursos ativo (None = sem bloqueio)
+        self.resource_profile = None
+        self.last_resource_report = None
+        self._routed_page = None
+        self._resource_stats = None
+        # Orçamento de pausas humanas por navegação
+        self.stealth_budget = STEALTH_BUDGET
+        self._stealth_remaining = STEALTH_BUDGET
+        self.last_readiness = None
         
     async def __aenter__(self):
         """Context manager entry"""
@@ -69,88 +377,7 @@ class PlaywrightScraper:
             # Detectar se estamos em produção (Railway) ou desenvolvimento
             is_production = os.getenv('RAILWAY_ENVIRONMENT') is not None
             
-            if is_production:
-                # Produção: usar Chromium headless otimizado
-                self.browser = await self.playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-accelerated-2d-canvas',
-                        '--no-first-run',
-                        '--no-zygote',
-                        '--disable-gpu',
-                        '--disable-web-security',
-                        '--disable-features=VizDisplayCompositor',
-                        '--disable-background-timer-throttling',
-                        '--disable-backgrounding-occluded-windows',
-                        '--disable-renderer-backgrounding',
-                        '--disable-field-trial-config',
-                        '--disable-ipc-flooding-protection',
-                        # Stealth args para evitar detecção
-                        '--disable-blink-features=AutomationControlled',
-                        '--exclude-switches=enable-automation',
-                        '--disable-extensions-except',
-                        '--disable-plugins-discovery',
-                        '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
-                    ]
-                )
-            else:
-                # Desenvolvimento: tentar usar Chrome real se disponível
-                try:
-                    self.browser = await self.playwright.chromium.launch(
-                        channel='chrome',  # Usar Chrome real instalado
-                        headless=False,    # Visível para debug
-                        args=[
-                            '--disable-blink-features=AutomationControlled',
-                            '--exclude-switches=enable-automation',
-                            '--disable-extensions-except',
-                            '--disable-plugins-discovery',
-                            '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
-                        ]
-                    )
-                    logger.info("Usando Chrome real para desenvolvimento")
-                except Exception as e:
-                    logger.warning(f"Chrome real não disponível, usando Chromium: {e}")
-                    # Fallback para Chromium
-                    self.browser = await self.playwright.chromium.launch(
-                        headless=True,
-                        args=[
-                            '--disable-blink-features=AutomationControlled',
-                            '--exclude-switches=enable-automation',
-                            '--disable-extensions-except',
-                            '--disable-plugins-discovery',
-                            '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
-                        ]
-                    )
-            
-            # Create context with realistic Brazilian settings
-            context_options = {
-                'viewport': {'width': 1366, 'height': 768},  # Resolução mais comum no Brasil
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                'locale': 'pt-BR',
-                'timezone_id': 'America/Sao_Paulo',
-                'permissions': ['geolocation', 'notifications'],
-                'geolocation': {'latitude': -23.5505, 'longitude': -46.6333},  # São Paulo coordinates
-                'extra_http_headers': {
-                    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                    'Accept-Encoding': 'gzip, deflate, br, zstd',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                    'Cache-Control': 'max-age=0',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1',
-                    'Sec-Ch-Ua': '"Google Chrome";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
-                    'Sec-Ch-Ua-Mobile': '?0',
-                    'Sec-Ch-Ua-Platform': '"Windows"',
-                    'Upgrade-Insecure-Requests': '1'
-                },
-                'java_script_enabled': True,
-                'bypass_csp': True,
-                'ignore_https_errors': True
-            }
+            self.browser = await launch_browser(self.playwright)
             
             # Tentar usar perfil persistente em desenvolvimento
             if not is_production:
@@ -170,116 +397,24 @@ class PlaywrightScraper:
                             '--disable-extensions-except',
                             '--disable-plugins-discovery'
                         ],
-                        **context_options
+                        **CONTEXT_OPTIONS
                     )
                     self.browser = None  # Context gerencia o browser
                     logger.info("Usando perfil persistente para desenvolvimento")
                 except Exception as e:
                     logger.warning(f"Perfil persistente não disponível: {e}")
-                    self.context = await self.browser.new_context(**context_options)
+                    self.context = await self.browser.new_context(**CONTEXT_OPTIONS)
             else:
-                self.context = await self.browser.new_context(**context_options)
+                self.context = await self.browser.new_context(**CONTEXT_OPTIONS)
             
             # Add advanced stealth techniques
-            await self.context.add_init_script("""
-                // Remove webdriver property
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                // Mock realistic plugins
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => {
-                        return [
-                            {
-                                0: {type: "application/x-google-chrome-pdf", suffixes: "pdf", description: "Portable Document Format"},
-                                description: "Portable Document Format",
-                                filename: "internal-pdf-viewer",
-                                length: 1,
-                                name: "Chrome PDF Plugin"
-                            },
-                            {
-                                0: {type: "application/pdf", suffixes: "pdf", description: "Portable Document Format"},
-                                description: "Portable Document Format",
-                                filename: "mhjfbmdgcfjbbpaeojofohoefgiehjai",
-                                length: 1,
-                                name: "Chrome PDF Viewer"
-                            }
-                        ];
-                    },
-                });
-                
-                // Mock realistic languages
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['pt-BR', 'pt', 'en-US', 'en'],
-                });
-                
-                // Mock hardware concurrency
-                Object.defineProperty(navigator, 'hardwareConcurrency', {
-                    get: () => 8,
-                });
-                
-                // Mock device memory
-                Object.defineProperty(navigator, 'deviceMemory', {
-                    get: () => 8,
-                });
-                
-                // Mock WebGL vendor and renderer
-                const getParameter = WebGLRenderingContext.getParameter;
-                WebGLRenderingContext.prototype.getParameter = function(parameter) {
-                    if (parameter === 37445) {
-                        return 'Intel Inc.';
-                    }
-                    if (parameter === 37446) {
-                        return 'Intel(R) HD Graphics 620';
-                    }
-                    return getParameter(parameter);
-                };
-                
-                // Mock permissions
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-                
-                // Remove automation indicators
-                delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
-                delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
-                delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
-                
-                // Mock chrome runtime
-                if (!window.chrome) {
-                    window.chrome = {};
-                }
-                if (!window.chrome.runtime) {
-                    window.chrome.runtime = {
-                        onConnect: undefined,
-                        onMessage: undefined
-                    };
-                }
-                
-                // Mock realistic screen properties
-                Object.defineProperty(screen, 'availWidth', {
-                    get: () => 1366,
-                });
-                Object.defineProperty(screen, 'availHeight', {
-                    get: () => 728,
-                });
-                Object.defineProperty(screen, 'width', {
-                    get: () => 1366,
-                });
-                Object.defineProperty(screen, 'height', {
-                    get: () => 768,
-                });
-            """)
+            await self.context.add_init_script(STEALTH_INIT_SCRIPT)
             
             self.page = await self.context.new_page()
             
             # Set realistic timeouts
-            self.page.set_default_timeout(120000)  # 120 seconds
-            self.page.set_default_navigation_timeout(120000)
+            self.page.set_default_timeout(PAGE_TIMEOUT_MS)  # 120 seconds
+            self.page.set_default_navigation_timeout(PAGE_TIMEOUT_MS)
             
             logger.info("Playwright browser initialized successfully")
             
@@ -302,11 +437,158 @@ class PlaywrightScraper:
         except Exception as e:
             logger.error(f"Error closing Playwright: {e}")
             
-    async def fetch_page_content(self, url, wait_for_selector=None, scroll_page=True):
+    async def apply_resource_profile(self, page_type):
+        """Ativa o perfil de bloqueio de recursos para a próxima navegação"""
+        self.resource_profile = RESOURCE_BLOCK_PROFILES.get(page_type, RESOURCE_BLOCK_PROFILES['default'])
+        self._resource_stats = {'blocked': {}, 'bytes_loaded': 0, 'responses': 0}
+        
+        # Registra os handlers uma única vez por página
+        if self._routed_page is not self.page:
+            await self.page.route('**/*', self._handle_route)
+            self.page.on('requestfinished', self._on_request_finished)
+            self._routed_page = self.page
+    
+    def clear_resource_profile(self):
+        """Desativa o bloqueio (as requisições seguem normalmente)"""
+        self.resource_profile = None
+        self._resource_stats = {'blocked': {}, 'bytes_loaded': 0, 'responses': 0}
+    
+    def _block_reason(self, resource_type, url):
+        profile = self.resource_profile
+        if not profile:
+            return None
+        if any(pattern in url for pattern in profile['allow_url_patterns']):
+            return None
+        if profile['block_trackers'] and any(host in url for host in TRACKER_HOSTS):
+            return 'tracker'
+        if resource_type in profile['block_types']:
+            return resource_type
+        return None
+    
+    async def _handle_route(self, route):
+        request = route.request
+        try:
+            reason = self._block_reason(request.resource_type, request.url)
+            if reason and self._resource_stats is not None:
+                blocked = self._resource_stats['blocked']
+                blocked[reason] = blocked.get(reason, 0) + 1
+            if reason:
+                await route.abort()
+            else:
+                await route.continue_()
+        except Exception as e:
+            logger.debug(f"Route handler error for {request.url[:80]}: {e}")
+    
+    async def _on_request_finished(self, request):
+        # Tamanho real transferido (corpo codificado + headers): content-length não vem em
+        # respostas chunked/comprimidas, que são a maioria do HTML e XHR do ML
+        stats = self._resource_stats
+        if stats is None:
+            return
+        try:
+            sizes = await request.sizes()
+            length = max(0, sizes['responseBodySize']) + max(0, sizes['responseHeadersSize'])
+        except Exception:
+            length = 0
+        stats['bytes_loaded'] += length
+        stats['responses'] += 1
+    
+    def _build_resource_report(self, page_type, elapsed):
+        """Relatório da navegação; speedup e bytes economizados vêm das amostras sem bloqueio
+        (None até existir uma para o tipo de página)"""
+        stats = self._resource_stats or {}
+        blocked = stats.get('blocked', {})
+        bytes_loaded = stats.get('bytes_loaded', 0)
+        report = {
+            'page_type': page_type,
+            'profile_enabled': self.resource_profile is not None,
+            'load_time': round(elapsed, 3),
+            'requests_blocked': sum(blocked.values()),
+            'blocked_by_type': blocked,
+            'bytes_loaded': bytes_loaded,
+            'bytes_saved': None,
+            'speedup': None
+        }
+        
+        if self.resource_profile is None:
+            _record_unblocked_load(page_type, elapsed, bytes_loaded)
+        else:
+            baseline = _unblocked_baseline(page_type)
+            if baseline and elapsed > 0:
+                baseline_time, baseline_bytes = baseline
+                report['baseline_load_time'] = round(baseline_time, 3)
+                report['baseline_bytes_loaded'] = round(baseline_bytes)
+                report['speedup'] = round(baseline_time / elapsed, 2)
+                report['bytes_saved'] = max(0, round(baseline_bytes - bytes_loaded))
+        
+        return report
+    
+    async def human_pause(self, min_seconds, max_seconds):
+        """Pausa aleatória "humana", limitada ao stealth budget restante da navegação"""
+        if self._stealth_remaining <= 0:
+            return
+        delay = min(random.uniform(min_seconds, max_seconds), self._stealth_remaining)
+        self._stealth_remaining -= delay
+        await asyncio.sleep(delay)
+    
+    async def wait_until_ready(self, page_type, timeout=READINESS_TIMEOUT):
+        """Espera até o DOM conter o que o parser precisa para o tipo de página.
+
+        Listas: a contagem de `li.ui-search-layout__item` estabilizou.
+        Produto: `.ui-pdp-title` e um nó de preço presentes.
+        """
+        start = time.time()
+        readiness = {'page_type': page_type, 'ready': False}
+        try:
+            if page_type == 'list':
+                ready, count = await self._wait_for_stable_count(LIST_ITEMS_COUNT_SCRIPT, timeout)
+                readiness.update({'ready': ready, 'items': count})
+            elif page_type == 'details':
+                await self.page.wait_for_function(DETAILS_READY_SCRIPT, timeout=timeout * 1000, polling=100)
+                readiness['ready'] = True
+            else:
+                await self.page.wait_for_selector(DEFAULT_READY_SELECTOR, timeout=timeout * 1000)
+                readiness['ready'] = True
+        except Exception as e:
+            logger.warning(f"Page not ready after {timeout}s ({page_type}): {e}")
+        
+        readiness['wait'] = round(time.time() - start, 3)
+        logger.info(f"Readiness: {readiness}")
+        return readiness
+    
+    async def _wait_for_stable_count(self, count_script, timeout, interval=0.25, stable_polls=2):
+        """Faz polling da contagem de elementos até ela repetir `stable_polls` vezes (e ser > 0)"""
+        deadline = time.time() + timeout
+        last_count = -1
+        stable = 0
+        while time.time() < deadline:
+            count = await self.page.evaluate(count_script)
+            if count > 0 and count == last_count:
+                stable += 1
+                if stable >= stable_polls:
+                    return True, count
+            else:
+                stable = 0
+            last_count = count
+            await asyncio.sleep(interval)
+        return False, max(last_count, 0)
+    
+    async def fetch_page_content(self, url, wait_for_selector=None, scroll_page=True, page_type=None, block_resources=None):
         """Fetch page content using Playwright with human-like behavior"""
         try:
             if not self.page:
                 raise Exception("Page not initialized")
+            
+            # Bloqueio de recursos pelo tipo de página (parte das buscas fica sem bloqueio como linha de base)
+            page_type = page_type or detect_page_type(url)
+            if block_resources is None:
+                block_resources = RESOURCE_BLOCKING and random.random() >= RESOURCE_BASELINE_SAMPLE
+            if block_resources:
+                await self.apply_resource_profile(page_type)
+            else:
+                self.clear_resource_profile()
+            fetch_start = time.time()
+            self._stealth_remaining = self.stealth_budget
                 
             logger.info(f"Navigating to: {url}")
             
@@ -322,14 +604,14 @@ class PlaywrightScraper:
                 
             logger.info(f"Page loaded with status: {response.status}")
             
-            # Random delay to simulate human behavior
-            await asyncio.sleep(random.uniform(1, 3))
+            # Random delay to simulate human behavior (só com stealth budget)
+            await self.human_pause(1, 3)
             
             # Accept cookies and perform initial interactions
             await self.accept_cookies_and_interact()
             
             # Wait for page hydration - important for SPAs like ML
-            await asyncio.sleep(random.uniform(2, 4))
+            await self.human_pause(2, 4)
             
             # Wait for specific selector if provided (PDP elements)
             if wait_for_selector:
@@ -339,33 +621,22 @@ class PlaywrightScraper:
                 except Exception as e:
                     logger.warning(f"Selector not found: {wait_for_selector} - {e}")
             
-            # Wait for common ML selectors to ensure page is fully loaded
-            ml_selectors = [
-                '.ui-pdp-title',  # Product title
-                '.price-tag-fraction',  # Price
-                '.ui-pdp-gallery',  # Image gallery
-                '.ui-pdp-description'  # Description
-            ]
-            
-            for selector in ml_selectors:
-                try:
-                    await self.page.wait_for_selector(selector, timeout=5000)
-                    logger.info(f"ML element loaded: {selector}")
-                    break
-                except Exception:
-                    continue
+            # Espera adaptativa: segue assim que os dados do parser estiverem presentes
+            self.last_readiness = await self.wait_until_ready(page_type)
             
             # Scroll page to trigger lazy loading
             if scroll_page:
                 await self.simulate_human_scrolling()
             
-            # Final wait for any dynamic content
-            await asyncio.sleep(random.uniform(1, 2))
+            # Final wait for any dynamic content (só com stealth budget)
+            await self.human_pause(1, 2)
             
             # Get page content with null check
             if self.page:
                 content = await self.page.content()
+                self.last_resource_report = self._build_resource_report(page_type, time.time() - fetch_start)
                 logger.info(f"Page content retrieved: {len(content)} characters")
+                logger.info(f"Resource report: {self.last_resource_report}")
                 return content, response.status
             else:
                 raise Exception("Page became None during execution")
@@ -390,7 +661,7 @@ class PlaywrightScraper:
                 for position in scroll_positions:
                     if position > 0 and position < page_height:
                         await self.page.evaluate(f'window.scrollTo({{top: {position}, behavior: "smooth"}})')
-                        await asyncio.sleep(random.uniform(0.5, 1.0))
+                        await self.human_pause(0.5, 1.0)
             else:
                 # Desenvolvimento: scroll mais humano
                 current_position = 0
@@ -408,15 +679,15 @@ class PlaywrightScraper:
                     current_position += scroll_amount
                     
                     await self.page.evaluate(f'window.scrollTo({{top: {current_position}, behavior: "smooth"}})')
-                    await asyncio.sleep(random.uniform(0.8, 2.0))
+                    await self.human_pause(0.8, 2.0)
                     
                     # Pausa ocasional como humano
                     if random.random() < 0.3:
-                        await asyncio.sleep(random.uniform(1.0, 3.0))
+                        await self.human_pause(1.0, 3.0)
             
             # Scroll de volta ao topo
             await self.page.evaluate('window.scrollTo({top: 0, behavior: "smooth"})')
-            await asyncio.sleep(0.5)
+            await self.human_pause(0.5, 0.5)
             
             logger.info("Human-like scrolling completed")
             
@@ -424,50 +695,59 @@ class PlaywrightScraper:
             logger.warning(f"Error during scrolling: {e}")
     
     async def accept_cookies_and_interact(self):
-        """Accept cookies and perform human-like interactions"""
+        """Accept cookies and perform human-like interactions.
+
+        Todos os botões de consentimento são procurados de uma vez, com um
+        timeout curto compartilhado. Depois de aceito, o contexto não é mais
+        verificado; origem sem banner não é mais verificada em nenhum contexto do
+        mesmo navegador (o timeout da verificação só é gasto quando não há banner).
+        """
         try:
-            # Lista de seletores comuns para aceitar cookies
-            cookie_selectors = [
-                'button[data-testid="action:understood"]',  # ML específico
-                'button:has-text("Aceitar")',
-                'button:has-text("Entendi")',
-                'button:has-text("OK")',
-                'button:has-text("Concordo")',
-                '[data-testid="cookie-consent-accept"]',
-                '.cookie-accept',
-                '#cookie-accept',
-                'button[aria-label*="aceitar"]',
-                'button[aria-label*="Aceitar"]'
-            ]
-            
-            # Tentar encontrar e clicar no botão de aceitar cookies
-            for selector in cookie_selectors:
+            owner = None
+            origin = None
+            if self.context is not None:
+                owner = self.context.browser or self.context
+                parsed = urlparse(self.page.url)
+                origin = f"{parsed.scheme}://{parsed.netloc}"
+            
+            if self.context is not None and self.context in _consent_accepted:
+                logger.info("Cookie consent already accepted in this context, skipping probe")
+            elif owner is not None and origin in _consent_absent.get(owner, ()):
+                logger.info(f"No cookie banner on {origin} for this browser, skipping probe")
+            else:
                 try:
-                    element = await self.page.wait_for_selector(selector, timeout=3000)
-                    if element:
-                        # Movimento de mouse humano antes do clique
-                        box = await element.bounding_box()
-                        if box:
-                            await self.page.mouse.move(
-                                box['x'] + box['width'] / 2,
-                                box['y'] + box['height'] / 2
-                            )
-                            await asyncio.sleep(random.uniform(0.2, 0.5))
-                            
-                        await element.click()
-                        logger.info(f"Clicked cookie consent button: {selector}")
-                        await asyncio.sleep(random.uniform(1, 2))
-                        break
+                    element = await self.page.wait_for_selector(
+                        COOKIE_CONSENT_SELECTOR, timeout=COOKIE_PROBE_TIMEOUT_MS
+                    )
                 except Exception:
-                    continue
-            
-            # Simular movimento de mouse aleatório
-            for _ in range(random.randint(2, 4)):
-                await self.page.mouse.move(
-                    random.randint(100, 1200),
-                    random.randint(100, 600)
-                )
-                await asyncio.sleep(random.uniform(0.1, 0.3))
+                    element = None
+                
+                if element:
+                    # Movimento de mouse humano antes do clique
+                    box = await element.bounding_box()
+                    if box:
+                        await self.page.mouse.move(
+                            box['x'] + box['width'] / 2,
+                            box['y'] + box['height'] / 2
+                        )
+                        await self.human_pause(0.2, 0.5)
+                        
+                    await element.click()
+                    logger.info("Clicked cookie consent button")
+                    await self.human_pause(1, 2)
+                    if self.context is not None:
+                        _consent_accepted.add(self.context)
+                elif owner is not None:
+                    _consent_absent.setdefault(owner, set()).add(origin)
+            
+            # Simular movimento de mouse aleatório (só com stealth budget)
+            if self._stealth_remaining > 0:
+                for _ in range(random.randint(2, 4)):
+                    await self.page.mouse.move(
+                        random.randint(100, 1200),
+                        random.randint(100, 600)
+                    )
+                    await self.human_pause(0.1, 0.3)
                 
         except Exception as e:
             logger.warning(f"Error during cookie acceptance: {e}")
@@ -477,6 +757,9 @@ class PlaywrightScraper:
         try:
             logger.info(f"Taking screenshot of: {url}")
             
+            if RESOURCE_BLOCKING:
+                await self.apply_resource_profile('screenshot')
+            
             # Navigate to page
             response = await self.page.goto(
                 url, 
@@ -507,87 +790,36 @@ class PlaywrightScraper:
             raise
 
     def take_screenshot(self, url, full_page=True):
-        """Synchronous wrapper for taking screenshots"""
+        """Synchronous wrapper for taking screenshots (uses the shared browser pool)"""
         try:
-            # Check if we're already in an event loop
-            try:
-                loop = asyncio.get_running_loop()
-                # If we're in a running loop, create a task instead
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self._take_screenshot_with_context(url, full_page))
-                    return future.result(timeout=60)
-            except RuntimeError:
-                # No running loop, safe to use asyncio.run
-                return asyncio.run(self._take_screenshot_with_context(url, full_page))
+            from browser_pool import run_in_pool
+            return run_in_pool(lambda pool: pool.take_screenshot(url, full_page), timeout=60)
         except Exception as e:
             logger.error(f"Error in sync screenshot wrapper: {e}")
             raise
-    
-    async def _take_screenshot_with_context(self, url, full_page=True):
-        """Helper method to take screenshot with proper context management"""
-        async with PlaywrightScraper() as scraper:
-            return await scraper.take_screenshot_async(url, full_page)
 
     def fetch_page(self, url, wait_for_selector=None, scroll_page=True):
-        """Synchronous wrapper for fetching page content"""
+        """Synchronous wrapper for fetching page content (uses the shared browser pool)"""
         try:
-            # Check if we're already in an event loop
-            try:
-                loop = asyncio.get_running_loop()
-                # If we're in a running loop, create a task instead
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self._fetch_page_with_context(url, wait_for_selector, scroll_page))
-                    content, status = future.result(timeout=60)
-                    return content
-            except RuntimeError:
-                # No running loop, safe to use asyncio.run
-                content, status = asyncio.run(self._fetch_page_with_context(url, wait_for_selector, scroll_page))
-                return content
+            from browser_pool import run_in_pool
+            content, status, self.last_fetch_info = run_in_pool(
+                lambda pool: pool.fetch_page_with_info(url, wait_for_selector, scroll_page)
+            )
+            logger.info(f"Page content processing completed: {len(content)} characters")
+            return content
         except Exception as e:
             logger.error(f"Error in sync fetch wrapper: {e}")
             raise
     
-    async def _fetch_page_with_context(self, url, wait_for_selector=None, scroll_page=True):
-        """Helper method to fetch page with proper context management"""
-        async with PlaywrightScraper() as scraper:
-            content, status = await scraper.fetch_page_content(url, wait_for_selector, scroll_page)
-            
-            # Get page content with timeout to prevent hanging
-            import asyncio
-            try:
-                # Add timeout to prevent the method from hanging
-                await asyncio.wait_for(asyncio.sleep(0.1), timeout=1)
-                logger.info(f"Page content processing completed: {len(content)} characters")
-                return content, status
-            except asyncio.TimeoutError:
-                logger.error("Timeout during page content processing")
-                return content, status
-    
     def close(self):
-        """Synchronous wrapper for closing browser"""
+        """Synchronous wrapper for closing browser (runs on the worker's async runtime)"""
+        # Instâncias emprestadas do pool não são donas de nada: o pool fecha o contexto
+        if not (self.page or self.context or self.browser or self.playwright) or self.lease_info is not None:
+            return
         try:
-            # Check if we're already in an event loop
-            try:
-                loop = asyncio.get_running_loop()
-                # If we're in a running loop, create a task instead
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, self._close_async())
-                    future.result(timeout=15)  # Increased timeout
-            except RuntimeError:
-                # No running loop, safe to use asyncio.run
-                asyncio.run(self._close_async())
+            run_sync(self._close_async(), timeout=15)
         except Exception as e:
             logger.error(f"Error in sync close wrapper: {e}")
-            # Force cleanup if normal close fails
-            try:
-                if hasattr(self, 'browser') and self.browser:
-                    # Force close without waiting
-                    pass
-            except:
-                pass
     
     async def _close_async(self):
         """Async method to close browser and cleanup resources"""
@@ -677,19 +909,10 @@ async def fetch_with_playwright(url, wait_for_selector=None, scroll_page=True):
         return await scraper.fetch_page_content(url, wait_for_selector, scroll_page)
 
 def fetch_page_sync(url, wait_for_selector=None, scroll_page=True):
-    """Synchronous wrapper for Playwright scraping"""
+    """Synchronous wrapper for Playwright scraping (uses the shared browser pool)"""
     try:
-        # Check if we're already in an event loop
-        try:
-            loop = asyncio.get_running_loop()
-            # If we're in a running loop, create a task instead
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, fetch_with_playwright(url, wait_for_selector, scroll_page))
-                return future.result(timeout=60)
-        except RuntimeError:
-            # No running loop, safe to use asyncio.run
-            return asyncio.run(fetch_with_playwright(url, wait_for_selector, scroll_page))
+        from browser_pool import run_in_pool
+        return run_in_pool(lambda pool: pool.fetch_page_content(url, wait_for_selector, scroll_page))
     except Exception as e:
         logger.error(f"Error in sync wrapper: {e}")
         raise
@@ -0,0 +1,149 @@
+# product_cache.py
+# Cache de detalhes de produto por MLB ID na frente do scrape de PDP: TTLs separados
+# para preço e estoque, stale-while-revalidate (serve o valor antigo enquanto uma
+# atualização roda em background) e `max_age` por requisição.
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+PRODUCT_CACHE_ENABLED = os.getenv('PRODUCT_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+PRICE_TTL = float(os.getenv('PRODUCT_CACHE_PRICE_TTL', '600'))    # segundos até o preço ser considerado velho
+STOCK_TTL = float(os.getenv('PRODUCT_CACHE_STOCK_TTL', '180'))    # idem para o estoque
+STALE_TTL = float(os.getenv('PRODUCT_CACHE_STALE_TTL', '3600'))   # janela extra servindo stale com refresh em background
+MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_SIZE', '2000'))
+
+class ProductCache:
+    """LRU por MLB ID. `lookup()` classifica a entrada em fresh / stale / miss"""
+
+    def __init__(self, price_ttl=PRICE_TTL, stock_ttl=STOCK_TTL, stale_ttl=STALE_TTL, max_entries=MAX_ENTRIES):
+        self.price_ttl = price_ttl
+        self.stock_ttl = stock_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # mlb_id -> (payload, stored_at)
+        self._refreshing = {}           # mlb_id -> task do refresh em background
+        self._lock = threading.Lock()
+        self.stats = {'fresh': 0, 'stale': 0, 'miss': 0, 'stores': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def ttl_for(self, payload):
+        """Validade da entrada: o menor TTL entre os campos voláteis presentes (estoque só conta se foi extraído)
+
+        `stock` é sempre um inteiro (0 quando a página não mostra estoque), então o que
+        decide é `stock_extracted`, marcado por extract_product_details.
+        """
+        product = payload.get('product') or {}
+        ttls = [self.price_ttl]
+        if product.get('stock_extracted'):
+            ttls.append(self.stock_ttl)
+        return min(ttls)
+
+    def lookup(self, mlb_id, max_age=None):
+        """Retorna (payload, idade, estado) com estado 'fresh', 'stale' ou 'miss'.
+
+        Com `max_age` o chamador define a idade aceitável: até ela a entrada é servida
+        como fresh, acima dela é miss (sem servir stale).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(mlb_id)
+            if entry is None:
+                self.stats['miss'] += 1
+                return None, None, 'miss'
+            payload, stored_at = entry
+            age = now - stored_at
+            ttl = self.ttl_for(payload)
+            if max_age is not None:
+                state = 'fresh' if age <= max_age else 'miss'
+            elif age <= ttl:
+                state = 'fresh'
+            elif age <= ttl + self.stale_ttl:
+                state = 'stale'
+            else:
+                state = 'miss'
+                del self._entries[mlb_id]
+            if state != 'miss':
+                self._entries.move_to_end(mlb_id)
+            self.stats[state] += 1
+            return (payload, age, state) if state != 'miss' else (None, age, state)
+
+    def store(self, mlb_id, payload):
+        with self._lock:
+            self._entries[mlb_id] = (payload, time.time())
+            self._entries.move_to_end(mlb_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats['stores'] += 1
+
+    def refresh_in_background(self, mlb_id, fetch):
+        """Agenda `fetch()` (coroutine que retorna (payload, status)) no loop atual, um por MLB ID"""
+        with self._lock:
+            if mlb_id in self._refreshing:
+                return False
+            self.stats['refreshes'] += 1
+            self._refreshing[mlb_id] = None
+
+        async def refresh():
+            try:
+                payload, status = await fetch()
+                if status == 200:
+                    self.store(mlb_id, payload)
+                else:
+                    with self._lock:
+                        self.stats['refresh_errors'] += 1
+            except Exception as e:
+                logger.warning(f"Erro no refresh em background de {mlb_id}: {e}")
+                with self._lock:
+                    self.stats['refresh_errors'] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.pop(mlb_id, None)
+
+        # Mantém referência à task (o loop só guarda referências fracas)
+        task = asyncio.get_running_loop().create_task(refresh())
+        with self._lock:
+            if mlb_id in self._refreshing:
+                self._refreshing[mlb_id] = task
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+            refreshing = len(self._refreshing)
+        lookups = stats['fresh'] + stats['stale'] + stats['miss']
+        return {
+            **stats,
+            'hit_rate': round((stats['fresh'] + stats['stale']) / lookups, 3) if lookups else None,
+            'entries': entries,
+            'refreshing': refreshing,
+            'ttl': {'price': self.price_ttl, 'stock': self.stock_ttl, 'stale': self.stale_ttl},
+        }
+
+# Um cache por processo (cada worker gunicorn tem o seu)
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_product_cache():
+    global _cache, _cache_pid
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = ProductCache()
+            _cache_pid = os.getpid()
+        return _cache
+
+def product_cache_snapshot():
+    """Métricas do cache para o /health (None se ainda não foi usado neste processo)"""
+    if not PRODUCT_CACHE_ENABLED:
+        return {'enabled': False}
+    if _cache is None or _cache_pid != os.getpid():
+        return None
+    return _cache.snapshot()
@@ -4,6 +4,7 @@
 import re
 import json
 from typing import Dict, Optional
+from metrics import timed_parser
 
 def extract_mlb_id(url: str) -> str:
     """Extrai o ID MLB da URL do produto"""
@@ -142,6 +143,197 @@ def extract_stock(html: str) -> int:
     
     return stock
 
+# --- Motor compilado --------------------------------------------------------
+#
+# Mesmos padrões das funções extract_* acima, compilados uma vez e despachados a
+# partir de uma tabela. Cada padrão tem uma âncora literal (o trecho mais seletivo
+# dele): o HTML é percorrido só pelas ocorrências da âncora (busca literal em C) e o
+# padrão completo é testado com .match no início da tag, em vez de ser tentado em
+# cada <span/<a/<p do documento. Padrões de menor prioridade só são avaliados se os
+# anteriores do mesmo campo falharem, como nas funções originais.
+#
+# Equivalência: o primeiro match de cada padrão é o mesmo do re.search original,
+# supondo que não haja '<' dentro dos atributos da tag (o início da tag é o último
+# '<' antes da âncora). bench_product_scraper.py compara os dois campo a campo.
+
+# (grupo, âncora, padrão, flags, ancorado_na_tag)
+# ancorado_na_tag=True: o padrão começa no '<' da tag que contém a âncora
+# ancorado_na_tag=False: o padrão começa na própria âncora
+FIELD_PATTERNS = [
+    ('title', 'ui-pdp-title', r'<h1[^>]*class="[^"]*ui-pdp-title[^"]*"[^>]*>([^<]+)</h1>', re.IGNORECASE, True),
+    ('title', 'og:title', r'<meta[^>]*property="og:title"[^>]*content="([^"]+)"', re.IGNORECASE, True),
+    ('title', '<title>', r'<title>([^<]+)</title>', re.IGNORECASE, False),
+    ('price_promo', 'ui-pdp-price__part', r'<span[^>]*class="[^"]*andes-money-amount[^"]*ui-pdp-price__part[^"]*"[^>]*>[\s\S]*?<span[^>]*class="[^"]*andes-money-amount__fraction[^"]*"[^>]*>([\d.,]+)</span>[\s\S]*?<span[^>]*class="[^"]*andes-money-amount__cents[^"]*"[^>]*>([\d.,]+)</span>', 0, True),
+    ('price_original', 'original-price', r'<span[^>]*class="[^"]*andes-money-amount__fraction[^"]*"[^>]*data-testid="original-price"[^>]*>([\d.,]+)</span>', 0, True),
+    ('price_fallback', '<span data-testid="price-part"', r'<span data-testid="price-part"[\s\S]*?<span[^>]*class="[^"]*andes-money-amount__fraction[^"]*"[^>]*>([\d.]+)</span>[\s\S]*?<span[^>]*class="[^"]*andes-money-amount__cents[^"]*"[^>]*>([\d]+)</span>', 0, False),
+    ('price_fallback', '"price":', r'"price":(\d+(?:\.\d+)?)', 0, False),
+    ('price_fallback', 'price-tag-fraction', r'<span[^>]*class="[^"]*price-tag-fraction[^"]*"[^>]*>([\d.,]+)</span>', 0, True),
+    ('image', 'data-zoom="', r'<img[^>]*data-zoom="([^"]+)"', re.IGNORECASE, True),
+    ('image', 'og:image', r'<meta[^>]*property="og:image"[^>]*content="([^"]+)"', re.IGNORECASE, True),
+    ('image', 'ui-pdp-image', r'<img[^>]*class="[^"]*ui-pdp-image[^"]*"[^>]*src="([^"]+)"', re.IGNORECASE, True),
+    ('seller', '"seller_name":"', r'"seller_name":"([^"]+)"', re.IGNORECASE, False),
+    ('seller', 'store-header__title', r'<h3[^>]*class="[^"]*store-header__title[^"]*"[^>]*>([^<]+)</h3>', re.IGNORECASE, True),
+    ('seller', 'store-info__name', r'<a[^>]*class="[^"]*store-info__name[^"]*"[^>]*>([^<]+)</a>', re.IGNORECASE, True),
+    ('seller', '"seller":', r'"seller":\s*{\s*"@type":\s*"Organization",\s*"name":\s*"([^"]+)"', re.IGNORECASE, False),
+    ('seller', '/loja/', r'<a[^>]*href="[^"]*\/loja\/([^"\/]+)"', re.IGNORECASE, True),
+    ('seller', 'store-info__name', r'<span[^>]*class="[^"]*store-info__name[^"]*"[^>]*>([^<]+)</span>', re.IGNORECASE, True),
+    ('seller', 'seller:', r'seller:\s*{\s*id:\s*\d+,\s*name:\s*"([^"]+)"', re.IGNORECASE, False),
+    ('seller', 'official-store-info__title', r'<p[^>]*class="[^"]*official-store-info__title[^"]*"[^>]*>([^<]+)</p>', re.IGNORECASE, True),
+    ('stock', 'ui-pdp-buybox__quantity__available', r'<span[^>]*class="[^"]*ui-pdp-buybox__quantity__available[^"]*"[^>]*>\(\+(\d+) disponíveis\)</span>', 0, True),
+    ('stock', '"available_quantity":', r'"available_quantity":(\d+)', 0, False),
+]
+
+# Literais que um padrão com [\s\S]*? precisa encontrar depois do início. Sem eles
+# (ex.: preço inteiro, sem span de centavos) o match não existe e o .match com os
+# spans preguiçosos varreria o resto do documento para cada candidato.
+REQUIRED_LITERALS = {
+    'price_promo': ('andes-money-amount__fraction', 'andes-money-amount__cents'),
+    'price_fallback': ('andes-money-amount__fraction', 'andes-money-amount__cents'),
+}
+
+# Grupos cujo primeiro match só vale com texto não vazio (mesmo `.strip()` das funções originais)
+STRIPPED_GROUPS = {'title', 'seller'}
+
+FIELD_GROUPS = {
+    'title': ('title',),
+    'price': ('price_promo', 'price_original', 'price_fallback'),
+    'image_url': ('image',),
+    'seller_name': ('seller',),
+    'stock': ('stock',),
+}
+
+def anchor_finder(anchor, flags):
+    """Busca compilada da âncora; retorna (regex, deslocamento do trecho buscado dentro da âncora).
+
+    Literal sem distinção de caixa que começa com letra não tem busca rápida no `re`;
+    nesse caso busca-se a partir do primeiro caractere que não é letra (ex.: '-pdp-title').
+    """
+    offset = 0
+    if flags & re.IGNORECASE and anchor[:1].isalpha():
+        offset = next((i for i, char in enumerate(anchor) if not char.isalpha()), len(anchor))
+        if len(anchor) - offset < 4:
+            offset = 0
+    return re.compile(re.escape(anchor[offset:]), flags & re.IGNORECASE), offset
+
+class CompiledExtractor:
+    """Extrator gerado a partir de FIELD_PATTERNS, com os padrões avaliados sob demanda por prioridade"""
+
+    def __init__(self, table=FIELD_PATTERNS):
+        self.patterns = []
+        self.groups = {}
+        for index, (group, anchor, pattern, flags, tag_anchored) in enumerate(table):
+            finder, offset = anchor_finder(anchor, flags)
+            required = REQUIRED_LITERALS.get(group, ()) if r'[\s\S]*?' in pattern else ()
+            self.patterns.append((re.compile(pattern, flags), finder, offset, tag_anchored, required))
+            self.groups.setdefault(group, []).append(index)
+
+    def first_match(self, html: str, index: int) -> Optional[re.Match]:
+        """Equivalente a re.search(padrão, html), testando o padrão só nas ocorrências da âncora"""
+        pattern, finder, offset, tag_anchored, required = self.patterns[index]
+        position = 0
+        last_start = -1
+        while True:
+            hit = finder.search(html, position)
+            if hit is None:
+                return None
+            start = html.rfind('<', 0, hit.start()) if tag_anchored else hit.start() - offset
+            # Literal obrigatório ausente depois deste início também falta depois dos seguintes
+            if required and last_start < 0 <= start and any(html.find(literal, start) == -1 for literal in required):
+                return None
+            # Várias ocorrências dentro da mesma tag levam ao mesmo início
+            if start > last_start:
+                match = pattern.match(html, start)
+                if match:
+                    return match
+                last_start = start
+            position = hit.start() + 1
+
+    def pick(self, html: str, group: str) -> Optional[re.Match]:
+        """Primeiro match qualificado do grupo, na ordem de prioridade (como os loops das extract_*)"""
+        for index in self.groups[group]:
+            match = self.first_match(html, index)
+            if match and (match.group(1).strip() if group in STRIPPED_GROUPS else match.group(1)):
+                return match
+        return None
+
+    def extract(self, html: str, fields=None) -> Dict:
+        """Campos com os mesmos valores das funções extract_* (preço vem como 'price' e 'promo_price').
+
+        `seller_name` é None quando nenhum padrão casa (o fallback pela URL fica com o chamador).
+        """
+        fields = fields or FIELD_GROUPS
+        result = {}
+
+        if 'title' in fields:
+            match = self.pick(html, 'title')
+            result['title'] = match.group(1).strip() if match else 'Produto sem título'
+
+        if 'price' in fields:
+            result.update(self.price(html))
+
+        if 'image_url' in fields:
+            match = self.pick(html, 'image')
+            result['image_url'] = match.group(1) if match else ''
+
+        if 'seller_name' in fields:
+            match = self.pick(html, 'seller')
+            result['seller_name'] = match.group(1).strip() if match else None
+
+        if 'stock' in fields:
+            match = self.pick(html, 'stock')
+            result['stock'] = int(match.group(1)) if match else 0
+
+        return result
+
+    def price(self, html: str) -> Dict[str, float]:
+        """Mesma regra de extract_price: promoção, preço original e fallbacks"""
+        price = 0.0
+        promo_price = 0.0
+        promo_match = self.first_match(html, self.groups['price_promo'][0])
+        original_match = self.first_match(html, self.groups['price_original'][0])
+
+        if original_match and original_match.group(1):
+            promo_price = float(original_match.group(1).replace('.', '').replace(',', '.'))
+
+        if promo_match and promo_match.group(1) and promo_match.group(2):
+            whole_part = float(promo_match.group(1).replace('.', '').replace(',', '.'))
+            cents_part = float(promo_match.group(2))
+            price = whole_part + (cents_part / 100)
+            if promo_price > 0 and abs(promo_price - price) < 0.01:
+                promo_price = 0.0
+        else:
+            for index in self.groups['price_fallback']:
+                match = self.first_match(html, index)
+                if match:
+                    if len(match.groups()) == 2:
+                        whole_part = float(match.group(1).replace('.', '').replace(',', '.'))
+                        cents_part = float(match.group(2))
+                        price = whole_part + (cents_part / 100)
+                    else:
+                        price = float(match.group(1).replace('.', '').replace(',', '.'))
+                    break
+
+        return {
+            'price': price,
+            'promo_price': promo_price if promo_price != price else 0.0
+        }
+
+compiled_extractor = CompiledExtractor()
+
+def seller_from_url(url: str) -> str:
+    """Fallback de extract_seller_name: nome da loja a partir da URL"""
+    url_match = re.search(r'mercadolivre\.com\.br\/loja\/([^\/\?]+)', url)
+    if url_match and url_match.group(1):
+        seller_name = url_match.group(1).replace('-', ' ')
+        return ' '.join(word.capitalize() for word in seller_name.split())
+    return 'Vendedor ML'
+
+@timed_parser('stock')
+def extract_stock_fast(html: str) -> int:
+    """extract_stock pelo motor compilado (sem logs), usado no enriquecimento de estoque"""
+    return compiled_extractor.extract(html, ('stock',))['stock']
+
+@timed_parser('product_details')
 def extract_product_details(html: str, url: str) -> Dict:
     """Extrai todos os detalhes do produto"""
     print(f"[PRODUCT_SCRAPER] Iniciando extração de detalhes para URL: {url}")
@@ -165,20 +357,25 @@ def extract_product_details(html: str, url: str) -> Dict:
         mlb_id = extract_mlb_id(url)
         print(f"[PRODUCT_SCRAPER] MLB ID extracted: {mlb_id}")
         
-        title = extract_title(html)
+        # Motor compilado: padrões testados só nas ocorrências das âncoras
+        fields = compiled_extractor.extract(html)
+        
+        title = fields['title']
         print(f"[PRODUCT_SCRAPER] Title extracted: '{title}'")
         
-        price_data = extract_price(html)
+        price_data = {'price': fields['price'], 'promo_price': fields['promo_price']}
         print(f"[PRODUCT_SCRAPER] Price data extracted: {price_data}")
         
-        image_url = extract_image_url(html)
+        image_url = fields['image_url']
         print(f"[PRODUCT_SCRAPER] Image URL extracted: {image_url[:100] if image_url else 'None'}...")
         
-        seller_name = extract_seller_name(html, url)
+        seller_name = fields['seller_name'] or seller_from_url(url)
         print(f"[PRODUCT_SCRAPER] Seller name extracted: '{seller_name}'")
         
-        stock = extract_stock(html)
-        print(f"[PRODUCT_SCRAPER] Stock extracted: {stock}")
+        stock = fields['stock']
+        # 0 também é o padrão quando nenhum padrão casa; o cache usa o TTL de estoque só se ele veio da página
+        stock_extracted = stock > 0 or compiled_extractor.pick(html, 'stock') is not None
+        print(f"[PRODUCT_SCRAPER] Stock extracted: {stock} (encontrado na página: {stock_extracted})")
         
         result = {
             'mlb_id': mlb_id,
@@ -188,6 +385,7 @@ def extract_product_details(html: str, url: str) -> Dict:
             'image_url': image_url,
             'seller_name': seller_name,
             'stock': stock,
+            'stock_extracted': stock_extracted,
             'url': url
         }
         
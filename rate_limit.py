@@ -0,0 +1,141 @@
+# rate_limit.py
+# Limite de taxa por host (token bucket com burst) compartilhado por todas as
+# threads do worker, com pausa global por host quando o servidor pede Retry-After
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from requests.exceptions import RequestException
+
+# Configuração via variáveis de ambiente
+RATE_PER_HOST = float(os.getenv('HTTP_RATE_LIMIT', '4'))       # requisições/s sustentadas por host
+BURST_PER_HOST = float(os.getenv('HTTP_RATE_BURST', '8'))      # rajada permitida com o bucket cheio
+MAX_WAIT = float(os.getenv('HTTP_RATE_MAX_WAIT', '30'))        # espera máxima antes de desistir
+BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '1'))      # backoff sem Retry-After: base * 2^tentativa
+BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '60'))
+
+class RateLimitExceeded(RequestException):
+    """A espera pelo host passaria de MAX_WAIT (ex.: Retry-After longo)"""
+
+class TokenBucket:
+    """Token bucket de um host. `reserve()` reserva um token e diz quanto esperar por ele."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()   # relógio de reposição; fica no futuro durante uma pausa
+        self.waits = 0
+        self.waited = 0.0
+        self.penalties = 0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now):
+        self._refill(now)
+        self.tokens -= 1
+        return max(0.0, self.updated - now) + max(0.0, -self.tokens) / self.rate
+
+    def cancel(self):
+        self.tokens += 1
+
+    def penalize(self, now, delay):
+        """Pausa o host por `delay` segundos e recomeça sem rajada acumulada"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1.0)
+        self.updated = max(self.updated, now + delay)
+        self.penalties += 1
+
+class HostRateLimiter:
+    """Um bucket por host, protegido por um lock; as esperas acontecem fora do lock"""
+
+    def __init__(self, rate=RATE_PER_HOST, burst=BURST_PER_HOST, max_wait=MAX_WAIT):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def acquire(self, host):
+        """Bloqueia até haver um token para `host`; retorna os segundos esperados"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._bucket(host)
+            wait = bucket.reserve(time.monotonic())
+            if wait > self.max_wait:
+                bucket.cancel()
+                raise RateLimitExceeded(f"Host {host} limitado por mais {wait:.1f}s (máximo {self.max_wait}s)")
+            if wait > 0:
+                bucket.waits += 1
+                bucket.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, host, delay):
+        """Aplica a todas as threads uma pausa no host (Retry-After ou backoff)"""
+        with self._lock:
+            self._bucket(host).penalize(time.monotonic(), min(delay, BACKOFF_MAX))
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'hosts': {
+                    host: {
+                        'tokens': round(min(bucket.burst, bucket.tokens + max(0.0, now - bucket.updated) * bucket.rate), 2),
+                        'paused_for': round(max(0.0, bucket.updated - now), 2),
+                        'waits': bucket.waits,
+                        'waited': round(bucket.waited, 3),
+                        'penalties': bucket.penalties,
+                    }
+                    for host, bucket in self._buckets.items()
+                }
+            }
+
+def retry_after_seconds(response):
+    """Segundos pedidos pelo header Retry-After (número ou data HTTP), ou None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    """Backoff exponencial com jitter para quando o servidor não manda Retry-After"""
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+# Um limitador por processo (gunicorn --preload importa o módulo no master antes do fork)
+_limiter = None
+_limiter_pid = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    global _limiter, _limiter_pid
+
+    with _limiter_lock:
+        if _limiter is None or _limiter_pid != os.getpid():
+            _limiter = HostRateLimiter()
+            _limiter_pid = os.getpid()
+        return _limiter
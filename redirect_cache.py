@@ -0,0 +1,167 @@
+# redirect_cache.py
+# Cache de resolução de URLs de tracking (click1/mclics): URL de tracking -> URL final
+# do produto + MLB ID. LRU em memória na frente de uma tabela SQLite compartilhada
+# pelos workers gunicorn, as duas com TTL. Resolução em cache não toca a rede.
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+REDIRECT_CACHE_ENABLED = os.getenv('REDIRECT_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+DB_PATH = os.getenv('REDIRECT_CACHE_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_scraper_redirects.sqlite3'))
+TTL = float(os.getenv('REDIRECT_CACHE_TTL', '86400'))              # segundos de validade de cada resolução
+MEMORY_SIZE = int(os.getenv('REDIRECT_CACHE_SIZE', '5000'))        # entradas no LRU em memória por processo
+MAX_ROWS = int(os.getenv('REDIRECT_CACHE_MAX_ROWS', '200000'))     # linhas mantidas no SQLite
+PRUNE_EVERY = 500                                                  # gravações entre limpezas do SQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS redirects (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    mlb_id TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS redirects_expires ON redirects (expires_at);
+"""
+
+class RedirectCache:
+    """LRU+TTL em memória com fallback para o SQLite compartilhado; falhas do SQLite só desligam a camada compartilhada"""
+
+    def __init__(self, path=DB_PATH, ttl=TTL, memory_size=MEMORY_SIZE, max_rows=MAX_ROWS):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self._memory = OrderedDict()   # url -> (final_url, mlb_id, expires_at)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'shared_errors': 0}
+        self.shared = path is not None
+        if self.shared:
+            try:
+                with closing(self._connect()) as conn:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.executescript(SCHEMA)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache de redirects sem SQLite ({path}): {e}")
+                self.shared = False
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def _remember(self, url, final_url, mlb_id, expires_at):
+        with self._lock:
+            self._memory[url] = (final_url, mlb_id, expires_at)
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, url):
+        """Retorna (final_url, mlb_id) ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(url)
+                    self.stats['memory_hits'] += 1
+                    return entry[0], entry[1]
+                del self._memory[url]
+
+        if self.shared:
+            try:
+                with closing(self._connect()) as conn:
+                    row = conn.execute(
+                        "SELECT final_url, mlb_id, expires_at FROM redirects WHERE url = ? AND expires_at > ?",
+                        (url, now)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Erro lendo cache de redirects: {e}")
+                self._count('shared_errors')
+                row = None
+            if row:
+                self._remember(url, *row)
+                self._count('shared_hits')
+                return row[0], row[1]
+
+        self._count('misses')
+        return None
+
+    def put(self, url, final_url, mlb_id):
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember(url, final_url, mlb_id, expires_at)
+        self._count('stores')
+        if not self.shared:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO redirects (url, final_url, mlb_id, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, final_url, mlb_id, now, expires_at)
+                )
+                with self._lock:
+                    self._writes += 1
+                    prune = self._writes % PRUNE_EVERY == 0
+                if prune:
+                    self._prune(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Erro gravando cache de redirects: {e}")
+            self._count('shared_errors')
+
+    def _prune(self, conn, now):
+        """Remove expirados e, acima de max_rows, as entradas mais antigas"""
+        conn.execute("DELETE FROM redirects WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM redirects WHERE url IN (SELECT url FROM redirects ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            memory_entries = len(self._memory)
+        lookups = stats['memory_hits'] + stats['shared_hits'] + stats['misses']
+        hits = stats['memory_hits'] + stats['shared_hits']
+        return {
+            **stats,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'memory_entries': memory_entries,
+            'ttl': self.ttl,
+            'db_path': self.path if self.shared else None,
+        }
+
+# Um cache por processo (o LRU em memória não deve atravessar o fork do gunicorn --preload)
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_redirect_cache():
+    global _cache, _cache_pid
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = RedirectCache()
+            _cache_pid = os.getpid()
+        return _cache
+
+def redirect_cache_snapshot():
+    """Métricas do cache para o /health (None se ainda não foi usado neste processo)"""
+    if not REDIRECT_CACHE_ENABLED:
+        return {'enabled': False}
+    if _cache is None or _cache_pid != os.getpid():
+        return None
+    return _cache.snapshot()
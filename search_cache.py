@@ -0,0 +1,158 @@
+# search_cache.py
+# Cache de resultados de busca com single-flight: buscas idênticas em andamento
+# compartilham o mesmo fetch+parse e o resultado fica num LRU com TTL e limite de
+# memória. Contadores de hit/miss/coalesced por endpoint.
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Configuração via variáveis de ambiente
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+TTL = float(os.getenv('SEARCH_CACHE_TTL', '300'))                      # segundos de validade de uma busca
+MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_SIZE', '500'))
+MAX_BYTES = int(float(os.getenv('SEARCH_CACHE_MAX_MB', '64')) * 1024 * 1024)  # teto de memória (tamanho do JSON)
+
+def search_cache_key(search_url, limit, include_stock, debug=False):
+    """Chave da busca: a URL da listagem (termo + página) com o limite, se inclui estoque e se tem debug"""
+    return (search_url.strip().lower(), int(limit), bool(include_stock), bool(debug))
+
+def estimate_size(result):
+    """Tamanho aproximado do resultado em memória (bytes do JSON)"""
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+class SearchCache:
+    """LRU + TTL + teto de bytes, com as buscas em andamento indexadas pela mesma chave.
+
+    O fetch compartilhado roda numa task própria: se um dos clientes desiste (stream
+    fechado) os outros continuam esperando; ela só é cancelada quando não sobra ninguém.
+    """
+
+    def __init__(self, ttl=TTL, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (result, stored_at, size)
+        self._bytes = 0
+        self._inflight = {}             # key -> [task, waiters]; só acessado no event loop
+        self._lock = threading.Lock()
+        self._stats = defaultdict(Counter)
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self._stats[endpoint][outcome] += 1
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _drop(self, key):
+        _result, _stored_at, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key, result):
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (result, time.time(), size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    async def _run(self, key, fetch):
+        try:
+            result = await fetch()
+            if result.get('success'):
+                self._store(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_fetch(self, endpoint, key, fetch):
+        """Resultado em cache, o de uma busca idêntica em andamento, ou um fetch novo.
+
+        `fetch` é uma função sem argumentos que retorna a coroutine da busca. Só
+        resultados com `success` entram no cache; falhas são compartilhadas apenas
+        com quem estava esperando o mesmo fetch.
+        """
+        cached = self._get(key)
+        if cached is not None:
+            self._count(endpoint, 'hit')
+            return dict(cached)
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._count(endpoint, 'coalesced')
+        else:
+            self._count(endpoint, 'miss')
+            flight = self._inflight[key] = [asyncio.get_running_loop().create_task(self._run(key, fetch)), 0]
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return dict(await asyncio.shield(task))
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                task.cancel()
+
+    def snapshot(self):
+        with self._lock:
+            by_endpoint = {}
+            for endpoint, counts in self._stats.items():
+                lookups = counts['hit'] + counts['miss'] + counts['coalesced']
+                by_endpoint[endpoint] = {
+                    'hit': counts['hit'],
+                    'miss': counts['miss'],
+                    'coalesced': counts['coalesced'],
+                    'hit_rate': round((counts['hit'] + counts['coalesced']) / lookups, 3) if lookups else None,
+                }
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'in_flight': len(self._inflight),
+                'ttl': self.ttl,
+                'by_endpoint': by_endpoint,
+            }
+
+# Um cache por processo (as buscas em andamento pertencem ao event loop do worker)
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_search_cache():
+    global _cache, _cache_pid
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = SearchCache()
+            _cache_pid = os.getpid()
+        return _cache
+
+def search_cache_snapshot():
+    """Métricas do cache para o /health (None se ainda não foi usado neste processo)"""
+    if not SEARCH_CACHE_ENABLED:
+        return {'enabled': False}
+    if _cache is None or _cache_pid != os.getpid():
+        return None
+    return _cache.snapshot()
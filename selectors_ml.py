@@ -1,6 +1,12 @@
 # selectors_ml.py
+import os
 import re
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from metrics import timed_parser
+
+# Motor padrão de parse_list_items: 'lxml' (XPath direto) ou 'bs4' (BeautifulSoup + CSS)
+LIST_PARSER_ENGINE = os.getenv('LIST_PARSER_ENGINE', 'lxml').lower()
 
 def text_or_none(node):
     return node.get_text(" ", strip=True) if node else None
@@ -18,7 +24,23 @@ def normalize_link(href):
     is_tracking = "click1.mercadolivre.com.br" in href
     return href, is_tracking
 
-def parse_list_items(html):
+def parse_list_items(html, engine=None, limit=None):
+    """Itens de uma página de listagem; `engine` escolhe 'lxml' ou 'bs4' (padrão: LIST_PARSER_ENGINE).
+
+    Com `limit` o motor lxml usa o parser incremental e para no último card necessário.
+    """
+    engine = (engine or LIST_PARSER_ENGINE).lower()
+    if engine == 'bs4':
+        items = parse_list_items_bs4(html)
+        return items[:limit] if limit is not None else items
+    if engine == 'lxml':
+        if limit is not None:
+            return parse_list_items_stream(html, limit)
+        return parse_list_items_lxml(html)
+    raise ValueError(f"Motor de parse desconhecido: {engine}")
+
+@timed_parser('list_items_bs4')
+def parse_list_items_bs4(html):
     soup = BeautifulSoup(html, "lxml")
 
     items = []
@@ -101,3 +123,274 @@ def parse_list_items(html):
                 items.append({"title": title, "price": price, "link": link, "is_tracking_link": is_tracking})
 
     return items
+
+# --- Motor lxml --------------------------------------------------------------
+#
+# Mesma saída de parse_list_items_bs4 sem montar a árvore do BeautifulSoup: cada
+# seletor CSS vira um XPath pré-compilado avaliado uma vez por página sobre o conjunto
+# de cards, e os resultados (em ordem de documento) são distribuídos aos cards pelos ancestrais.
+# O primeiro resultado de cada card equivale ao select_one. Como no soupsieve, o
+# ancestral de um seletor descendente (".a .b") pode estar fora do card.
+
+def has_class(name):
+    """Predicados XPath encadeados (sem os colchetes externos) de classe CSS: filtro barato por substring e depois o token exato"""
+    return f"contains(@class, '{name}')][contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def under_class(name, ancestor):
+    """Predicado de ".ancestor .name": classe `name` com algum ancestral de classe `ancestor`"""
+    return f"{has_class(name)}][ancestor::*[{has_class(ancestor)}]"
+
+def card_xpath(predicate, tag='*'):
+    """XPath pré-compilado dos descendentes de todos os cards ($cards) que satisfazem `predicate`"""
+    return etree.XPath(f"$cards/descendant::{tag}[{predicate}]")
+
+def single_card_xpath(predicate, tag='*'):
+    """Mesmo filtro de card_xpath para um card só (o nó de contexto): primeiro descendente"""
+    return etree.XPath(f"descendant::{tag}[{predicate}][1]")
+
+LIST_CARDS = etree.XPath(f"//li[{has_class('ui-search-layout__item')}]")
+
+# Campo -> (predicado, tag); as uniões de seletores do motor bs4 se reduzem ao seletor mais geral
+LIST_FIELD_FILTERS = {
+    'title': (has_class('poly-component__title'), 'a'),
+    'brand': (has_class('poly-component__brand'), '*'),
+    'seller': (has_class('poly-component__seller'), '*'),
+    'rating': (under_class('poly-reviews__rating', 'poly-component__reviews'), '*'),
+    'reviews_total': (under_class('poly-reviews__total', 'poly-component__reviews'), '*'),
+    'fraction': (has_class('andes-money-amount__fraction'), '*'),
+    'cents': (has_class('andes-money-amount__cents'), '*'),
+    'previous_fraction': (under_class('andes-money-amount__fraction', 'andes-money-amount--previous'), '*'),
+    'previous_cents': (under_class('andes-money-amount__cents', 'andes-money-amount--previous'), '*'),
+    'discount': (has_class('andes-money-amount__discount'), '*'),
+    'shipping': (has_class('poly-component__shipping'), '*'),
+    'sponsored': (has_class('poly-component__ads-promotions'), '*'),
+    'image': (under_class('poly-component__picture', 'poly-card__portada'), 'img'),
+    'carousel_image': (under_class('poly-component__picture', 'andes-carousel-snapped__slide'), 'img'),
+}
+FALLBACK_FIELD_FILTERS = {
+    'title': LIST_FIELD_FILTERS['title'],
+    'fraction': (under_class('andes-money-amount__fraction', 'poly-price__current'), '*'),
+    'cents': (under_class('andes-money-amount__cents', 'poly-price__current'), '*'),
+}
+
+LIST_FIELDS = {name: card_xpath(*spec) for name, spec in LIST_FIELD_FILTERS.items()}
+FALLBACK_CARDS = etree.XPath(f"//div[{has_class('poly-card__content')}]")
+FALLBACK_FIELDS = {name: card_xpath(*spec) for name, spec in FALLBACK_FIELD_FILTERS.items()}
+
+# Textos que o BeautifulSoup guarda como tipos especiais e o get_text() ignora
+SKIPPED_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+
+def element_strings(node):
+    """Textos descendentes como os NavigableString do get_text() (sem comentários nem script/style)"""
+    if node.text:
+        yield node.text
+    for child in node:
+        if isinstance(child.tag, str) and child.tag not in SKIPPED_TEXT_TAGS:
+            yield from element_strings(child)
+        if child.tail:
+            yield child.tail
+
+def element_text(node, separator=""):
+    """Equivalente a get_text(separator, strip=True)"""
+    if node is None:
+        return None
+    return separator.join(text for text in (string.strip() for string in element_strings(node)) if text)
+
+def first_per_card(cards, xpath, root):
+    """Primeiro elemento de `xpath` (ordem de documento) dentro de cada card"""
+    index = {card: position for position, card in enumerate(cards)}
+    first = [None] * len(cards)
+    for element in xpath(root, cards=cards):
+        for ancestor in element.iterancestors():
+            position = index.get(ancestor)
+            if position is not None and first[position] is None:
+                first[position] = element
+    return first
+
+def list_item(field):
+    """Dict de um card <li> a partir do primeiro elemento de cada campo (None se o card não tem dados)"""
+    a_title = field['title']
+    title = element_text(a_title, " ")
+    link, is_tracking = normalize_link(a_title.get('href') if a_title is not None else None)
+
+    frac, cents = field['fraction'], field['cents']
+    price = clean_price(element_text(frac) if frac is not None else None,
+                        element_text(cents) if cents is not None else None)
+    prev_frac, prev_cents = field['previous_fraction'], field['previous_cents']
+    previous_price = clean_price(element_text(prev_frac) if prev_frac is not None else None,
+                                 element_text(prev_cents) if prev_cents is not None else None)
+
+    img = None
+    img_tag = field['image'] if field['image'] is not None else field['carousel_image']
+    if img_tag is not None:
+        for attr in ['data-src', 'data-original', 'data-lazy', 'data-zoom', 'src']:
+            potential_img = img_tag.get(attr)
+            if potential_img and not potential_img.startswith('data:image/gif;base64,'):
+                img = potential_img
+                break
+        if not img and img_tag.get('src') is not None:
+            img = img_tag.get('src')
+
+    if not any([title, price, link]):
+        return None
+    return {
+        "title": title,
+        "price": price,
+        "previous_price": previous_price,
+        "discount": element_text(field['discount'], " "),
+        "brand": element_text(field['brand'], " "),
+        "seller": element_text(field['seller'], " "),
+        "rating": element_text(field['rating'], " "),
+        "reviews_total": element_text(field['reviews_total'], " "),
+        "shipping": element_text(field['shipping'], " "),
+        "sponsored": field['sponsored'] is not None,
+        "link": link,
+        "is_tracking_link": is_tracking,
+        "image": img,
+    }
+
+def fallback_item(field):
+    """Dict de um card sem <li> (div.poly-card__content), ou None"""
+    a_title = field['title']
+    title = element_text(a_title, " ")
+    link, is_tracking = normalize_link(a_title.get('href') if a_title is not None else None)
+    frac, cents = field['fraction'], field['cents']
+    price = clean_price(element_text(frac) if frac is not None else None,
+                        element_text(cents) if cents is not None else None)
+    if not any([title, price, link]):
+        return None
+    return {"title": title, "price": price, "link": link, "is_tracking_link": is_tracking}
+
+@timed_parser('list_items_lxml')
+def parse_list_items_lxml(html):
+    if not html or not html.strip():
+        return []
+    try:
+        root = lxml_html.document_fromstring(html)
+    except (ValueError, etree.ParserError):
+        # ex.: string com declaração de encoding XML; o BeautifulSoup lida com esses casos
+        return parse_list_items_bs4(html)
+
+    items = []
+    cards = LIST_CARDS(root)
+    if cards:
+        fields = {name: first_per_card(cards, xpath, root) for name, xpath in LIST_FIELDS.items()}
+        for position in range(len(cards)):
+            item = list_item({name: elements[position] for name, elements in fields.items()})
+            if item:
+                items.append(item)
+
+    # fallback: cards sem <li>
+    if not items:
+        cards = FALLBACK_CARDS(root)
+        fields = {name: first_per_card(cards, xpath, root) for name, xpath in FALLBACK_FIELDS.items()}
+        for position in range(len(cards)):
+            item = fallback_item({name: elements[position] for name, elements in fields.items()})
+            if item:
+                items.append(item)
+
+    return items
+
+# --- Parser incremental ------------------------------------------------------
+#
+# iter_list_items alimenta um HTMLPullParser em pedaços e entrega cada card assim que
+# o </li> fecha. Com `limit` o parse para no último card necessário; cards já entregues
+# saem da árvore, então a memória não cresce com o número de cards da página.
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+LIST_CARD_FIELDS = {name: single_card_xpath(*spec) for name, spec in LIST_FIELD_FILTERS.items()}
+FALLBACK_CARD_FIELDS = {name: single_card_xpath(*spec) for name, spec in FALLBACK_FIELD_FILTERS.items()}
+
+def class_tokens(element):
+    return (element.get('class') or '').split()
+
+def card_fields(card, xpaths):
+    """Primeiro elemento de cada campo dentro de `card`"""
+    fields = {}
+    for name, xpath in xpaths.items():
+        found = xpath(card)
+        fields[name] = found[0] if found else None
+    return fields
+
+def discard(element):
+    """Esvazia um card já processado e remove os irmãos anteriores (já processados também)"""
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+def html_chunks(source, size=STREAM_CHUNK_SIZE):
+    """Pedaços de ~`size` caracteres cortados sempre antes de um '<'.
+
+    O parser incremental do libxml2 pode parar de emitir eventos (e perder elementos)
+    quando um pedaço termina no meio de uma tag. `source` é a página inteira ou um
+    iterável de pedaços str (ex.: resposta da rede já decodificada).
+    """
+    pieces = source
+    if isinstance(source, str):
+        pieces = (source[offset:offset + size] for offset in range(0, len(source), size))
+    pending = ''
+    for piece in pieces:
+        pending += piece
+        if len(pending) < size:
+            continue
+        cut = pending.rfind('<')
+        if cut > 0:
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+def iter_list_items(source, limit=None):
+    """Gera os itens da listagem à medida que os cards fecham, na ordem e no formato de parse_list_items.
+
+    `source` é o HTML (str) ou um iterável de pedaços str. Com `limit` o gerador
+    termina ao atingir o limite sem parsear o resto. Os cards sem <li> (fallback) só
+    valem se a página não tiver nenhum item em <li>, então ficam guardados até o fim.
+    """
+    if limit is not None and limit <= 0:
+        return
+    parser = etree.HTMLPullParser(events=('end',), tag=('li', 'div'))
+    yielded = 0
+    fallback = []   # itens de div.poly-card__content enquanto nenhum <li> produziu item
+
+    try:
+        for chunk in html_chunks(source):
+            parser.feed(chunk)
+            for _event, element in parser.read_events():
+                if element.tag == 'li':
+                    if 'ui-search-layout__item' not in class_tokens(element):
+                        continue
+                    item = list_item(card_fields(element, LIST_CARD_FIELDS))
+                    discard(element)
+                    if item:
+                        fallback = None
+                        yield item
+                        yielded += 1
+                        if limit is not None and yielded >= limit:
+                            return
+                elif fallback is not None and 'poly-card__content' in class_tokens(element):
+                    if limit is None or len(fallback) < limit:
+                        item = fallback_item(card_fields(element, FALLBACK_CARD_FIELDS))
+                        if item:
+                            fallback.append(item)
+                    # Dentro de um <li> o card ainda faz parte dos campos do <li>
+                    if next(element.iterancestors('li'), None) is None:
+                        discard(element)
+        parser.close()
+    except (ValueError, etree.LxmlError):
+        # ex.: declaração de encoding XML numa str; mesmo desvio do motor lxml
+        if yielded == 0 and isinstance(source, str):
+            items = parse_list_items_bs4(source)
+            yield from (items[:limit] if limit is not None else items)
+        return
+
+    if fallback:
+        yield from fallback
+
+@timed_parser('list_items_stream')
+def parse_list_items_stream(html, limit):
+    """iter_list_items materializado (caminho de parse_list_items com limit no motor lxml)"""
+    return list(iter_list_items(html, limit))
@@ -0,0 +1,126 @@
+# test_circuit_breaker.py
+# Transições de estado do CircuitBreaker (closed -> open -> half_open -> closed) e o
+# guarded_call usado pela cascata
+
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, OPEN, HALF_OPEN, CircuitBreaker, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', fake)
+    return fake
+
+def make_breaker(**kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, open_seconds=30, probes=2)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+def test_abre_com_taxa_de_falhas_na_janela(clock):
+    breaker = make_breaker()
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == CLOSED  # abaixo de min_calls
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    assert breaker.stats['rejected'] == 1
+    assert breaker.retry_in() == 30
+
+def test_nao_abre_abaixo_da_taxa(clock):
+    breaker = make_breaker()
+    for ok in (True, True, True, False, True, False, True):
+        breaker.record(ok)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is True
+
+def test_half_open_limita_provas_e_fecha_com_sucessos(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 30
+    assert breaker.snapshot()['state'] == HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # só `probes` chamadas simultâneas
+    breaker.record(True)
+    assert breaker.state == HALF_OPEN
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['window'] == 0
+
+def test_falha_em_half_open_reabre(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 30
+    assert breaker.allow() is True
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.stats['opened'] == 2
+    assert breaker.allow() is False
+
+def test_release_devolve_a_vaga_de_prova(clock):
+    breaker = make_breaker(probes=1)
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 30
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.release()
+    assert breaker.allow() is True
+
+def test_guarded_call_registra_resultados_e_pula_aberto(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, 'BREAKER_ENABLED', True)
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    monkeypatch.setattr(circuit_breaker, '_breakers_pid', None)
+    breaker = circuit_breaker.get_breaker('teste', 'list')
+    breaker.min_calls = 2
+    calls = []
+
+    async def failing():
+        calls.append('call')
+        raise RuntimeError('falhou')
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await circuit_breaker.guarded_call('teste', 'list', failing)
+        with pytest.raises(CircuitOpenError):
+            await circuit_breaker.guarded_call('teste', 'list', failing)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2  # a terceira chamada nem chegou ao tier
+    assert breaker.state == OPEN
+    assert circuit_breaker.circuit_breaker_snapshot()['open'] == ['teste/list']
+
+def test_guarded_call_cancelado_libera_a_prova(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, 'BREAKER_ENABLED', True)
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    monkeypatch.setattr(circuit_breaker, '_breakers_pid', None)
+    breaker = circuit_breaker.get_breaker('teste', 'details')
+    breaker.probes = 1
+    breaker._open(clock.now)
+    clock.now += breaker.open_seconds
+
+    async def scenario():
+        task = asyncio.ensure_future(circuit_breaker.guarded_call('teste', 'details', lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert breaker.allow() is False  # a prova está em andamento
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.allow() is True
@@ -0,0 +1,40 @@
+# test_list_parser.py
+# Paridade dos motores de parse_list_items (bs4 x lxml x parser incremental) no corpus
+# sintético do bench_list_parser
+
+import pytest
+
+from bench_list_parser import corpus
+from selectors_ml import html_chunks, iter_list_items, parse_list_items, parse_list_items_bs4, parse_list_items_lxml
+
+PAGES = corpus()
+
+@pytest.mark.parametrize('name,html', PAGES, ids=[name for name, _ in PAGES])
+def test_lxml_igual_ao_bs4(name, html):
+    assert parse_list_items_lxml(html) == parse_list_items_bs4(html)
+
+@pytest.mark.parametrize('name,html', PAGES, ids=[name for name, _ in PAGES])
+def test_parser_incremental_igual_ao_bs4(name, html):
+    expected = parse_list_items_bs4(html)
+    assert list(iter_list_items(html)) == expected
+    assert list(iter_list_items(html, limit=5)) == expected[:5]
+    for size in (97, 4096):
+        assert list(iter_list_items(html_chunks(html, size))) == expected
+
+def test_corpus_tem_itens():
+    counts = {name: len(parse_list_items_bs4(html)) for name, html in PAGES}
+    assert counts['sintética:misturada'] == 54
+    assert counts['sintética:sem-li'] == 40
+    assert counts['sintética:vazia'] == 0
+
+def test_limit_nos_dois_motores():
+    _name, html = PAGES[0]
+    assert parse_list_items(html, engine='lxml', limit=3) == parse_list_items(html, engine='bs4', limit=3)
+    with pytest.raises(ValueError):
+        parse_list_items(html, engine='regex')
+
+def test_pedacos_cortam_antes_de_tag():
+    html = '<ol>' + '<li class="a">x</li>' * 50 + '</ol>'
+    chunks = list(html_chunks(html, 16))
+    assert ''.join(chunks) == html
+    assert all(chunk.startswith('<') for chunk in chunks)
@@ -0,0 +1,48 @@
+# test_page_classifier.py
+# Veredictos do page_classifier para as páginas que a cascata encontra
+
+from page_classifier import BLOCKED, CAPTCHA, EMPTY, NOT_FOUND, OK, classify, page_type_for_url
+
+FILLER = '<div class="nav">menu</div>' * 400   # passa de MIN_PAGE_BYTES
+LIST_CARD = '<li class="ui-search-layout__item"><div class="poly-card">Produto</div></li>'
+STATE = '<script>window.__PRELOADED_STATE__ = {"pageState": {}};</script>'
+
+def test_status_http_decide_primeiro():
+    assert classify(LIST_CARD, status=404, page_type='list') == (NOT_FOUND, 'status_404')
+    assert classify(LIST_CARD, status=429, page_type='list') == (BLOCKED, 'rate_limited')
+    assert classify(LIST_CARD, status=500, page_type='list') == (BLOCKED, 'status_500')
+
+def test_listagem_com_cards_ok():
+    assert classify(STATE + LIST_CARD + FILLER, status=200, page_type='list') == (OK, None)
+
+def test_busca_sem_resultados_com_estado_embutido():
+    html = STATE + FILLER + '<p>Não há anúncios que correspondam à sua busca.</p>'
+    assert classify(html, page_type='list') == (NOT_FOUND, 'no_results')
+
+def test_busca_sem_resultados_com_recomendacoes():
+    html = STATE + '<section class="ui-search-rescue">Sem resultados</section>' + LIST_CARD + FILLER
+    assert classify(html, page_type='list') == (NOT_FOUND, 'no_results')
+
+def test_captcha_e_bloqueio_sem_conteudo():
+    assert classify('<html><div id="CAPTCHA">Confirme</div></html>' + FILLER, page_type='list') == (CAPTCHA, 'captcha')
+    assert classify('<h1>Access Denied</h1>', page_type='details') == (BLOCKED, 'access_denied')
+
+def test_produto_inexistente():
+    html = '<h1>Parece que esta página não existe</h1>' + FILLER
+    assert classify(html, page_type='details') == (NOT_FOUND, 'not_found')
+
+def test_pagina_vazia_e_conteudo_ausente():
+    assert classify('', page_type='list') == (EMPTY, 'empty')
+    assert classify('<html><body>oi</body></html>', page_type='list') == (EMPTY, 'empty')
+    assert classify(FILLER, page_type='list') == (BLOCKED, 'missing_content')
+    assert classify(FILLER) == (OK, None)  # sem tipo de página não há conteúdo esperado
+
+def test_detalhes_ok_pelo_titulo():
+    html = '<h1 class="ui-pdp-title">Produto</h1>' + FILLER
+    assert classify(html, status=200, page_type='details') == (OK, None)
+
+def test_tipo_de_pagina_pela_url():
+    assert page_type_for_url('https://lista.mercadolivre.com.br/iphone') == 'list'
+    assert page_type_for_url('https://produto.mercadolivre.com.br/MLB-123-x') == 'details'
+    assert page_type_for_url('https://www.mercadolivre.com.br/p/MLB123') == 'details'
+    assert page_type_for_url('https://example.com') is None
@@ -0,0 +1,99 @@
+# test_product_cache.py
+# Cache de produtos: TTL por campo, stale-while-revalidate, LRU e um refresh por id
+
+import asyncio
+
+import pytest
+
+import product_cache
+from product_cache import ProductCache
+from product_scraper import extract_product_details
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(product_cache, 'time', fake)
+    return fake
+
+PDP = '<h1 class="ui-pdp-title">Produto de teste</h1>{}'
+
+def product(stock_html=''):
+    # Payload como o /scrape-product-details guarda: o dict real de extract_product_details
+    url = 'https://produto.mercadolivre.com.br/MLB-123456789-produto-_JM'
+    return {'product': extract_product_details(PDP.format(stock_html), url)}
+
+def test_produto_fresh_stale_e_miss(clock):
+    cache = ProductCache(price_ttl=60, stock_ttl=10, stale_ttl=100)
+    assert cache.lookup('1')[2] == 'miss'
+    cache.store('1', product())
+    assert cache.lookup('1')[2] == 'fresh'
+    clock.now += 61
+    assert cache.lookup('1')[2] == 'stale'
+    clock.now += 100
+    assert cache.lookup('1')[2] == 'miss'
+    assert cache.snapshot()['entries'] == 0
+
+def test_produto_com_estoque_usa_o_menor_ttl(clock):
+    cache = ProductCache(price_ttl=60, stock_ttl=10, stale_ttl=100)
+    cache.store('1', product('<script>{"available_quantity":5}</script>'))
+    clock.now += 11
+    assert cache.lookup('1')[2] == 'stale'
+
+def test_estoque_zero_extraido_tambem_usa_o_ttl_de_estoque(clock):
+    cache = ProductCache(price_ttl=60, stock_ttl=10, stale_ttl=100)
+    payload = product('<script>{"available_quantity":0}</script>')
+    assert payload['product']['stock'] == 0
+    cache.store('1', payload)
+    clock.now += 11
+    assert cache.lookup('1')[2] == 'stale'
+
+def test_produto_sem_estoque_na_pagina_usa_o_ttl_de_preco(clock):
+    cache = ProductCache(price_ttl=60, stock_ttl=10, stale_ttl=100)
+    payload = product()
+    assert payload['product']['stock'] == 0   # o extrator devolve 0 quando não acha o estoque
+    assert cache.ttl_for(payload) == 60
+    cache.store('1', payload)
+    clock.now += 11
+    assert cache.lookup('1')[2] == 'fresh'
+
+def test_produto_max_age_nao_serve_stale(clock):
+    cache = ProductCache(price_ttl=60, stock_ttl=10, stale_ttl=100)
+    cache.store('1', product())
+    clock.now += 30
+    assert cache.lookup('1', max_age=40)[2] == 'fresh'
+    assert cache.lookup('1', max_age=20)[2] == 'miss'
+
+def test_produto_lru_descarta_o_menos_usado(clock):
+    cache = ProductCache(max_entries=2)
+    cache.store('1', product())
+    cache.store('2', product())
+    cache.lookup('1')
+    cache.store('3', product())
+    assert cache.lookup('2')[2] == 'miss'
+    assert cache.lookup('1')[2] == 'fresh'
+
+def test_produto_um_refresh_por_id(clock):
+    cache = ProductCache()
+    calls = []
+
+    async def fetch():
+        calls.append('fetch')
+        await asyncio.sleep(0)
+        return {'product': {'title': 'Novo'}}, 200
+
+    async def scenario():
+        assert cache.refresh_in_background('1', fetch) is True
+        assert cache.refresh_in_background('1', fetch) is False
+        while cache.snapshot()['refreshing']:
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert calls == ['fetch']
+    assert cache.lookup('1')[0]['product']['title'] == 'Novo'
@@ -0,0 +1,47 @@
+# test_rate_limit.py
+# Token bucket por host: rajada, reposição, pausa por Retry-After e o limite de espera
+
+import pytest
+
+from rate_limit import HostRateLimiter, RateLimitExceeded, TokenBucket, retry_after_seconds
+
+def test_rajada_sem_espera_e_depois_um_token_por_intervalo():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.reserve(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(now) == pytest.approx(0.5)
+    assert bucket.reserve(now) == pytest.approx(1.0)
+
+def test_reposicao_nao_passa_do_burst():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    bucket.reserve(now)
+    bucket.reserve(now + 100)
+    assert bucket.tokens == pytest.approx(2)
+
+def test_penalize_pausa_o_host_sem_rajada_acumulada():
+    bucket = TokenBucket(rate=1, burst=5)
+    now = bucket.updated
+    bucket.penalize(now, 10)
+    assert bucket.reserve(now) == pytest.approx(10)
+    assert bucket.reserve(now + 10) == pytest.approx(1)
+    assert bucket.penalties == 1
+
+def test_acquire_desiste_acima_da_espera_maxima():
+    limiter = HostRateLimiter(rate=0.01, burst=1, max_wait=1)
+    assert limiter.acquire('lista.mercadolivre.com.br') == 0.0
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('lista.mercadolivre.com.br')
+    # O token recusado volta ao bucket; outros hosts não são afetados
+    assert limiter.snapshot()['hosts']['lista.mercadolivre.com.br']['tokens'] == pytest.approx(0, abs=0.01)
+    assert limiter.acquire('produto.mercadolivre.com.br') == 0.0
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+def test_retry_after_em_segundos_e_invalido():
+    assert retry_after_seconds(FakeResponse({'Retry-After': '7'})) == 7.0
+    assert retry_after_seconds(FakeResponse({'Retry-After': 'amanhã'})) is None
+    assert retry_after_seconds(FakeResponse({})) is None
+    assert retry_after_seconds(None) is None
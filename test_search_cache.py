@@ -0,0 +1,105 @@
+# test_search_cache.py
+# Cache de buscas: chave normalizada, TTL, LRU e single-flight
+
+import asyncio
+
+import pytest
+
+import search_cache
+from search_cache import SearchCache, search_cache_key
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(search_cache, 'time', fake)
+    return fake
+
+def test_chave_da_busca_normaliza_url_e_separa_debug():
+    assert search_cache_key(' https://Lista.MercadoLivre.com.br/iphone ', '10', 1) == \
+        search_cache_key('https://lista.mercadolivre.com.br/iphone', 10, True)
+    assert search_cache_key('u', 10, True, debug=True) != search_cache_key('u', 10, True)
+
+def test_busca_single_flight_e_hit(clock):
+    cache = SearchCache(ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append('fetch')
+        await asyncio.sleep(0.01)
+        return {'success': True, 'items': [{'title': 'a'}]}
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get_or_fetch('search', 'k', fetch) for _ in range(3)))
+        second = await cache.get_or_fetch('search', 'k', fetch)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == ['fetch']
+    assert all(result['items'] == [{'title': 'a'}] for result in first + [second])
+    stats = cache.snapshot()['by_endpoint']['search']
+    assert (stats['miss'], stats['coalesced'], stats['hit']) == (1, 2, 1)
+
+def test_busca_falha_nao_entra_no_cache(clock):
+    cache = SearchCache(ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append('fetch')
+        return {'success': False, 'items': []}
+
+    async def scenario():
+        await cache.get_or_fetch('search', 'k', fetch)
+        await cache.get_or_fetch('search', 'k', fetch)
+
+    asyncio.run(scenario())
+    assert calls == ['fetch', 'fetch']
+
+def test_busca_expira_pelo_ttl_e_respeita_lru(clock):
+    cache = SearchCache(ttl=60, max_entries=2)
+
+    def fetcher(name):
+        async def fetch():
+            return {'success': True, 'name': name}
+        return fetch
+
+    async def scenario():
+        await cache.get_or_fetch('search', 'a', fetcher('a'))
+        await cache.get_or_fetch('search', 'b', fetcher('b'))
+        await cache.get_or_fetch('search', 'a', fetcher('a2'))   # hit: 'a' vira o mais recente
+        await cache.get_or_fetch('search', 'c', fetcher('c'))    # descarta 'b'
+        b = await cache.get_or_fetch('search', 'b', fetcher('b2'))
+        clock.now += 61
+        a = await cache.get_or_fetch('search', 'a', fetcher('a3'))
+        return b, a
+
+    b, a = asyncio.run(scenario())
+    assert b['name'] == 'b2'
+    assert a['name'] == 'a3'
+
+def test_busca_cancelada_quando_todos_desistem(clock):
+    cache = SearchCache(ttl=60)
+    started = []
+
+    async def fetch():
+        started.append('fetch')
+        await asyncio.sleep(10)
+        return {'success': True}
+
+    async def scenario():
+        waiter = asyncio.ensure_future(cache.get_or_fetch('search', 'k', fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return cache.snapshot()['in_flight']
+
+    assert asyncio.run(scenario()) == 0
+    assert started == ['fetch']
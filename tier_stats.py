@@ -0,0 +1,100 @@
+# tier_stats.py
+# Contadores por tier de scraping (http, playwright, ocr) e tipo de página,
+# para medir a taxa de acerto de cada tier e quantas vezes ele escalou, e janelas
+# das latências recentes (base do limiar de hedging)
+
+import math
+import os
+import threading
+from collections import Counter, defaultdict, deque
+from metrics import observe_fetch
+
+LATENCY_WINDOW = int(os.getenv('TIER_LATENCY_WINDOW', '200'))   # latências mantidas por tier/tipo de página
+
+def quantile_of(sorted_samples, quantile):
+    """Quantil pelo método nearest-rank de uma lista já ordenada"""
+    return sorted_samples[max(0, math.ceil(quantile * len(sorted_samples)) - 1)]
+
+class TierStats:
+    """Contadores thread-safe de tentativas, acertos, escaladas e erros por tier"""
+
+    OUTCOMES = ('hit', 'escalated', 'error')
+
+    def __init__(self, latency_window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: defaultdict(Counter))
+        self._reasons = defaultdict(Counter)
+        self._latencies = defaultdict(lambda: deque(maxlen=latency_window))
+
+    def record(self, tier, page_type, outcome, reason=None):
+        """outcome: 'hit' (tier resolveu), 'escalated' (bloqueio detectado) ou 'error'"""
+        with self._lock:
+            counts = self._counts[tier][page_type]
+            counts['attempts'] += 1
+            counts[outcome] += 1
+            if reason:
+                self._reasons[tier][reason] += 1
+
+    def record_latency(self, tier, page_type, seconds):
+        """Duração de uma tentativa que chegou a uma resposta (acerto ou escalada; erros ficam de fora)"""
+        with self._lock:
+            self._latencies[(tier, page_type)].append(seconds)
+
+    def latency_quantile(self, tier, page_type, quantile, min_samples=1):
+        """Quantil das latências recentes, ou None com menos de `min_samples` amostras"""
+        with self._lock:
+            samples = sorted(self._latencies.get((tier, page_type), ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return quantile_of(samples, quantile)
+
+    def _latency_summary(self, tier, page_type):
+        samples = sorted(self._latencies.get((tier, page_type), ()))
+        if not samples:
+            return None
+        return {
+            'samples': len(samples),
+            'p50': round(quantile_of(samples, 0.5), 3),
+            'p90': round(quantile_of(samples, 0.9), 3),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for tier, by_page in self._counts.items():
+                totals = Counter()
+                pages = {}
+                for page_type, counts in by_page.items():
+                    totals.update(counts)
+                    pages[page_type] = self._summarize(counts)
+                    pages[page_type]['latency'] = self._latency_summary(tier, page_type)
+                snapshot[tier] = {
+                    **self._summarize(totals),
+                    'by_page_type': pages,
+                    'reasons': dict(self._reasons[tier])
+                }
+            return snapshot
+
+    @classmethod
+    def _summarize(cls, counts):
+        attempts = counts.get('attempts', 0)
+        summary = {'attempts': attempts}
+        summary.update({outcome: counts.get(outcome, 0) for outcome in cls.OUTCOMES})
+        summary['hit_rate'] = round(summary['hit'] / attempts, 3) if attempts else None
+        return summary
+
+# Contadores do processo (cada worker gunicorn tem os seus)
+tier_stats = TierStats()
+
+def record_tier(tier, page_type, outcome, reason=None):
+    tier_stats.record(tier, page_type, outcome, reason)
+
+def record_latency(tier, page_type, seconds):
+    tier_stats.record_latency(tier, page_type, seconds)
+    observe_fetch(tier, page_type, seconds)
+
+def latency_quantile(tier, page_type, quantile, min_samples=1):
+    return tier_stats.latency_quantile(tier, page_type, quantile, min_samples)
+
+def tier_stats_snapshot():
+    return tier_stats.snapshot()